@@ -0,0 +1,130 @@
+"""
+backend/bench_backend.py  –  timings of the depth / size helpers in main.py
+
+Generates synthetic scenes (see synthetic_scenes.py) for every point count,
+then times ply_to_depth_png, filtered_depth, metric_size_and_height and a
+full annotate_list, cold (depth png rebuilt from the cloud) and warm. The
+point-cloud engine (cloud_index.py) is timed the same way, index build,
+fit_rect and annotate_list with ANNO_3D_ENGINE=cloud, and its sizes are
+compared with metric_size_and_height box by box.
+
+    cd backend
+    python bench_backend.py --num_points 100000 300000 1000000 --output bench_backend.json
+"""
+from pathlib import Path
+import argparse, contextlib, io, json, tempfile, time
+import numpy as np
+import cv2
+
+import main
+import cloud_index
+from synthetic_scenes import make_dataset
+
+
+def timed(fn, repeats: int, setup=None) -> dict:
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):   # main.py prints a lot
+            fn()
+        times.append(1000. * (time.perf_counter() - t0))
+    return {"median_ms": float(np.median(times)), "p95_ms": float(np.percentile(times, 95)), "repeats": repeats}
+
+def use_root(root: Path):
+    main.DATA_DIR   = root / "data"
+    main.HELPER_DIR = root / "outputs_helper"
+    main.OUT_DIR    = root / "output"
+    main.OUT_DIR.mkdir(exist_ok=True)
+
+def payload_for(image_id: str) -> main.AnnotationList:
+    """The helper boxes sent back unchanged, like an annotator accepting them."""
+    annos = [{"bbox": {"cx": x + w / 2, "cy": y + h / 2, "w": w, "h": h, "angle": a},
+              "category": b["name"], "conf": b["conf"]}
+             for b in main.load_helper_boxes(image_id)
+             for x, y, w, h, a in [b["bbox"]]]
+    return main.AnnotationList(image_id=image_id, annos=annos)
+
+def run(root: Path, num_points: int, width: int, height: int, repeats: int) -> dict:
+    image_id, = make_dataset(root, 1, num_points=num_points, width=width, height=height)
+    use_root(root)
+    K, _, _, h, w = main.load_metadata(image_id)
+    K_for_depth = dict(fx=K[0, 0], fy=K[1, 1], cx=K[0, 2], cy=K[1, 2])
+    cloud = str(main.DATA_DIR / f"{image_id}_cloud.ply")
+    depth_png = main.DATA_DIR / f"{image_id}_depth_new.png"
+    remove_depth = lambda: depth_png.unlink(missing_ok=True)
+
+    results = {}
+    results[f"ply_to_depth_png/{num_points}pts"] = timed(
+        lambda: main.ply_to_depth_png(cloud, (h, w), K_for_depth, str(depth_png)), repeats, remove_depth)
+    depth_m = cv2.imread(str(depth_png), cv2.IMREAD_UNCHANGED).astype(np.float32) / 1000.0
+
+    rng = np.random.default_rng(0)
+    centers = np.stack([rng.integers(0, w, 1000), rng.integers(0, h, 1000)], axis=1)
+    results[f"filtered_depth/x1000/{num_points}pts"] = timed(
+        lambda: [main.filtered_depth(depth_m, int(x), int(y)) for x, y in centers], repeats)
+
+    boxes = payload_for(image_id).annos
+    rects = [((b.bbox.cx, b.bbox.cy), (b.bbox.w, b.bbox.h), -b.bbox.angle) for b in boxes]
+    results[f"metric_size_and_height/x{len(rects)}/{num_points}pts"] = timed(
+        lambda: [main.metric_size_and_height(K, depth_m, r, 0.9) for r in rects], repeats)
+
+    payload = payload_for(image_id)
+    main.ENGINE_3D = "depth"
+    results[f"annotate_list/cold/{num_points}pts"] = timed(lambda: main.annotate_list(payload), repeats, remove_depth)
+    results[f"annotate_list/warm/{num_points}pts"] = timed(lambda: main.annotate_list(payload), repeats)
+
+    # ---- point-cloud engine ---- #
+    xyz = main.read_cloud_points(cloud)
+    results[f"cloud_index/build/{num_points}pts"] = timed(lambda: cloud_index.CloudIndex(xyz, K, (h, w)), repeats)
+    index = cloud_index.CloudIndex(xyz, K, (h, w))
+    R_cam2base = main.quaternion.as_rotation_matrix(main.get_rotation_quaternion(15))
+    trans = main.load_metadata(image_id)[1]
+    results[f"fit_rect/x{len(rects)}/{num_points}pts"] = timed(
+        lambda: [index.fit_rect(r, R_cam2base, trans) for r in rects], repeats)
+    main.ENGINE_3D = "cloud"
+    results[f"annotate_list/cloud/cold/{num_points}pts"] = timed(
+        lambda: main.annotate_list(payload), repeats, cloud_index.clear_cloud_indexes)
+    results[f"annotate_list/cloud/warm/{num_points}pts"] = timed(lambda: main.annotate_list(payload), repeats)
+    main.ENGINE_3D = "depth"
+
+    # same boxes, both engines: size differences in metres
+    diffs = []
+    for r in rects:
+        with contextlib.redirect_stdout(io.StringIO()):
+            old = main.metric_size_and_height(K, depth_m, r, 0.9)
+        fit = index.fit_rect(r, R_cam2base, trans)
+        if None not in old and fit is not None:
+            diffs.append(np.abs(np.array(fit["size"]) - np.array(old, dtype=float)))
+    if diffs:
+        d = np.median(diffs, axis=0)
+        results[f"cloud_vs_depth_size_diff/{num_points}pts"] = {"w_m": float(d[0]), "h_m": float(d[1]), "height_m": float(d[2])}
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--num_points", type=int, nargs="+", default=[100_000, 300_000, 1_000_000])
+    ap.add_argument("--width", type=int, default=1280)
+    ap.add_argument("--height", type=int, default=720)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--root", type=str, default=None, help="where scenes are written (temp dir if omitted)")
+    ap.add_argument("--output", type=str, default=None, help="write the results as JSON")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.root or tmp)
+        results = {}
+        for n in args.num_points:
+            results.update(run(root / f"points_{n}", n, args.width, args.height, args.repeats))
+
+    print(f"{'case':<48} {'median ms':>10} {'p95 ms':>10}")
+    for name, r in results.items():
+        if "median_ms" in r:
+            print(f"{name:<48} {r['median_ms']:>10.2f} {r['p95_ms']:>10.2f}")
+    for name, r in results.items():
+        if "median_ms" not in r:
+            print(f"{name:<48} median |cloud - depth|: w {r['w_m']:.3f} m, h {r['h_m']:.3f} m, height {r['height_m']:.3f} m")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
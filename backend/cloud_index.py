@@ -0,0 +1,168 @@
+"""
+backend/cloud_index.py  –  point-cloud engine for the 3-D boxes of annotate_list
+
+Instead of rasterising the cloud into a depth png and sampling it, the cloud
+is projected once into the image and bucketed into a grid of cell_px × cell_px
+pixel cells (points sorted by cell, one offset table). A rotated 2-D box
+then only touches the cells under its bounding rectangle, so a query costs
+O(points in the box), and the points are fitted in the base frame directly.
+
+numpy only; reading the PLY is left to the caller (open3d in main.py).
+
+    index = get_cloud_index(ply_path, K, (H, W), load_points)
+    fit   = index.fit_rect(((cx, cy), (w, h), angle), R_cam2base, t_cam2base)
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+import math
+import numpy as np
+
+
+def _rect_axes(angle_deg: float) -> tuple[np.ndarray, np.ndarray]:
+    """Width and height axes of a rect in pixels, as cv2.boxPoints."""
+    theta = math.radians(angle_deg)
+    return np.array([math.cos(theta), math.sin(theta)]), np.array([-math.sin(theta), math.cos(theta)])
+
+
+class CloudIndex:
+    """Camera-frame points (N×3, metres) bucketed by their projected pixel."""
+
+    def __init__(self, xyz: np.ndarray, K: np.ndarray, img_size: tuple[int, int], cell_px: int = 8):
+        H, W = img_size
+        xyz = np.asarray(xyz, dtype=np.float32)
+        xyz = xyz[np.isfinite(xyz).all(axis=1) & (xyz[:, 2] > 1e-6)]
+        fx, fy, cx, cy = K[0, 0], K[1, 1], K[0, 2], K[1, 2]
+        u = xyz[:, 0] * fx / xyz[:, 2] + cx
+        v = xyz[:, 1] * fy / xyz[:, 2] + cy
+        inside = (u >= 0) & (u < W) & (v >= 0) & (v < H)
+        xyz, u, v = xyz[inside], u[inside], v[inside]
+
+        self.K, self.img_size, self.cell_px = K, (H, W), cell_px
+        self.cols, self.rows = math.ceil(W / cell_px), math.ceil(H / cell_px)
+        cell = (v // cell_px).astype(np.int64) * self.cols + (u // cell_px).astype(np.int64)
+        order = np.argsort(cell, kind="stable")
+        self.xyz, self.u, self.v = xyz[order], u[order], v[order]
+        # points of cell c are [starts[c], starts[c+1]); cells of a row are contiguous
+        self.starts = np.searchsorted(cell[order], np.arange(self.rows * self.cols + 1))
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def query_rect(self, rect: tuple, margin_px: float = 0.0) -> np.ndarray:
+        """
+        Indices of the points whose projection falls in `rect`,
+        ((cx, cy), (w, h), angle_deg) as for cv2.boxPoints, grown by
+        `margin_px` on every side.
+        """
+        (rcx, rcy), (w, h), angle = rect
+        w, h = abs(w) + 2 * margin_px, abs(h) + 2 * margin_px
+        ew, eh = _rect_axes(angle)
+        half_x = abs(ew[0]) * w / 2 + abs(eh[0]) * h / 2
+        half_y = abs(ew[1]) * w / 2 + abs(eh[1]) * h / 2
+
+        c0 = max(0, int((rcx - half_x) // self.cell_px)); c1 = min(self.cols - 1, int((rcx + half_x) // self.cell_px))
+        r0 = max(0, int((rcy - half_y) // self.cell_px)); r1 = min(self.rows - 1, int((rcy + half_y) // self.cell_px))
+        if c0 > c1 or r0 > r1:
+            return np.empty(0, dtype=np.int64)
+
+        # one contiguous slice per cell row under the bounding rectangle
+        first = np.arange(r0, r1 + 1) * self.cols
+        lo, hi = self.starts[first + c0], self.starts[first + c1 + 1]
+        idx = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])
+
+        return idx[self._in_rect(idx, rect, margin_px)]
+
+    def _in_rect(self, idx: np.ndarray, rect: tuple, margin_px: float = 0.0) -> np.ndarray:
+        (rcx, rcy), (w, h), angle = rect
+        ew, eh = _rect_axes(angle)
+        du, dv = self.u[idx] - rcx, self.v[idx] - rcy
+        return (np.abs(du * ew[0] + dv * ew[1]) <= abs(w) / 2 + margin_px) & \
+               (np.abs(du * eh[0] + dv * eh[1]) <= abs(h) / 2 + margin_px)
+
+    def fit_rect(self, rect: tuple, R: np.ndarray, t: np.ndarray,
+                 lo: float = 2.0, hi: float = 98.0, min_height: float = 0.01, min_points: int = 20,
+                 ring_px: float = 10.0, yaw_step_deg: float = 2.0, max_yaw_points: int = 2048) -> dict | None:
+        """
+        Fit the object under `rect` in the base frame (z up), from percentiles.
+
+        R, t map camera to base (p_base = R @ p_cam + t). The table level is
+        the `lo` percentile of z over the rect grown by `ring_px`, so a tight
+        rect still sees some table; points of the rect more than `min_height`
+        above it are the object. Its footprint is the yaw (in `yaw_step_deg`
+        steps, searched on at most `max_yaw_points` points) with the smallest
+        percentile extents, reported as width along the axis closer to the
+        rect's width axis.
+
+        Returns {"position", "size": [w, h, height], "num_points"}, position
+        being the centre of the fitted box, or None with too few points.
+        """
+        idx = self.query_rect(rect, margin_px=ring_px)
+        inner = self._in_rect(idx, rect)
+        if inner.sum() < min_points:
+            return None
+        # camera → base for every point of the box and its ring, one matmul
+        pts = self.xyz[idx] @ np.asarray(R, dtype=np.float32).T + np.asarray(t, dtype=np.float32)
+
+        z_table = np.percentile(pts[:, 2], lo)
+        box = pts[inner]
+        z_top = np.percentile(box[:, 2], hi)
+        obj = box[box[:, 2] > z_table + min_height]
+        if len(obj) < min_points:
+            obj = box                                  # flat object
+
+        # candidate yaws at once: (points × yaws) projections, percentiles per column
+        xy = obj[:, :2].astype(np.float64)
+        search = xy[::max(1, len(xy) // max_yaw_points)]
+        yaws = np.radians(np.arange(0.0, 90.0, yaw_step_deg))
+        d1 = np.stack([np.cos(yaws), np.sin(yaws)])
+        d2 = np.stack([-np.sin(yaws), np.cos(yaws)])
+        q1, q2 = np.percentile(search @ d1, [lo, hi], axis=0), np.percentile(search @ d2, [lo, hi], axis=0)
+        best = int(np.argmin((q1[1] - q1[0]) * (q2[1] - q2[0])))
+        e1, e2 = d1[:, best], d2[:, best]
+        axes = [(e1, np.percentile(xy @ e1, [lo, hi])), (e2, np.percentile(xy @ e2, [lo, hi]))]
+
+        a_w = self._base_width_axis(rect, R, float(np.median(self.xyz[idx, 2])))
+        if abs(axes[1][0] @ a_w) > abs(axes[0][0] @ a_w):
+            axes.reverse()
+        (e_w, (w0, w1)), (e_h, (h0, h1)) = axes
+        center_xy = (w0 + w1) / 2 * e_w + (h0 + h1) / 2 * e_h
+        return {
+            "position": [float(center_xy[0]), float(center_xy[1]), float((z_table + z_top) / 2)],
+            "size": [float(w1 - w0), float(h1 - h0), float(z_top - z_table)],
+            "num_points": int(inner.sum()),
+        }
+
+    def _base_width_axis(self, rect: tuple, R: np.ndarray, depth: float) -> np.ndarray:
+        """Unit vector in the base xy plane along the rect's width axis, at `depth`."""
+        (rcx, rcy), _, angle = rect
+        ew, _ = _rect_axes(angle)
+        Kinv = np.linalg.inv(self.K)
+        step = Kinv @ np.array([rcx + ew[0], rcy + ew[1], 1.0]) - Kinv @ np.array([rcx, rcy, 1.0])
+        d = (np.asarray(R) @ (depth * step))[:2]
+        return d / (np.linalg.norm(d) + 1e-12)
+
+
+# ---- per-process cache ---------------------------------------------------------
+_INDEX_CACHE: "OrderedDict[tuple, CloudIndex]" = OrderedDict()
+MAX_CACHED_INDEXES = 8
+
+def get_cloud_index(ply_path, K: np.ndarray, img_size: tuple[int, int],
+                    load_points: Callable[[str], np.ndarray], cell_px: int = 8) -> CloudIndex:
+    """
+    CloudIndex of `ply_path`, built on first use and kept for the most recent
+    MAX_CACHED_INDEXES clouds; a rewritten file (new mtime) is re-read.
+    """
+    ply_path = Path(ply_path)
+    key = (str(ply_path), ply_path.stat().st_mtime_ns, tuple(np.asarray(K).ravel()), tuple(img_size), cell_px)
+    if key in _INDEX_CACHE:
+        _INDEX_CACHE.move_to_end(key)
+        return _INDEX_CACHE[key]
+    index = CloudIndex(load_points(str(ply_path)), np.asarray(K), img_size, cell_px)
+    _INDEX_CACHE[key] = index
+    while len(_INDEX_CACHE) > MAX_CACHED_INDEXES:
+        _INDEX_CACHE.popitem(last=False)
+    return index
+
+def clear_cloud_indexes():
+    _INDEX_CACHE.clear()
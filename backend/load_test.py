@@ -0,0 +1,108 @@
+"""
+backend/load_test.py  –  N concurrent annotators against an in-process server
+
+Starts main.app with uvicorn on a free local port, pointed at synthetic
+scenes (synthetic_scenes.py). Every annotator lists the images and, for its
+share of them, fetches /rgb and /annotations and posts /api/annotate with the
+boxes it got back. Reports p50/p95/p99 latency per endpoint and throughput.
+
+    cd backend
+    python load_test.py --annotators 4 --num_scenes 8 --rounds 2 --num_points 300000
+"""
+from pathlib import Path
+import argparse, contextlib, io, json, socket, tempfile, threading, time
+import urllib.request
+from collections import defaultdict
+import numpy as np
+import uvicorn
+
+import main
+from synthetic_scenes import make_dataset
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextlib.contextmanager
+def serve(port: int):
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)     # endpoint → [ms]
+        self.errors = defaultdict(int)
+
+    def request(self, endpoint: str, url: str, body: dict | None = None):
+        data = None if body is None else json.dumps(body).encode()
+        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req) as r:
+                content = r.read()
+        except Exception:
+            with self.lock:
+                self.errors[endpoint] += 1
+            return None
+        ms = 1000. * (time.perf_counter() - t0)
+        with self.lock:
+            self.latency[endpoint].append(ms)
+        return content
+
+def annotator(base: str, index: int, count: int, rounds: int, start: str, rec: Recorder):
+    for _ in range(rounds):
+        images = json.loads(rec.request("/api/images", f"{base}/api/images?start={start}") or "[]")
+        for image_id in images[index::count]:
+            rec.request("/rgb", f"{base}/api/image/{image_id}/rgb")
+            boxes = json.loads(rec.request("/annotations", f"{base}/api/image/{image_id}/annotations") or "[]")
+            annos = [{"bbox": {"cx": x + w / 2, "cy": y + h / 2, "w": w, "h": h, "angle": a},
+                      "category": b["name"], "conf": b["conf"]}
+                     for b in boxes for x, y, w, h, a in [b["bbox"]]]
+            rec.request("/api/annotate", f"{base}/api/annotate", {"image_id": image_id, "annos": annos})
+
+def report(rec: Recorder, seconds: float):
+    total = sum(len(v) for v in rec.latency.values())
+    print(f"{'endpoint':<16} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, ms in rec.latency.items():
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        print(f"{endpoint:<16} {len(ms):>8} {rec.errors[endpoint]:>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}")
+    print(f"{total} requests in {seconds:.1f} s  →  {total / seconds:.1f} req/s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--annotators", type=int, default=4)
+    ap.add_argument("--rounds", type=int, default=2, help="passes of every annotator over its images")
+    ap.add_argument("--num_scenes", type=int, default=8)
+    ap.add_argument("--num_points", type=int, default=300_000)
+    ap.add_argument("--root", type=str, default=None, help="where scenes are written (temp dir if omitted)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.root or tmp)
+        ids = make_dataset(root, args.num_scenes, num_points=args.num_points)
+        main.DATA_DIR, main.HELPER_DIR, main.OUT_DIR = root / "data", root / "outputs_helper", root / "output"
+        main.OUT_DIR.mkdir(exist_ok=True)
+
+        rec = Recorder()
+        with serve(free_port()) as base, contextlib.redirect_stdout(io.StringIO()):
+            # annotators get disjoint image subsets, as two people never save the same image at once
+            threads = [threading.Thread(target=annotator, args=(base, i, args.annotators, args.rounds, ids[0], rec))
+                       for i in range(args.annotators)]
+            t0 = time.perf_counter()
+            for t in threads: t.start()
+            for t in threads: t.join()
+            seconds = time.perf_counter() - t0
+        report(rec, seconds)
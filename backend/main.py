@@ -2,7 +2,7 @@
 backend/main.py  –  FastAPI for RGB-depth annotation (multi-bbox version)
 """
 from pathlib import Path
-import json, ast, math
+import json, math, os
 import numpy as np
 import cv2
 # import quaternion
@@ -15,15 +15,20 @@ import open3d as o3d
 import quaternion
 import numpy as np
 from scipy.spatial.transform import Rotation as R
+from cloud_index import get_cloud_index
+from object_queries import object_candidates
 
 
 
 # -------------------------------------------------------------- paths -----
 ROOT          = Path(__file__).parent.parent
-DATA_DIR      = ROOT / "data"
-OUT_DIR       = ROOT / "output"
-HELPER_DIR    = ROOT / "outputs_helper"
+# overridable so benchmarks / load tests can point the app at synthetic scenes
+DATA_DIR      = Path(os.environ.get("ANNO_DATA_DIR",   ROOT / "data"))
+OUT_DIR       = Path(os.environ.get("ANNO_OUT_DIR",    ROOT / "output"))
+HELPER_DIR    = Path(os.environ.get("ANNO_HELPER_DIR", ROOT / "outputs_helper"))
 OUT_DIR.mkdir(exist_ok=True)
+# 3-D boxes from the depth png ("depth") or from the cached point cloud index ("cloud")
+ENGINE_3D     = os.environ.get("ANNO_3D_ENGINE", "depth")
 
 # -------------------------------------------------------------- FastAPI ---
 app = FastAPI()
@@ -352,6 +357,26 @@ def metric_size_and_height(
     return w_m, h_m, height_m
 
 
+def read_cloud_points(ply_path: str) -> np.ndarray:
+    return np.asarray(o3d.io.read_point_cloud(ply_path).points)
+
+def cloud_records(img_id: str, annos2d: list, K, trans, q_cam2base, height, width) -> list:
+    """3-D records from the point cloud directly, see cloud_index.py."""
+    index = get_cloud_index(DATA_DIR / f"{img_id}_cloud.ply", K, (height, width), read_cloud_points)
+    R_cam2base = quaternion.as_rotation_matrix(q_cam2base)
+    rec3d = []
+    for a in annos2d:
+        bb = a["bbox"]
+        rect = ((bb["cx"], bb["cy"]), (bb["w"], bb["h"]), -bb["angle"])
+        fit = index.fit_rect(rect, R_cam2base, trans)
+        rec3d.append({
+            "name": a["category"],
+            "position": fit["position"] if fit else None,
+            "orientation": bb["angle"],
+            "size": fit["size"] if fit else [None, None, None]
+        })
+    return rec3d
+
 
 # ---------- End‑points ----------
 @app.get("/api/images")
@@ -369,21 +394,8 @@ def get_rgb(image_id: str):
 
 @app.get("/api/image/{image_id}/objects")  # dropdown helper
 def get_object_candidates(image_id: str):
-    def add_article(name: str) -> str:
-        name = name.strip()
-        article = "an" if name[0].lower() in "aeiou" else "a"
-        return f"{article} {name}"
     meta = read_json(DATA_DIR / f"{image_id}_metadata.json", {})
-    container = meta.get("container_name", [])
-    if isinstance(container, str):
-        try: container = ast.literal_eval(container)
-        except Exception: container = [container]
-    if isinstance(container, str): container = [container]
-    if isinstance(container, list):
-        container = [add_article(c) for c in container]
-    else:
-        container = [add_article(container)]
-    return [*map(str.strip, container), *map(str.strip, meta.get("object_names", []))]
+    return object_candidates(meta if isinstance(meta, dict) else {})
 
 @app.get("/api/image/{image_id}/annotations")
 def get_init_annotations(image_id: str):
@@ -426,6 +438,10 @@ def annotate_list(payload: AnnotationList):
     cx, cy = K[0, 2], K[1, 2]
     q_cam2base = get_rotation_quaternion(15)
 
+    if ENGINE_3D == "cloud":
+        rec3d = cloud_records(img_id, annos2d, K, trans, q_cam2base, height, width)
+        (OUT_DIR / f"{payload.image_id}_3d.json").write_text(json.dumps(rec3d, indent=2))
+        return {"status": "ok", "boxes_saved": len(annos2d), "rec3d": len(rec3d)}
 
     # ---------- build 3-D records ----------
     # load assets once
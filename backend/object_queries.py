@@ -0,0 +1,50 @@
+"""
+backend/object_queries.py  –  object names of a capture, from its *_metadata.json
+
+Shared by the annotation backend (get_object_candidates in main.py) and the
+helper-box inference (vlm_annotation/inference.py), so both query the same
+names. Standard library only.
+
+    object_candidates({"container_name": "['tray']", "object_names": ["cup"]})
+    → ["a tray", "cup"]
+"""
+import ast
+
+
+def add_article(name: str) -> str:
+    """'apple' -> 'an apple'."""
+    name = name.strip()
+    article = "an" if name[0].lower() in "aeiou" else "a"
+    return f"{article} {name}"
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def object_candidates(meta: dict) -> list[str]:
+    """
+    Containers (with article), then objects, of a capture's metadata.
+
+    `container_name` may be a list, a single name, or a list written as a
+    string ("['tray', 'box']"). Missing or null fields count as empty, and
+    entries that are empty or not names (null, numbers, dicts) are skipped.
+    """
+    container = meta.get("container_name")
+    if isinstance(container, str):
+        try:
+            container = ast.literal_eval(container)
+        except (ValueError, SyntaxError):
+            pass
+    containers = [add_article(c) for c in _as_list(container) if isinstance(c, str) and c.strip()]
+    objects = [o.strip() for o in _as_list(meta.get("object_names")) if isinstance(o, str) and o.strip()]
+    return containers + objects
+
+
+def metadata_query(meta: dict) -> str:
+    """Comma-separated object_candidates, the query string of inference.py."""
+    return ", ".join(object_candidates(meta))
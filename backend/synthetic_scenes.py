@@ -0,0 +1,141 @@
+"""
+backend/synthetic_scenes.py  –  synthetic captures for benchmarking main.py
+
+Writes the same files a real capture has, so the API can run without data/:
+    <id>_rgb.png, <id>_metadata.json, <id>_cloud.ply   → data dir
+    <id>.json  (owl-vit helper boxes)                  → helper dir
+
+The scene is a tilted table plane with a few box-shaped objects on it. The
+cloud is back-projected from random pixels, so it projects onto the image
+exactly like a real organised capture.
+
+    python synthetic_scenes.py --out /tmp/synth --num_scenes 8 --num_points 300000
+"""
+from pathlib import Path
+import argparse, json, math
+import numpy as np
+import cv2
+
+
+OBJECT_NAMES = ["cup", "bowl", "spoon", "fork", "knife", "plate", "apple", "bottle"]
+
+
+# ---- geometry ---------------------------------------------------------------
+def intrinsics(width: int, height: int) -> np.ndarray:
+    f = 0.9 * width
+    return np.array([[f, 0, width / 2], [0, f, height / 2], [0, 0, 1]], dtype=np.float64)
+
+def table_depth(v: np.ndarray, height: int, z_table: float = 0.9) -> np.ndarray:
+    """Depth (m) of the table plane per image row, farther at the top."""
+    return z_table * (1.0 + 0.25 * (height / 2 - v) / height)
+
+def write_ply(path: Path, xyz: np.ndarray):
+    """Binary little-endian PLY with float x/y/z, readable by open3d."""
+    xyz = np.ascontiguousarray(xyz, dtype="<f4")
+    header = (
+        "ply\nformat binary_little_endian 1.0\n"
+        f"element vertex {len(xyz)}\n"
+        "property float x\nproperty float y\nproperty float z\nend_header\n"
+    )
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        f.write(xyz.tobytes())
+
+
+# ---- scenes -----------------------------------------------------------------
+def random_objects(rng: np.random.Generator, width: int, height: int, num_objects: int) -> list:
+    """[{"category", "cx", "cy", "w", "h", "angle", "height_m"}] in pixels / metres."""
+    objects = []
+    for i in range(num_objects):
+        w, h = rng.uniform(0.06, 0.14, 2) * width
+        objects.append({
+            "category": OBJECT_NAMES[i % len(OBJECT_NAMES)],
+            "cx": float(rng.uniform(0.2, 0.8) * width),
+            "cy": float(rng.uniform(0.25, 0.75) * height),
+            "w": float(w), "h": float(h),
+            "angle": float(rng.uniform(-30, 30)),
+            "height_m": float(rng.uniform(0.03, 0.15)),
+        })
+    return objects
+
+def make_scene(data_dir: Path, image_id: str,
+               width: int = 1280, height: int = 720,
+               num_points: int = 300_000, num_objects: int = 5,
+               helper_dir: Path | None = None, seed: int = 0) -> list:
+    """
+    Write one synthetic capture, return its helper items
+    ({bbox:{cx,cy,w,h,angle}, category, conf}, as in outputs_helper/).
+    """
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    K = intrinsics(width, height)
+    objects = random_objects(rng, width, height, num_objects)
+
+    # object height above the table per pixel, later objects on top
+    lift = np.zeros((height, width), dtype=np.float32)
+    rgb = np.full((height, width, 3), 150, dtype=np.uint8)
+    rgb = cv2.add(rgb, rng.integers(0, 30, (height, width, 3), dtype=np.uint8))
+    for o in objects:
+        poly = cv2.boxPoints(((o["cx"], o["cy"]), (o["w"], o["h"]), -o["angle"])).astype(np.int32)
+        cv2.fillPoly(lift, [poly], o["height_m"])
+        cv2.fillPoly(rgb, [poly], [int(c) for c in rng.integers(0, 255, 3)])
+    cv2.imwrite(str(data_dir / f"{image_id}_rgb.png"), rgb)
+
+    # ---- cloud: random pixels back-projected with 2 mm noise ---- #
+    u = rng.uniform(0, width - 1, num_points)
+    v = rng.uniform(0, height - 1, num_points)
+    z = table_depth(v, height) - lift[v.round().astype(int), u.round().astype(int)]
+    z = z + rng.normal(0, 0.002, num_points)
+    x = (u - K[0, 2]) * z / K[0, 0]
+    y = (v - K[1, 2]) * z / K[1, 1]
+    write_ply(data_dir / f"{image_id}_cloud.ply", np.stack([x, y, z], axis=1))
+
+    # ---- metadata: camera tilted 15° above the table ---- #
+    tilt = math.radians(15)
+    meta = {
+        "camera_intrinsics": {"K": K.ravel().tolist(), "height": height, "width": width},
+        "camera_to_base_link": {
+            "translation": {"x": 0.0, "y": 0.0, "z": 0.9},
+            "rotation": {"x": 0.0, "y": math.sin(tilt / 2), "z": 0.0, "w": math.cos(tilt / 2)},
+        },
+        "container_name": "tray",
+        "object_names": sorted({o["category"] for o in objects}),
+    }
+    (data_dir / f"{image_id}_metadata.json").write_text(json.dumps(meta, indent=2))
+
+    items = [{
+        "bbox": {k: o[k] for k in ("cx", "cy", "w", "h", "angle")},
+        "category": o["category"],
+        "conf": float(rng.uniform(0.2, 0.9)),
+    } for o in objects]
+    if helper_dir is not None:
+        helper_dir = Path(helper_dir)
+        helper_dir.mkdir(parents=True, exist_ok=True)
+        (helper_dir / f"{image_id}.json").write_text(json.dumps({f"{image_id}_rgb": items}, indent=2))
+    return items
+
+def make_dataset(root: Path, num_scenes: int = 8, **kwargs) -> list:
+    """
+    Write num_scenes captures to root/data (helper boxes to root/outputs_helper),
+    return the image ids.
+    """
+    root = Path(root)
+    ids = [f"scene_{i:02d}_0" for i in range(num_scenes)]
+    for i, image_id in enumerate(ids):
+        make_scene(root / "data", image_id, helper_dir=root / "outputs_helper", seed=i, **kwargs)
+    return ids
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", type=str, required=True, help="writes <out>/data and <out>/outputs_helper")
+    ap.add_argument("--num_scenes", type=int, default=8)
+    ap.add_argument("--num_points", type=int, default=300_000)
+    ap.add_argument("--num_objects", type=int, default=5)
+    ap.add_argument("--width", type=int, default=1280)
+    ap.add_argument("--height", type=int, default=720)
+    args = ap.parse_args()
+    ids = make_dataset(Path(args.out), args.num_scenes, width=args.width, height=args.height,
+                       num_points=args.num_points, num_objects=args.num_objects)
+    print(f"wrote {len(ids)} scenes to {args.out}")
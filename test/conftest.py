@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+# nanoowl is imported as a top-level package, the same way inference.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / "vlm_annotation"))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def tiny_model_root(tmp_path_factory):
+    """Directory with random OWL-ViT / CLIP checkpoints, see nanoowl.tiny_models."""
+    pytest.importorskip("transformers")
+    pytest.importorskip("clip")
+    from nanoowl.tiny_models import save_tiny_owl_model, save_tiny_clip_model
+
+    root = tmp_path_factory.mktemp("tiny_models")
+    save_tiny_owl_model(str(root / "owlvit_tiny"))
+    save_tiny_clip_model(str(root / "clip_tiny"))
+    return root
+
+
+@pytest.fixture(scope="session")
+def tiny_predictors(tiny_model_root):
+    from nanoowl.tiny_models import build_tiny_predictors
+
+    return build_tiny_predictors(str(tiny_model_root), device="cpu")
@@ -0,0 +1,64 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("clip")
+pytest.importorskip("transformers")
+
+from nanoowl.clip_predictor import ClipTextEmbeddingCache
+
+
+@pytest.fixture
+def clip_predictor(tiny_predictors):
+    predictor = tiny_predictors[1]
+    cache, max_rois_per_batch = predictor.text_embedding_cache, predictor.max_rois_per_batch
+    predictor.text_embedding_cache = ClipTextEmbeddingCache()
+    yield predictor
+    predictor.text_embedding_cache, predictor.max_rois_per_batch = cache, max_rois_per_batch
+
+
+def test_encode_text_hits_cache(clip_predictor, monkeypatch):
+    expected = clip_predictor.encode_text(["red", "blue"]).text_embeds
+    assert len(clip_predictor.text_embedding_cache) == 2
+    assert (clip_predictor.model_name, "cpu", "fp32", "red") in clip_predictor.text_embedding_cache
+
+    encoded = []
+    encode_text = clip_predictor.clip_model.encode_text
+    monkeypatch.setattr(clip_predictor.clip_model, "encode_text", lambda tokens: encoded.append(len(tokens)) or encode_text(tokens))
+    output = clip_predictor.encode_text(["blue", "green", "red", "blue"]).text_embeds
+
+    assert encoded == [1]  # only "green" is encoded
+    torch.testing.assert_close(output[[2, 0]], expected[[0, 1]])
+    torch.testing.assert_close(output[3], output[0])
+
+
+def test_cache_key_includes_device_and_precision(clip_predictor, monkeypatch):
+    clip_predictor.encode_text(["red"])
+    monkeypatch.setattr(clip_predictor, "precision", "bf16")
+    assert clip_predictor._text_cache_key("red") not in clip_predictor.text_embedding_cache
+    monkeypatch.setattr(clip_predictor, "precision", "fp32")
+    assert clip_predictor._text_cache_key("red") in clip_predictor.text_embedding_cache
+
+
+def test_encode_text_empty(clip_predictor):
+    text_embeds = clip_predictor.encode_text([]).text_embeds
+    embed_dim = clip_predictor.encode_text(["red"]).text_embeds.shape[1]
+    assert text_embeds.shape == (0, embed_dim)
+
+
+@pytest.mark.parametrize("num_rois", [5, 70])
+def test_encode_rois_micro_batches(clip_predictor, monkeypatch, num_rois):
+    image = torch.randn(1, 3, 96, 128)
+    rois = torch.rand(num_rois, 4) * 40
+    rois[:, 2:] += rois[:, :2] + 8
+
+    clip_predictor.max_rois_per_batch = None
+    expected = clip_predictor.encode_rois(image, rois).image_embeds
+
+    clip_predictor.max_rois_per_batch = 64
+    batch_sizes = []
+    encode_image = clip_predictor.encode_image
+    monkeypatch.setattr(clip_predictor, "encode_image", lambda roi_images: batch_sizes.append(len(roi_images)) or encode_image(roi_images))
+    output = clip_predictor.encode_rois(image, rois).image_embeds
+
+    assert batch_sizes == ([64, 6] if num_rois == 70 else [5])
+    torch.testing.assert_close(output, expected, rtol=1e-4, atol=1e-4)
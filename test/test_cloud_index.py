@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from cloud_index import CloudIndex, clear_cloud_indexes, get_cloud_index
+
+
+def look_at(cam_pos, target):
+    """Camera-to-base rotation of a camera (x right, y down, z forward) looking at target."""
+    z = target - cam_pos
+    z = z / np.linalg.norm(z)
+    x = np.cross(z, [0.0, 0.0, 1.0])
+    x = x / np.linalg.norm(x)
+    return np.stack([x, np.cross(z, x), z], axis=1)
+
+
+def box_scene(rng, size, yaw_deg, n=40000):
+    """Base-frame points of a table (z = 0) and a box standing on it, and its 8 corners."""
+    L, W, H = size
+    c, s = np.cos(np.radians(yaw_deg)), np.sin(np.radians(yaw_deg))
+    rot = np.array([[c, -s], [s, c]])
+    table = np.c_[rng.uniform(-0.4, 0.4, (n, 2)), np.zeros(n)]
+    local = table[:, :2] @ rot
+    table = table[(np.abs(local[:, 0]) > L / 2) | (np.abs(local[:, 1]) > W / 2)]
+    # points on the box surface: pick a face per point, then uniform on it
+    p = rng.uniform(-0.5, 0.5, (n, 3)) * [L, W, H]
+    face = rng.integers(0, 5, n)
+    p[face == 0, 2] = H / 2
+    p[face == 1, 0] = L / 2; p[face == 2, 0] = -L / 2
+    p[face == 3, 1] = W / 2; p[face == 4, 1] = -W / 2
+    box = np.c_[p[:, :2] @ rot.T, p[:, 2] + H / 2]
+    corners = np.array([[x, y, z] for x in (-L / 2, L / 2) for y in (-W / 2, W / 2) for z in (0, H)])
+    corners = np.c_[corners[:, :2] @ rot.T, corners[:, 2]]
+    return np.concatenate([table, box]), corners
+
+
+@pytest.mark.parametrize("yaw_deg", [30, -70])
+def test_fit_rect_recovers_box(yaw_deg):
+    rng = np.random.default_rng(0)
+    K = np.array([[600.0, 0, 320], [0, 600.0, 240], [0, 0, 1]])
+    cam_pos = np.array([-0.6, 0.1, 0.5])
+    R = look_at(cam_pos, np.zeros(3))
+    pts_base, corners = box_scene(rng, (0.12, 0.08, 0.10), yaw_deg)
+    to_cam = lambda p: (p - cam_pos) @ R      # inverse of p_base = R p_cam + t
+
+    index = CloudIndex(to_cam(pts_base), K, (480, 640))
+    cc = to_cam(corners)
+    uv = (cc[:, :2] / cc[:, 2:]) * [K[0, 0], K[1, 1]] + K[:2, 2]
+    rect = cv2.minAreaRect(uv.astype(np.float32))
+
+    fit = index.fit_rect(rect, R, cam_pos)
+    w, h, height = fit["size"]
+    assert abs(height - 0.10) < 0.005
+    assert np.allclose(sorted([w, h]), [0.08, 0.12], atol=0.005)
+    assert np.allclose(fit["position"], [0, 0, 0.05], atol=0.005)
+
+
+def test_query_matches_polygon_and_cache(tmp_path):
+    rng = np.random.default_rng(1)
+    K = np.array([[500.0, 0, 160], [0, 500.0, 120], [0, 0, 1]])
+    u, v, z = rng.uniform(0, 319, 5000), rng.uniform(0, 239, 5000), rng.uniform(0.5, 1.5, 5000)
+    xyz = np.stack([(u - 160) * z / 500, (v - 120) * z / 500, z], axis=1)
+    index = CloudIndex(xyz, K, (240, 320), cell_px=8)
+
+    rect = ((150.5, 110.2), (90, 40), 25)
+    poly = cv2.boxPoints(rect).reshape(-1, 1, 2)
+    expected = [i for i in range(len(index))
+                if cv2.pointPolygonTest(poly, (float(index.u[i]), float(index.v[i])), False) >= 0]
+    assert sorted(index.query_rect(rect)) == expected
+
+    ply = tmp_path / "cloud.ply"
+    ply.write_bytes(b"")
+    loads = []
+    load = lambda path: loads.append(path) or xyz
+    clear_cloud_indexes()
+    first = get_cloud_index(ply, K, (240, 320), load)
+    assert get_cloud_index(ply, K, (240, 320), load) is first
+    assert len(loads) == 1
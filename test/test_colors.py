@@ -0,0 +1,15 @@
+import pytest
+
+from nanoowl.colors import get_colors
+
+
+def test_get_colors_matches_matplotlib_pink():
+    matplotlib = pytest.importorskip("matplotlib")
+    for count in (1, 2, 8, 37, 256):
+        cmap = matplotlib.colormaps["pink"].resampled(count)
+        expected = tuple(tuple(int(255 * value) for value in cmap(i)) for i in range(count))
+        assert get_colors(count) == expected
+
+
+def test_get_colors_is_memoized():
+    assert get_colors(8) is get_colors(8)
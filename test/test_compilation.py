@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image as PILImage
+
+from nanoowl.compilation import compile_module
+
+
+def test_torchscript_owl_encoder_matches_eager(tiny_model_root):
+    from nanoowl.owl_predictor import OwlPredictor
+
+    name = str(tiny_model_root / "owlvit_tiny")
+    image = PILImage.fromarray(np.random.RandomState(0).randint(0, 255, (240, 320, 3), dtype=np.uint8))
+    eager = OwlPredictor(name, device="cpu")
+    reference = eager.encode_full_image(image)
+    for image_encoding in ("full", "lazy_boxes"):
+        compiled = OwlPredictor(name, device="cpu", compile_mode="torchscript", image_encoding=image_encoding)
+        assert compiled.compile_mode == "torchscript"
+        output = compiled.encode_full_image(image)
+        assert torch.allclose(output.image_class_embeds, reference.image_class_embeds, atol=1e-4)
+        assert torch.allclose(output.logit_scale, reference.logit_scale, atol=1e-4)
+        if image_encoding == "full":
+            assert torch.allclose(output.pred_boxes, reference.pred_boxes, atol=1e-2)
+        else:
+            assert output.pred_boxes is None
+
+
+def test_torchscript_clip_encoder_matches_eager(tiny_model_root):
+    from nanoowl.clip_predictor import ClipPredictor
+
+    name = str(tiny_model_root / "clip_tiny" / "clip.pt")
+    images = torch.randn(3, 3, 224, 224)  # other batch size than the warm-up
+    reference = ClipPredictor(name, device="cpu").encode_image(images).image_embeds
+    compiled = ClipPredictor(name, device="cpu", compile_mode="torchscript")
+    assert compiled.compile_mode == "torchscript"
+    assert torch.allclose(compiled.encode_image(images).image_embeds, reference, atol=1e-4)
+
+
+class _Failing(torch.nn.Module):
+    def forward(self, x):
+        raise RuntimeError("unsupported")
+
+
+def test_failed_compilation_falls_back():
+    with pytest.warns(UserWarning, match="running the image encoder eagerly"):
+        assert compile_module(_Failing(), "torchscript", [torch.zeros(1)]) is None
+    assert compile_module(_Failing(), "none", [torch.zeros(1)]) is None
+    with pytest.raises(ValueError):
+        compile_module(_Failing(), "tensorrt", [torch.zeros(1)])
@@ -0,0 +1,26 @@
+from completion_manifest import CompletionManifest
+
+
+def test_rerun_skips_only_unchanged_images(tmp_path):
+    manifest = CompletionManifest(tmp_path / "completed.jsonl")
+    inputs = dict(rgb_sha256="abc", query="a cup, a bowl", threshold=0.1)
+    (tmp_path / "scene_01_0.json").write_text("{}")
+    manifest.record("scene_01_0", inputs, [tmp_path / "scene_01_0.json"])
+    manifest.record("scene_01_1", inputs, [])  # no detections, nothing written
+
+    # a crash while appending leaves a truncated last line
+    with open(tmp_path / "completed.jsonl", "a") as f:
+        f.write('{"image_id": "scene_01_2", "inp')
+
+    manifest = CompletionManifest(tmp_path / "completed.jsonl")
+    assert len(manifest) == 2
+    assert manifest.is_up_to_date("scene_01_0", inputs)
+    assert manifest.is_up_to_date("scene_01_1", inputs)
+    assert not manifest.is_up_to_date("scene_01_2", inputs)
+    assert not manifest.is_up_to_date("scene_01_0", dict(inputs, query="a cup"))
+    assert not manifest.is_up_to_date("scene_01_0", dict(inputs, threshold=0.2))
+
+    (tmp_path / "scene_01_0.json").write_text('{"edited": true}')
+    assert not manifest.is_up_to_date("scene_01_0", inputs)
+    (tmp_path / "scene_01_0.json").unlink()
+    assert not manifest.is_up_to_date("scene_01_0", inputs)
@@ -0,0 +1,40 @@
+import pytest
+import torch
+from torchvision.ops import roi_align
+
+
+def reference_extract_rois(image, rois, image_size, padding_scale=1.0):
+    """extract_rois as it was, masking with an N x H x W mask from a full meshgrid."""
+    w = padding_scale * (rois[..., 2] - rois[..., 0]) / 2
+    h = padding_scale * (rois[..., 3] - rois[..., 1]) / 2
+    cx = (rois[..., 0] + rois[..., 2]) / 2
+    cy = (rois[..., 1] + rois[..., 3]) / 2
+    s = torch.max(w, h)
+    rois = torch.stack([cx - s, cy - s, cx + s, cy + s], dim=-1)
+    mesh_grid = torch.stack(torch.meshgrid(
+        torch.linspace(0., 1., image_size[0]),
+        torch.linspace(0., 1., image_size[1]),
+        indexing="ij"
+    ))
+    pad_x = (s - w) / (2 * s)
+    pad_y = (s - h) / (2 * s)
+    mask_x = (mesh_grid[1][None, ...] > pad_x[..., None, None]) & (mesh_grid[1][None, ...] < (1. - pad_x[..., None, None]))
+    mask_y = (mesh_grid[0][None, ...] > pad_y[..., None, None]) & (mesh_grid[0][None, ...] < (1. - pad_y[..., None, None]))
+    mask = mask_x & mask_y
+    return roi_align(image, [rois], output_size=image_size) * mask[:, None, :, :], rois
+
+
+@pytest.mark.parametrize("predictor_index", [0, 1], ids=["owl", "clip"])
+def test_row_column_mask_matches_full_mask(tiny_predictors, predictor_index):
+    predictor = tiny_predictors[predictor_index]
+    image_size = tuple(predictor.get_image_size())
+    image = torch.rand(1, 3, 180, 320)
+    rois = torch.tensor([
+        [10., 40., 300., 90.],     # wide
+        [150., 5., 190., 170.],    # tall
+        [60., 60., 120., 120.],    # square, no padding
+    ])
+    expected_images, expected_rois = reference_extract_rois(image, rois, image_size, padding_scale=1.2)
+    roi_images, padded_rois = predictor.extract_rois(image, rois, pad_square=True, padding_scale=1.2)
+    assert torch.equal(padded_rois, expected_rois)
+    assert torch.equal(roi_images, expected_images)
@@ -0,0 +1,94 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("cv2")
+
+import numpy as np
+import torch
+from torchvision.ops import roi_align
+
+from nanoowl.image_preprocessor import ImagePreprocessor
+
+
+def test_preprocess_images_rois_match_single_images():
+    rng = np.random.RandomState(0)
+    images = [rng.randint(0, 255, (48, 64, 3), dtype=np.uint8) for _ in range(3)]
+    preprocessor = ImagePreprocessor().eval()
+
+    batch = preprocessor.preprocess_images(images)
+    assert batch.shape == (3, 3, 48, 64)
+
+    rois = torch.tensor([[4., 2., 40., 30.], [0., 0., 64., 48.]])
+    for i, image in enumerate(images):
+        expected = roi_align(preprocessor.preprocess_image(image), [rois], output_size=(8, 8))
+        indexed_rois = torch.cat([torch.full((2, 1), float(i)), rois], dim=1)
+        torch.testing.assert_close(roi_align(batch, indexed_rois, output_size=(8, 8)), expected)
+
+
+def test_preprocess_images_pads_smaller_images_with_zeros():
+    images = [np.zeros((20, 30, 3), dtype=np.uint8), np.zeros((10, 40, 3), dtype=np.uint8)]
+    batch = ImagePreprocessor().eval().preprocess_images(images)
+    assert batch.shape == (2, 3, 20, 40)
+    assert torch.all(batch[0, :, :, 30:] == 0)
+    assert torch.all(batch[1, :, 10:, :] == 0)
+
+
+def smooth_image(height, width):
+    """Low-frequency content, on which area and bilinear resampling agree."""
+    y, x = np.mgrid[0:height, 0:width] / max(height, width)
+    channels = [np.sin(3 * x + c) * np.cos(2 * y - c) for c in range(3)]
+    return np.ascontiguousarray(((np.stack(channels, axis=-1) + 1) * 127.5).astype(np.uint8))
+
+
+@pytest.mark.parametrize("pad_square", [True, False])
+@pytest.mark.parametrize("shape", [(120, 200), (200, 120)])
+def test_fused_preprocess_matches_extract_rois(tiny_model_root, pad_square, shape):
+    from nanoowl.owl_predictor import OwlPredictor
+
+    name = str(tiny_model_root / "owlvit_tiny")
+    image = smooth_image(*shape)
+    owl = OwlPredictor(name, device="cpu", image_encoding="lazy_boxes")
+    fused = OwlPredictor(name, device="cpu", image_encoding="lazy_boxes", fused_preprocess=True)
+
+    full_roi = torch.tensor([[0., 0., shape[1], shape[0]]])
+    expected, _ = owl.extract_rois(owl.image_preprocessor.preprocess_image(image), full_roi, pad_square=pad_square)
+    actual = fused.image_preprocessor.preprocess_resized(image, fused.image_size, pad_square=pad_square)
+    assert actual.shape == expected.shape
+    # same letterbox (padding rows / columns are 0, up to a pixel at the edge), content differs by resampling only
+    zero_actual, zero_expected = (actual == 0).all(dim=1)[0], (expected == 0).all(dim=1)[0]
+    for axis in (0, 1):
+        assert abs(int(zero_actual.all(dim=axis).sum()) - int(zero_expected.all(dim=axis).sum())) <= 2
+    assert (actual - expected).abs().mean() < 0.02
+
+    # and the rois the boxes are mapped back with are identical
+    torch.testing.assert_close(fused.encode_full_image(image, pad_square=pad_square).rois,
+                               owl.encode_full_image(image, pad_square=pad_square).rois)
+
+
+def test_preprocess_resized_converts_or_rejects_other_formats():
+    from PIL import Image as PILImage
+
+    preprocessor = ImagePreprocessor()
+    rgb = smooth_image(60, 80)
+    expected = preprocessor.preprocess_resized(rgb, 32)
+
+    rgba = PILImage.fromarray(np.dstack([rgb, np.full(rgb.shape[:2], 255, dtype=np.uint8)]), mode="RGBA")
+    torch.testing.assert_close(preprocessor.preprocess_resized(rgba, 32), expected)
+
+    for array in (rgb[..., 0], np.dstack([rgb, rgb[..., :1]]), rgb.astype(np.float32)):
+        with pytest.raises(ValueError):
+            preprocessor.preprocess_resized(array, 32)
+
+
+def test_preprocess_resized_host_buffers_per_thread():
+    from concurrent.futures import ThreadPoolExecutor
+
+    preprocessor = ImagePreprocessor()
+    images = [smooth_image(60, 80), 255 - smooth_image(60, 80)]
+    expected = [preprocessor.preprocess_resized(image, 32) for image in images]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for _ in range(20):
+            outputs = list(executor.map(lambda image: preprocessor.preprocess_resized(image, 32), images))
+            for output, reference in zip(outputs, expected):
+                torch.testing.assert_close(output, reference)
+    assert len({thread for thread, _ in preprocessor._host_buffers}) >= 2
@@ -0,0 +1,121 @@
+import argparse
+import json
+
+import pytest
+
+from inference import launch_local_workers, merge_manifests, run_inputs, shard_by_scene, shard_manifest_path
+
+
+def make_queries(num_scenes):
+    return {f"scene_{i:02d}_{j}": "a cup" for i in range(1, num_scenes + 1) for j in range(3)}
+
+
+def test_shards_are_contiguous_scene_ranges():
+    queries = make_queries(10)
+    shards = [shard_by_scene(queries, 3, i) for i in range(3)]
+
+    assert sorted(k for s in shards for k in s) == sorted(queries)
+    assert [len(s) for s in shards] == [9, 9, 12]
+    assert list(shards[0]) == [f"scene_{i:02d}_{j}" for i in range(1, 4) for j in range(3)]
+    # independent of the order the metadata was scanned in
+    assert shard_by_scene(dict(reversed(list(queries.items()))), 3, 1) == shards[1]
+
+    with pytest.raises(ValueError):
+        shard_by_scene(queries, 3, 3)
+
+
+def test_merge_manifests(tmp_path):
+    for i, (images, seconds) in enumerate([(6, 3.0), (9, 4.5)]):
+        with open(shard_manifest_path(tmp_path, 2, i), "w") as f:
+            json.dump(dict(shard_index=i, images=images, seconds=seconds), f)
+
+    manifest = merge_manifests(tmp_path, 2)
+    assert manifest["images"] == 15
+    assert manifest["wall_seconds"] == 4.5
+    assert json.loads((tmp_path / "run_manifest.json").read_text()) == manifest
+
+    with pytest.raises(FileNotFoundError):
+        merge_manifests(tmp_path, 3)
+
+
+def test_run_inputs_track_what_changes_outputs(tmp_path):
+    image_path = tmp_path / "scene_01_0_rgb.png"
+    image_path.write_bytes(b"rgb")
+    args = argparse.Namespace(
+        device="cpu", image_encoder_backend="torch", onnx_path=None, quantize=None, quantized_weights=None,
+        fused_preprocess=False, image_encoding="full", precision="fp32", threshold=0.1, nms_threshold=0.5,
+        viz="png", viz_scale=1.0
+    )
+    inputs = run_inputs(args, image_path, "a cup")
+
+    # speed only, reruns must not redo the image
+    assert run_inputs(argparse.Namespace(**{**vars(args), "image_encoding": "lazy_boxes"}), image_path, "a cup") == inputs
+    for name, value in [("device", "mps"), ("quantized_weights", "owl_int8.pt"), ("onnx_path", "owl.onnx"), ("precision", "bf16")]:
+        assert run_inputs(argparse.Namespace(**{**vars(args), name: value}), image_path, "a cup") != inputs
+
+
+def test_local_workers_reject_shards(tmp_path):
+    # shard 2 of 4 must not silently become shards 0 and 1 of 2
+    args = argparse.Namespace(shards=4, shard_index=2, local_workers=2, pin_cpus=False, out_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        launch_local_workers(args)
+    assert (args.shards, args.shard_index) == (4, 2)
+    assert list(tmp_path.iterdir()) == []
+
+
+def run_args(img_dir, out_dir, **kwargs):
+    return argparse.Namespace(**{**dict(
+        img_dir=str(img_dir), out_dir=str(out_dir), scenes=None, shards=1, shard_index=0, metadata_workers=1,
+        device="cpu", image_encoder_backend="torch", onnx_path=None, quantize=None, quantized_weights=None,
+        fused_preprocess=False, image_encoding="full", precision="fp32", threshold=0.1, nms_threshold=0.5,
+        viz="png", viz_scale=1.0, force=False, profile=None
+    ), **kwargs})
+
+
+def test_resumed_run_restores_preview_tracker(tmp_path, monkeypatch):
+    torch = pytest.importorskip("torch")
+    import inference
+    from nanoowl.owl_predictor import OwlDecodeOutput
+
+    img_dir, out_dir = tmp_path / "dataset", tmp_path / "outputs"
+    img_dir.mkdir()
+    for view in range(3):
+        (img_dir / f"scene_01_{view}_metadata.json").write_text(json.dumps({"object_names": ["cup"]}))
+        (img_dir / f"scene_01_{view}_rgb.png").write_bytes(bytes([view]))
+
+    def fake_process_image(image_path, query, out_path, predictor, tracker=None, **kwargs):
+        # a cup in the same place in every view; from view 1 on a second, more confident one elsewhere
+        view = int(out_path.name.rsplit("_", 1)[1])
+        output = OwlDecodeOutput(
+            labels=torch.tensor([0, 0]),
+            scores=torch.tensor([0.9, 0.5] if view == 0 else [0.5, 0.9]),
+            boxes=torch.tensor([[0., 0., 10., 10.], [100., 100., 110., 110.]]),
+            input_indices=torch.zeros(2, dtype=torch.int64)
+        )
+        out_path.with_suffix(".json").write_text(json.dumps(tracker.select(output, ["cup"])))
+        return [out_path.with_suffix(".json")]
+
+    monkeypatch.setattr(inference, "process_image", fake_process_image)
+    monkeypatch.setattr(inference, "build_predictor", lambda args: object())
+
+    inference.run_shard(run_args(img_dir, out_dir))
+    full = [json.loads((out_dir / f"scene_01_{view}.json").read_text()) for view in range(3)]
+    assert full == [[0], [0], [0]]  # the pick stays on the first cup
+
+    (out_dir / "scene_01_2.json").unlink()
+    manifest = inference.run_shard(run_args(img_dir, out_dir))
+    assert (manifest["images"], manifest["up_to_date"]) == (1, 2)
+    assert json.loads((out_dir / "scene_01_2.json").read_text()) == full[2]
+
+
+def test_rerun_without_detections_removes_old_outputs(tmp_path):
+    import inference
+
+    out_path = tmp_path / "scene_01_0"
+    for suffix in (".json", ".png", ".jpg"):
+        out_path.with_suffix(suffix).write_text("old")
+
+    inference.remove_stale_outputs(out_path, [out_path.with_suffix(".json")])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["scene_01_0.json"]
+    inference.remove_stale_outputs(out_path, [])
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,38 @@
+import json
+
+from inference import find_metadata, iter_queries_from_metadata, metadata_query
+
+
+def test_metadata_query_normalizes_container_name():
+    objects = {"object_names": ["cup ", "apple"]}
+    assert metadata_query(dict(objects, container_name="['tray', 'oven']")) == "a tray, an oven, cup, apple"
+    assert metadata_query(dict(objects, container_name=["tray"])) == "a tray, cup, apple"
+    assert metadata_query(dict(objects, container_name="egg box")) == "an egg box, cup, apple"
+    assert metadata_query({"object_names": ["cup"]}) == "cup"
+
+
+def test_metadata_query_skips_malformed_entries():
+    assert metadata_query({"container_name": None, "object_names": None}) == ""
+    assert metadata_query({"container_name": ["tray", None, 3, " "], "object_names": ["cup", None, 7, ""]}) == "a tray, cup"
+    assert metadata_query({"container_name": "[None]", "object_names": "apple"}) == "apple"
+
+
+def test_scan_filters_scenes_and_yields_in_order(tmp_path):
+    for i in (1, 2, 27, 28):
+        for j in range(3):
+            sub = tmp_path / f"batch_{i // 10}"
+            sub.mkdir(exist_ok=True)
+            (sub / f"scene_{i:02d}_{j}_metadata.json").write_text(
+                json.dumps({"container_name": "['tray']", "object_names": [f"cup {i}"]}))
+    (tmp_path / "scene_03_0_metadata.json").write_text("{not json")
+    (tmp_path / "scene_04_0_metadata.json").write_text("[1, 2]")
+
+    paths = find_metadata(tmp_path)
+    assert len(paths) == 14 and list(paths) == sorted(paths)
+    assert list(find_metadata(tmp_path, "01_1..27_0")) == \
+        ["scene_01_1", "scene_01_2", "scene_02_0", "scene_02_1", "scene_02_2", "scene_03_0", "scene_04_0", "scene_27_0"]
+    assert list(find_metadata(tmp_path, "28,01_0")) == ["scene_01_0", "scene_28_0", "scene_28_1", "scene_28_2"]
+
+    queries = list(iter_queries_from_metadata(paths, num_workers=4))
+    assert [image_id for image_id, _ in queries] == [k for k in paths if k not in ("scene_03_0", "scene_04_0")]
+    assert queries[0] == ("scene_01_0", "a tray, cup 1")
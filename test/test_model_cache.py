@@ -0,0 +1,29 @@
+import torch
+
+
+def test_cached_models_match_original(tiny_model_root, tmp_path):
+    from nanoowl.model_cache import load_clip_model, load_owl_model
+
+    owl_name = str(tiny_model_root / "owlvit_tiny")
+    clip_name = str(tiny_model_root / "clip_tiny" / "clip.pt")
+    for load, name in [(load_owl_model, owl_name), (load_clip_model, clip_name)]:
+        reference = load(name, "cpu").state_dict()
+        load(name, "cpu", str(tmp_path))  # fills the cache
+        cached = load(name, "cpu", str(tmp_path)).state_dict()
+        assert cached.keys() == reference.keys()
+        for key, tensor in reference.items():
+            assert torch.equal(cached[key], tensor), key
+
+    clip_model = load_clip_model(clip_name, "cpu", str(tmp_path))
+    tokens = torch.randint(0, 100, (2, clip_model.context_length))
+    with torch.no_grad():
+        assert torch.equal(clip_model.encode_text(tokens), load_clip_model(clip_name, "cpu").encode_text(tokens))
+
+
+def test_predictors_share_models(tiny_model_root):
+    from nanoowl.owl_predictor import OwlPredictor
+
+    name = str(tiny_model_root / "owlvit_tiny")
+    first, second = OwlPredictor(name, device="cpu"), OwlPredictor(name, device="cpu")
+    assert first.model is second.model and first.processor is second.processor
+    assert OwlPredictor(name, device="cpu", share_model=False).model is not first.model
@@ -0,0 +1,159 @@
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+
+import cv2
+import numpy as np
+import torch
+
+from nanoowl import owl_drawing
+from nanoowl.owl_drawing import DetectionTracker, draw_rotated_label, draw_axes, filter_detections_by_query
+from nanoowl.owl_predictor import OwlDecodeOutput
+
+
+def draw_rotated_label_full_frame(image, text, textOrg, angle, font=cv2.FONT_HERSHEY_SIMPLEX,
+                                  font_scale=1, thickness=2, color=(0, 0, 255)):
+    # previous implementation: text on a full-frame overlay, warped and added
+    overlay = np.zeros_like(image)
+    (text_w, text_h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+    textPos = (textOrg[0] - text_w // 2, textOrg[1] + text_h // 2)
+    cv2.putText(overlay, text, textPos, font, font_scale, color, thickness, cv2.LINE_AA)
+    M = cv2.getRotationMatrix2D(textOrg, angle, 1)
+    rotated_overlay = cv2.warpAffine(overlay, M, (image.shape[1], image.shape[0]),
+                                     flags=cv2.INTER_LINEAR,
+                                     borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+    return cv2.add(image, rotated_overlay)
+
+
+@pytest.mark.parametrize("angle", [0, 30, 90, 180, -45])
+@pytest.mark.parametrize("origin", [(160, 120), (5, 8), (315, 236), (-20, 100), (200, 400)])
+def test_draw_rotated_label_matches_full_frame(angle, origin):
+    image = np.random.RandomState(0).randint(0, 200, (240, 320, 3), dtype=np.uint8)
+    kwargs = dict(font_scale=0.9, thickness=2, color=(255, 255, 255))
+
+    expected = draw_rotated_label_full_frame(image, "a red cup", origin, angle, **kwargs)
+    actual = draw_rotated_label(image, "a red cup", origin, angle, **kwargs)
+
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_draw_rotated_label_does_not_modify_input_by_default():
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    output = draw_rotated_label(image, "x", (32, 32), 180)
+    assert output.any()
+    assert not image.any()
+
+
+def test_draw_axes_matches_full_frame():
+    image = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    expected = image.copy()
+    h, w = expected.shape[:2]
+    origin = (w - 20, h - 20)
+    cv2.line(expected, origin, (origin[0] - 100, origin[1]), (0, 255, 0), 2)
+    expected = draw_rotated_label_full_frame(expected, "y", (origin[0] - 115, origin[1] + 5), 180,
+                                             font_scale=0.7, thickness=2, color=(0, 255, 0))
+    expected = draw_rotated_label_full_frame(expected, "x", (origin[0] - 10, origin[1] - 100), 180,
+                                             font_scale=0.7, thickness=2, color=(0, 255, 0))
+    cv2.line(expected, origin, (origin[0], origin[1] - 100), (0, 255, 0), 2)
+
+    np.testing.assert_array_equal(draw_axes(image, axis_length=100), expected)
+
+
+def filter_detections_by_query_reference(output, query_texts, stable_candidates):
+    # previous implementation, with the module global passed in
+    query_occurrences = {}
+    for idx, q in enumerate(query_texts):
+        query_occurrences.setdefault(q, []).append(idx)
+    selected_indices = []
+    num_detections = len(output.labels)
+    for q_text, occ_list in query_occurrences.items():
+        required_count = len(occ_list)
+        candidates = [i for i in range(num_detections) if int(output.labels[i]) in occ_list]
+        if not candidates:
+            continue
+        if required_count == 1:
+            candidate_info = []
+            for i in candidates:
+                box = output.boxes[i]
+                center = ((box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0)
+                candidate_info.append((i, center, float(output.scores[i])))
+            if q_text in stable_candidates:
+                _, prev_center, _ = stable_candidates[q_text]
+                dist_to_prev = lambda t: ((t[1][0] - prev_center[0])**2 + (t[1][1] - prev_center[1])**2)**0.5
+                best_candidate = min(candidate_info, key=dist_to_prev)
+                if dist_to_prev(best_candidate) < 50.0:
+                    selected_index = best_candidate[0]
+                else:
+                    selected_index = max(candidate_info, key=lambda t: t[2])[0]
+            else:
+                selected_index = max(candidate_info, key=lambda t: t[2])[0]
+            box = output.boxes[selected_index]
+            center = ((box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0)
+            stable_candidates[q_text] = (selected_index, center, float(output.scores[selected_index]))
+            selected_indices.append(selected_index)
+        else:
+            candidates_sorted = sorted(candidates, key=lambda i: ((output.boxes[i][0] + output.boxes[i][2]) / 2))
+            selected_indices.extend(candidates_sorted[:required_count])
+    return selected_indices
+
+
+def random_decode_output(generator, num_detections, num_labels):
+    xy = torch.rand(num_detections, 2, generator=generator) * 200
+    wh = 10 + torch.rand(num_detections, 2, generator=generator) * 40
+    return OwlDecodeOutput(
+        labels=torch.randint(0, num_labels, (num_detections,), generator=generator),
+        scores=torch.rand(num_detections, generator=generator),
+        boxes=torch.cat([xy, xy + wh], dim=-1),
+        input_indices=torch.zeros(num_detections, dtype=torch.int64)
+    )
+
+
+def test_detection_tracker_matches_previous_selection():
+    generator = torch.Generator().manual_seed(0)
+    query_texts = ["a cup", "a bowl", "a cup", "a spoon", "a plate"]
+    tracker = DetectionTracker()
+    stable_candidates = {}
+    for _ in range(30):
+        output = random_decode_output(generator, int(torch.randint(0, 12, (1,), generator=generator)), len(query_texts))
+        expected = filter_detections_by_query_reference(output, query_texts, stable_candidates)
+        assert tracker.select(output, query_texts) == expected
+
+
+def tracker_outputs():
+    near = OwlDecodeOutput(
+        labels=torch.tensor([0, 0]),
+        scores=torch.tensor([0.9, 0.5]),
+        boxes=torch.tensor([[0., 0., 10., 10.], [100., 100., 110., 110.]]),
+        input_indices=torch.zeros(2, dtype=torch.int64)
+    )
+    moved = OwlDecodeOutput(
+        labels=near.labels,
+        scores=torch.tensor([0.5, 0.9]),
+        boxes=near.boxes,
+        input_indices=near.input_indices
+    )
+    return near, moved
+
+
+def test_detection_tracker_state_is_per_tracker_and_resettable():
+    near, moved = tracker_outputs()
+    tracker = DetectionTracker()
+    assert tracker.select(near, ["a cup"]) == [0]
+    # the previous pick wins over the more confident detection
+    assert tracker.select(moved, ["a cup"]) == [0]
+    assert DetectionTracker().select(moved, ["a cup"]) == [1]
+    tracker.reset()
+    assert tracker.select(moved, ["a cup"]) == [1]
+
+
+def test_default_tracker_keeps_history_between_calls():
+    near, moved = tracker_outputs()
+    owl_drawing.default_tracker.reset()
+    try:
+        assert filter_detections_by_query(near, ["a cup"]) == [0]
+        # as with the former module-level history, without passing a tracker
+        assert filter_detections_by_query(moved, ["a cup"]) == [0]
+        assert filter_detections_by_query(moved, ["a cup"], tracker=DetectionTracker()) == [1]
+    finally:
+        owl_drawing.default_tracker.reset()
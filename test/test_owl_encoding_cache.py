@@ -0,0 +1,76 @@
+import numpy as np
+import torch
+from PIL import Image as PILImage
+
+from nanoowl.owl_predictor import OwlEncodeImageOutput, OwlImageEncodingCache
+
+
+def random_image(seed, size=(240, 320)):
+    return PILImage.fromarray(np.random.RandomState(seed).randint(0, 255, (*size, 3), dtype=np.uint8))
+
+
+def encoding(value):
+    return OwlEncodeImageOutput(
+        image_embeds=torch.full((1, 4, 8), value),
+        image_class_embeds=torch.full((1, 4, 8), value),
+        logit_shift=torch.full((1, 4, 1), value),
+        logit_scale=torch.full((1, 4, 1), value),
+        pred_boxes=torch.full((1, 4, 4), 1000. + value)
+    )
+
+
+def test_lru_eviction():
+    cache = OwlImageEncodingCache(max_size=2)
+    cache.put("a", encoding(1.))
+    cache.put("b", encoding(2.))
+    assert cache.get("a") is not None   # "a" is now the most recent
+    cache.put("c", encoding(3.))
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert len(cache) == 2
+
+    disabled = OwlImageEncodingCache(max_size=0)
+    disabled.put("a", encoding(1.))
+    assert len(disabled) == 0
+
+
+def test_offload_round_trip():
+    cache = OwlImageEncodingCache(offload=True)
+    original = encoding(0.1234)
+    original.pred_boxes = torch.full((1, 4, 4), 1919.75)
+    cache.put("a", original)
+
+    stored = cache._entries["a"]
+    assert stored.image_class_embeds.dtype == torch.float16
+    assert stored.image_class_embeds.device.type == "cpu"
+    assert stored.pred_boxes.dtype == torch.float32   # boxes are never downcast
+
+    restored = cache.get("a", device="cpu")
+    assert restored.image_class_embeds.dtype == torch.float32
+    assert torch.allclose(restored.image_class_embeds, original.image_class_embeds, atol=1e-3)
+    assert torch.equal(restored.pred_boxes, original.pred_boxes)
+
+
+def test_cache_hit_matches_predict(tiny_predictors):
+    owl_predictor, _ = tiny_predictors
+    owl_predictor.image_encoding_cache.clear()
+    image = random_image(0)
+    reference = owl_predictor.predict(image, ["a cup", "a bowl"], None, threshold=0.1)
+
+    first = owl_predictor.predict_with_cache(image, ["a cup", "a bowl"], None, threshold=0.1)
+    assert len(owl_predictor.image_encoding_cache) == 1
+    # new prompts on the cached image, then the original ones again
+    owl_predictor.predict_with_cache(image, ["a spoon"], None, threshold=0.1)
+    hit = owl_predictor.predict_with_cache(image, ["a cup", "a bowl"], None, threshold=0.1)
+    assert len(owl_predictor.image_encoding_cache) == 1
+
+    assert len(reference.labels) > 0
+    for output in (first, hit):
+        assert torch.equal(output.labels, reference.labels)
+        assert torch.allclose(output.scores, reference.scores)
+        assert torch.allclose(output.boxes, reference.boxes)
+
+    # another image is another entry
+    owl_predictor.predict_with_cache(random_image(1), ["a cup"], None)
+    assert len(owl_predictor.image_encoding_cache) == 2
+    owl_predictor.image_encoding_cache.clear()
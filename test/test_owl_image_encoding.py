@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image as PILImage
+
+from nanoowl.tree import Tree
+from nanoowl.tree_predictor import TreePredictor
+
+
+@pytest.fixture(scope="module")
+def predictors(tiny_model_root):
+    from nanoowl.owl_predictor import OwlPredictor
+
+    name = str(tiny_model_root / "owlvit_tiny")
+    return {mode: OwlPredictor(name, device="cpu", image_encoding=mode) for mode in ("full", "slim", "lazy_boxes")}
+
+
+def test_image_encodings_decode_alike(predictors):
+    image = PILImage.fromarray(np.random.RandomState(0).randint(0, 255, (240, 320, 3), dtype=np.uint8))
+    text = ["a cup", "a bowl"]
+    outputs = {}
+    with torch.no_grad():
+        for mode, predictor in predictors.items():
+            encodings = predictor.encode_full_image(image)
+            outputs[mode] = predictor.decode(encodings, predictor.encode_text(text), threshold=0.1)
+            assert (encodings.image_embeds is None) == (mode == "slim")
+            assert (encodings.pred_boxes is None) == (mode == "lazy_boxes")
+
+    reference = outputs["full"]
+    assert len(reference.labels) > 0
+    for mode in ("slim", "lazy_boxes"):
+        assert torch.equal(outputs[mode].labels, reference.labels)
+        assert torch.allclose(outputs[mode].boxes, reference.boxes, atol=1e-3)
+
+
+def test_tree_predictor_with_lazy_boxes(predictors, tiny_predictors):
+    _, clip_predictor = tiny_predictors
+    image = PILImage.fromarray(np.random.RandomState(1).randint(0, 255, (240, 320, 3), dtype=np.uint8))
+    tree = Tree.from_prompt("[a tray [a cup, a spoon]]")
+    outputs = {}
+    with torch.no_grad():
+        for mode in ("full", "lazy_boxes"):
+            predictor = TreePredictor(owl_predictor=predictors[mode], clip_predictor=clip_predictor)
+            outputs[mode] = predictor.predict_batch([image, image], tree, threshold=0.1)
+    assert len(outputs["full"][0].boxes) > 0
+    for full, lazy in zip(outputs["full"], outputs["lazy_boxes"]):
+        assert torch.allclose(full.boxes, lazy.boxes, atol=1e-3)
+        assert torch.equal(full.label_ids, lazy.label_ids)
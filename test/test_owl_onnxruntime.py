@@ -0,0 +1,58 @@
+import warnings
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+
+from nanoowl.owl_predictor import OwlPredictor
+
+
+@pytest.fixture(scope="module")
+def predictors(tmp_path_factory, tiny_model_root):
+    model_name = str(tiny_model_root / "owlvit_tiny")
+    torch_predictor = OwlPredictor(model_name, device="cpu")
+    onnx_path = str(tmp_path_factory.mktemp("onnx") / "image_encoder.onnx")
+    torch_predictor.export_image_encoder_onnx(onnx_path)
+    onnx_predictor = OwlPredictor(
+        model_name,
+        device="cpu",
+        image_encoder_backend="onnxruntime",
+        image_encoder_onnx=onnx_path,
+        image_encoder_engine_max_batch_size=2
+    )
+    return torch_predictor, onnx_predictor
+
+
+def test_onnxruntime_encode_image_matches_torch(predictors):
+    torch_predictor, onnx_predictor = predictors
+    image = torch.randn(3, 3, *torch_predictor.get_image_size())
+
+    with torch.no_grad():
+        expected = torch_predictor.encode_image_torch(image)
+    actual = onnx_predictor.encode_image(image)
+
+    for name in OwlPredictor.get_image_encoder_output_names():
+        a, b = getattr(actual, name), getattr(expected, name)
+        assert a.shape == b.shape, name
+        assert a.device == b.device, name
+        assert torch.allclose(a, b, atol=1e-3, rtol=1e-3), name
+
+
+def test_unknown_backend_raises():
+    with pytest.raises(ValueError):
+        OwlPredictor(device="cpu", image_encoder_backend="openvino")
+
+
+def test_export_does_not_depend_on_training_mode(predictors, tmp_path):
+    torch_predictor, _ = predictors
+    torch_predictor.model.train()
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            torch_predictor.export_image_encoder_onnx(str(tmp_path / "image_encoder.onnx"))
+        assert not any("training" in str(w.message).lower() for w in caught)
+        assert not torch_predictor.model.training
+    finally:
+        torch_predictor.model.eval()
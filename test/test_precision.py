@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image as PILImage
+
+
+@pytest.fixture(scope="module")
+def image():
+    return PILImage.fromarray(np.random.RandomState(0).randint(0, 255, (240, 320, 3), dtype=np.uint8))
+
+
+def owl_predictor(tiny_model_root, **kwargs):
+    from nanoowl.owl_predictor import OwlPredictor
+
+    return OwlPredictor(str(tiny_model_root / "owlvit_tiny"), device="cpu", **kwargs)
+
+
+def test_inference_mode_records_no_graph(tiny_model_root, image):
+    predictor = owl_predictor(tiny_model_root)
+    encodings = predictor.encode_full_image(image)
+    text_encodings = predictor.encode_text(["a cup"])
+    for tensor in (encodings.logit_scale, encodings.pred_boxes, text_encodings.text_embeds):
+        assert tensor.is_inference()
+        assert not tensor.requires_grad
+
+    autograd = owl_predictor(tiny_model_root, inference_mode=False)
+    assert autograd.encode_text(["a cup"]).text_embeds.requires_grad
+
+
+def test_bf16_decodes_in_fp32(tiny_model_root, image):
+    fp32 = owl_predictor(tiny_model_root)
+    bf16 = owl_predictor(tiny_model_root, precision="bf16")
+    text = ["a cup", "a bowl"]
+    encodings = {}
+    for name, predictor in (("fp32", fp32), ("bf16", bf16)):
+        encodings[name] = predictor.encode_full_image(image)
+        assert encodings[name].image_class_embeds.dtype == torch.float32
+        assert encodings[name].pred_boxes.dtype == torch.float32
+        output = predictor.decode(encodings[name], predictor.encode_text(text), threshold=0.1)
+        assert output.boxes.dtype == torch.float32
+
+    # bf16 keeps ~3 significant digits, the random tiny model is not trained to be robust to that
+    box_error = (encodings["bf16"].pred_boxes - encodings["fp32"].pred_boxes).abs()
+    assert box_error.mean() < 2.0  # pixels
+    assert torch.allclose(encodings["bf16"].image_class_embeds, encodings["fp32"].image_class_embeds, atol=0.2, rtol=0.05)
+
+
+def test_unknown_precision(tiny_model_root):
+    with pytest.raises(ValueError):
+        owl_predictor(tiny_model_root, precision="fp16")
+    with pytest.raises(ValueError):
+        owl_predictor(tiny_model_root, precision="bf16", quantize="int8_dynamic")
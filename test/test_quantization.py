@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image as PILImage
+
+pytest.importorskip("transformers")
+
+
+@pytest.fixture(scope="module")
+def image():
+    return PILImage.fromarray(np.random.RandomState(0).randint(0, 255, (240, 320, 3), dtype=np.uint8))
+
+
+def owl_predictor(tiny_model_root, **kwargs):
+    from nanoowl.owl_predictor import OwlPredictor
+
+    return OwlPredictor(str(tiny_model_root / "owlvit_tiny"), device="cpu", **kwargs)
+
+
+def relative_error(actual, expected):
+    return float((actual - expected).norm() / expected.norm())
+
+
+def test_int8_dynamic_encodes_close_to_fp32(tiny_model_root, image):
+    fp32 = owl_predictor(tiny_model_root)
+    int8 = owl_predictor(tiny_model_root, quantize="int8_dynamic")
+    assert any(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in int8.model.modules())
+
+    expected = fp32.encode_full_image(image)
+    actual = int8.encode_full_image(image)
+    # int8 weights and activations; the random tiny model has a few saturated, unstable boxes
+    box_error = (actual.pred_boxes - expected.pred_boxes).abs().flatten()
+    assert box_error.median() < 1.0  # pixels
+    assert torch.quantile(box_error, 0.9) < 10.0
+    assert relative_error(actual.image_class_embeds, expected.image_class_embeds) < 0.05
+
+    text = ["a cup", "a bowl"]
+    text_embeds = int8.encode_text(text).text_embeds
+    # decode compares normalized embeddings, so the direction is what matters
+    assert torch.cosine_similarity(text_embeds, fp32.encode_text(text).text_embeds, dim=-1).min() > 0.99
+    output = int8.decode(actual, int8.encode_text(text), threshold=0.1)
+    assert len(output.boxes) > 0
+    assert output.boxes.dtype == torch.float32
+
+
+def test_shared_fp32_model_is_not_quantized(tiny_model_root, image):
+    fp32 = owl_predictor(tiny_model_root)
+    weight = fp32.model.owlvit.vision_model.post_layernorm.weight.clone()
+    expected = fp32.encode_full_image(image).pred_boxes
+
+    owl_predictor(tiny_model_root, quantize="int8_dynamic")
+
+    shared = owl_predictor(tiny_model_root)
+    assert shared.model is fp32.model
+    assert not any(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in shared.model.modules())
+    assert torch.equal(shared.model.owlvit.vision_model.post_layernorm.weight, weight)
+    assert torch.equal(shared.encode_full_image(image).pred_boxes, expected)
+
+
+def test_quantized_weights_round_trip(tiny_model_root, image, tmp_path):
+    int8 = owl_predictor(tiny_model_root, quantize="int8_dynamic")
+    path = str(tmp_path / "owl_int8.pt")
+    int8.save_quantized_weights(path)
+    loaded = owl_predictor(tiny_model_root, quantize="int8_dynamic", quantized_weights=path)
+
+    text = ["a cup", "a bowl"]
+    expected = int8.predict(image, text, int8.encode_text(text), threshold=0.1, pad_square=False)
+    actual = loaded.predict(image, text, loaded.encode_text(text), threshold=0.1, pad_square=False)
+    assert len(expected.boxes) > 0
+    assert torch.equal(actual.labels, expected.labels)
+    assert torch.equal(actual.boxes, expected.boxes)
+
+    with pytest.raises(RuntimeError):
+        owl_predictor(tiny_model_root).save_quantized_weights(path)
+    with pytest.raises(ValueError):
+        owl_predictor(tiny_model_root, quantized_weights=path)
@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("cv2")
+
+import numpy as np
+from PIL import Image as PILImage
+
+from render_helper_viz import find_helper_jsons, find_images, render_helper_json
+
+
+def write_run(tmp_path):
+    """An inference.py output directory and a dataset with the image nested in its scene folder."""
+    img_dir, out_dir = tmp_path / "dataset", tmp_path / "outputs"
+    (img_dir / "scene_01").mkdir(parents=True)
+    out_dir.mkdir()
+    PILImage.fromarray(np.zeros((240, 320, 3), dtype=np.uint8)).save(img_dir / "scene_01" / "scene_01_0_rgb.png")
+    helper = {"scene_01_0_rgb": [
+        {"bbox": {"cx": 100.0, "cy": 80.0, "w": 60.0, "h": 40.0, "angle": 0.0}, "category": "a cup", "conf": 0.4}
+    ]}
+    (out_dir / "scene_01_0.json").write_text(json.dumps(helper))
+    (out_dir / "run_manifest.json").write_text(json.dumps({"shards": [], "images": 1}))
+    (out_dir / "run_manifest.shard0of2.json").write_text(json.dumps({"images": 1}))
+    (out_dir / "completed.jsonl").write_text("{}\n")
+    return img_dir, out_dir
+
+
+def test_render_one_helper_json(tmp_path):
+    img_dir, out_dir = write_run(tmp_path)
+
+    json_paths = find_helper_jsons(out_dir)
+    assert json_paths == [out_dir / "scene_01_0.json"]
+
+    written = render_helper_json(json_paths[0], find_images(img_dir), out_dir, viz="png")
+    assert written == out_dir / "scene_01_0.png"
+    preview = np.asarray(PILImage.open(written))
+    assert preview.shape == (240, 320, 3)
+    # the box edges are drawn in white, its inside is left alone
+    assert (preview[60, 80:120] == 255).all()
+    assert (preview[80, 100] == 0).all()
+
+
+def test_render_skips_other_json(tmp_path):
+    img_dir, out_dir = write_run(tmp_path)
+    (out_dir / "profile.json").write_text(json.dumps({"encode_image": {"mean_ms": 1.0}}))
+    assert render_helper_json(out_dir / "profile.json", find_images(img_dir), out_dir) is None
+
+
+def test_render_does_not_import_torch():
+    code = "import sys, render_helper_viz; print('torch' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=Path(__file__).parent.parent / "vlm_annotation")
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+pytest.importorskip("torch")
+
+from nanoowl.sync_timer import Profiler
+
+
+def test_sections_nest_and_aggregate(tmp_path):
+    profiler = Profiler()
+    for _ in range(3):
+        with profiler.section("predict", "cpu"):
+            with profiler.section("decode", "cpu"):
+                with profiler.section("nms", "cpu"):
+                    pass
+
+    stats = profiler.stats()
+    assert set(stats) == {"predict", "predict/decode", "predict/decode/nms"}
+    assert stats["predict/decode"]["count"] == 3
+    assert stats["predict"]["p50_ms"] >= stats["predict/decode"]["p50_ms"] >= 0
+    assert json.loads(profiler.to_json(str(tmp_path / "stats.json"))) == json.loads((tmp_path / "stats.json").read_text())
+
+    profiler.export_chrome_trace(str(tmp_path / "trace.json"))
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert len(events) == 9
+    assert {e["name"] for e in events} == {"predict", "decode", "nms"}
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False)
+    with profiler.section("decode", "cpu"):
+        pass
+    assert profiler.section("a") is profiler.section("b")
+    assert profiler.stats() == {}
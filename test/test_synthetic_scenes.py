@@ -0,0 +1,38 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from synthetic_scenes import make_dataset, table_depth
+
+
+def read_ply(path):
+    raw = Path(path).read_bytes()
+    header, body = raw.split(b"end_header\n", 1)
+    count = int(header.split(b"element vertex ")[1].split(b"\n")[0])
+    return np.frombuffer(body, dtype="<f4").reshape(count, 3)
+
+
+def test_scene_files_are_consistent(tmp_path):
+    image_id, = make_dataset(tmp_path, 1, width=320, height=240, num_points=5000, num_objects=3)
+
+    data = tmp_path / "data"
+    assert (data / f"{image_id}_rgb.png").exists()
+    meta = json.loads((data / f"{image_id}_metadata.json").read_text())
+    K = np.array(meta["camera_intrinsics"]["K"]).reshape(3, 3)
+    helper = json.loads((tmp_path / "outputs_helper" / f"{image_id}.json").read_text())
+    assert len(helper[f"{image_id}_rgb"]) == 3
+
+    xyz = read_ply(data / f"{image_id}_cloud.ply")
+    assert xyz.shape == (5000, 3)
+
+    # projecting the cloud lands inside the image, objects sit on or above the table
+    u = xyz[:, 0] * K[0, 0] / xyz[:, 2] + K[0, 2]
+    v = xyz[:, 1] * K[1, 1] / xyz[:, 2] + K[1, 2]
+    assert u.min() > -1 and u.max() < 320 and v.min() > -1 and v.max() < 240
+    lift = table_depth(v, 240) - xyz[:, 2]
+    assert lift.min() > -0.01 and lift.max() < 0.16
+    assert (lift > 0.02).any()
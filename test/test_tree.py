@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("clip")
+pytest.importorskip("transformers")
+
+from nanoowl.tree import Tree, TreeOp
+
+
+def test_compile_matches_tree_structure():
+    tree = Tree.parse_prompt("[a tray [a cup (red, blue), a spoon], a plate]")
+    plan = tree.compile()
+
+    assert tree.labels == ["image", "a tray", "a cup", "red", "blue", "a spoon", "a plate"]
+    assert plan.detect_label_indices == (1, 2, 5, 6)
+    assert plan.classify_label_indices == (3, 4)
+    assert plan.label_depths == (0, 1, 2, 3, 3, 2, 1)
+    assert [n.outputs for n in tree.find_detect_nodes_with_input(0)] == [[1, 6]]
+    assert [n.outputs for n in tree.find_classify_nodes_with_input(2)] == [[3, 4]]
+    assert tree.find_nodes_with_input(3) == []
+    assert tree.compile() is plan
+
+
+def test_from_prompt_is_cached():
+    prompt = "[a bowl [a spoon]]"
+    assert Tree.from_prompt(prompt) is Tree.from_prompt(prompt)
+
+
+def test_from_prompt_tree_is_read_only():
+    tree = Tree.from_prompt("[a tray (red, blue), a cup]")
+    with pytest.raises(AttributeError):
+        tree.labels.append("a plate")
+    with pytest.raises(AttributeError):
+        tree.nodes[0].outputs.append(9)
+    assert tree.to_dict() == Tree.parse_prompt("[a tray (red, blue), a cup]").to_dict()
+
+
+def test_find_nodes_with_input_keeps_tree_order():
+    tree = Tree.parse_prompt("[a tray (red, blue) [a cup]]")
+    ops = [node.op for node in tree.find_nodes_with_input(1)]
+    assert ops == [TreeOp.CLASSIFY, TreeOp.DETECT]
+    assert isinstance(tree.find_detect_nodes_with_input(1), list)
+
+
+def test_from_json_round_trip_keeps_ops():
+    tree = Tree.from_json(Tree.parse_prompt("[a cup (red, blue)]").to_json())
+    assert tree.get_op_for_label_index(1) == TreeOp.DETECT
+    assert tree.get_classify_label_indices() == [2, 3]
+    assert tree.get_label_depth_map() == {0: 0, 1: 1, 2: 2, 3: 2}
@@ -0,0 +1,127 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("clip")
+
+import numpy as np
+import PIL.Image
+
+from nanoowl.tree import Tree
+from nanoowl.tree_predictor import TreePredictor, _pack_tree_output
+
+
+THRESHOLD = 0.1
+
+
+def detections(output):
+    return sorted(
+        (d.id, d.parent_id, tuple(round(x, 2) for x in d.box), tuple(d.labels))
+        for d in output.detections
+    )
+
+
+def test_pack_tree_output_columns_and_detections():
+    # label 0: the image instance, label 1: two detections, label 2: one of them classified
+    big_id = 2 ** 40 + 1
+    output = _pack_tree_output(
+        boxes={
+            0: torch.tensor([[0., 0., 64., 48.]]),
+            1: torch.tensor([[1., 2., 3., 4.], [5., 6., 7., 8.]]),
+            2: torch.tensor([[1., 2., 3., 4.]])
+        },
+        scores={0: torch.tensor([1.]), 1: torch.tensor([.5, .25]), 2: torch.tensor([.75])},
+        instance_ids={0: torch.tensor([0]), 1: torch.tensor([1, big_id]), 2: torch.tensor([1])},
+        parent_instance_ids={0: torch.tensor([-1]), 1: torch.tensor([0, 0]), 2: torch.tensor([0])}
+    )
+
+    assert output.boxes.dtype == torch.float32 and output.boxes.shape == (4, 4)
+    assert output.scores.dtype == torch.float32
+    assert output.label_ids.tolist() == [0, 1, 1, 2]
+    assert output.instance_ids.dtype == torch.int64
+    assert output.instance_ids.tolist() == [0, 1, big_id, 1]
+    assert output.parent_ids.tolist() == [-1, 0, 0, 0]
+    assert output.to_dict()["scores"] == [1., .5, .25, .75]
+
+    assert output._detections is None
+    grouped = output.detections
+    assert output.detections is grouped
+    assert [(d.id, d.parent_id, d.box, d.labels, d.scores) for d in grouped] == [
+        (0, -1, [0., 0., 64., 48.], [0], [1.]),
+        (1, 0, [1., 2., 3., 4.], [1, 2], [.5, .75]),
+        (big_id, 0, [5., 6., 7., 8.], [1], [.25])
+    ]
+
+
+@pytest.fixture(scope="module")
+def tree_predictor(tiny_predictors):
+    owl_predictor, clip_predictor = tiny_predictors
+    return TreePredictor(owl_predictor=owl_predictor, clip_predictor=clip_predictor, device="cpu")
+
+
+def test_predict_batch_matches_predict(tree_predictor):
+    rng = np.random.RandomState(0)
+    images = [PIL.Image.fromarray(rng.randint(0, 255, (240, 320, 3), dtype=np.uint8)) for _ in range(2)]
+    tree = Tree.from_prompt("[a tray [a cup (red, blue)], a plate]")
+
+    batch = tree_predictor.predict_batch(images, tree, threshold=THRESHOLD, max_rois_per_batch=5)
+
+    assert len(batch) == len(images)
+    for image, output in zip(images, batch):
+        assert detections(output) == detections(tree_predictor.predict(image, tree, threshold=THRESHOLD))
+
+
+def test_predict_output_is_consistent(tree_predictor):
+    image = PIL.Image.fromarray(np.random.RandomState(1).randint(0, 255, (240, 320, 3), dtype=np.uint8))
+    tree = Tree.from_prompt("[a cup, a bowl](indoor, outdoor)")
+
+    output = tree_predictor.predict(image, tree, threshold=THRESHOLD)
+
+    ids = set(output.instance_ids.tolist())
+    assert 0 in ids
+    assert set(output.parent_ids.tolist()) <= ids | {-1}
+    assert output.boxes.shape == (len(output.scores), 4)
+
+
+@pytest.mark.parametrize("predictor_index", [0, 1], ids=["owl", "clip"])
+def test_encode_rois_batched_matches_separate_encodes(tree_predictor, tiny_predictors, predictor_index):
+    predictor = tiny_predictors[predictor_index]
+    image = tree_predictor.image_preprocessor.preprocess_image(
+        np.random.RandomState(2).randint(0, 255, (240, 320, 3), dtype=np.uint8))
+    # rois of two labels on the same level, e.g. the boxes of "a cup" and of "a bowl"
+    rois = [torch.tensor([[10., 20., 120., 200.], [150., 30., 300., 90.]]), torch.tensor([[40., 40., 90., 90.]])]
+
+    batched = tree_predictor.encode_rois_batched(predictor, image, rois, max_rois_per_batch=2)
+    for group_rois, encodings in zip(rois, batched):
+        expected = predictor.encode_rois(image, group_rois)
+        for name, value in vars(expected).items():
+            if value is not None:
+                torch.testing.assert_close(getattr(encodings, name), value, rtol=1e-4, atol=1e-4)
+
+    if predictor_index == 0:
+        # decode of a sliced group indexes its own rois
+        text = predictor.encode_text(["a cup", "a bowl"])
+        for group_rois, encodings in zip(rois, batched):
+            expected = predictor.decode(predictor.encode_rois(image, group_rois), text, threshold=THRESHOLD)
+            output = predictor.decode(encodings, text, threshold=THRESHOLD)
+            assert len(output.labels) > 0
+            assert torch.equal(output.input_indices, expected.input_indices)
+            assert torch.equal(output.labels, expected.labels)
+            torch.testing.assert_close(output.boxes, expected.boxes, rtol=1e-4, atol=1e-3)
+
+
+def test_encode_rois_batched_is_bounded_by_default(tree_predictor, tiny_predictors, monkeypatch):
+    predictor = tiny_predictors[1]
+    image = tree_predictor.image_preprocessor.preprocess_image(
+        np.random.RandomState(3).randint(0, 255, (96, 128, 3), dtype=np.uint8))
+    rois = [torch.tensor([[4., 4., 60., 60.]]).repeat(40, 1), torch.tensor([[30., 10., 120., 90.]]).repeat(30, 1)]
+
+    batch_sizes = []
+    encode_rois = predictor.encode_rois
+    monkeypatch.setattr(predictor, "encode_rois", lambda image, rois, **kwargs: batch_sizes.append(len(rois)) or encode_rois(image, rois, **kwargs))
+    outputs = tree_predictor.encode_rois_batched(predictor, image, rois)
+
+    assert batch_sizes == [64, 6]
+    assert [len(o.image_embeds) for o in outputs] == [40, 30]
+    with pytest.raises(ValueError):
+        tree_predictor.encode_rois_batched(predictor, image, rois, max_rois_per_batch=0)
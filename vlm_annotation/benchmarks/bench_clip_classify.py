@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Classify-node throughput of ClipPredictor vs. number of rois.
+
+Times encode_rois + decode (what TreePredictor runs for a classify node) for
+each roi count and micro batch size, and encode_text with a cold and a warm
+text embedding cache.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_clip_classify --device cpu --num_rois 8 32 128 --max_rois_per_batch 16 64 0
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from nanoowl.clip_predictor import ClipPredictor
+
+
+LABELS = ["red", "green", "blue", "white", "black", "metal", "wooden", "plastic"]
+
+
+def timed(fn, device: str, repeats: int):
+    fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - t0)
+    return 1000. * float(np.median(times))
+
+
+def random_rois(num_rois: int, width: int, height: int, generator: torch.Generator):
+    xy = torch.rand(num_rois, 2, generator=generator) * torch.tensor([width * 0.8, height * 0.8])
+    wh = (0.05 + 0.15 * torch.rand(num_rois, 2, generator=generator)) * torch.tensor([width, height])
+    return torch.cat([xy, xy + wh], dim=-1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_name", type=str, default="ViT-B/32")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--num_rois", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--max_rois_per_batch", type=int, nargs="+", default=[16, 64, 0], help="0 = one batch")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    predictor = ClipPredictor(args.model_name, device=args.device)
+    generator = torch.Generator().manual_seed(0)
+    image = torch.randn(1, 3, args.height, args.width, device=args.device)
+
+    with torch.no_grad():
+        predictor.text_embedding_cache.clear()
+        t_cold = timed(lambda: (predictor.text_embedding_cache.clear(), predictor.encode_text(LABELS)), args.device, args.repeats)
+        t_warm = timed(lambda: predictor.encode_text(LABELS), args.device, args.repeats)
+        print(f"encode_text {len(LABELS)} labels (ms): cold cache {t_cold:.2f}, warm cache {t_warm:.2f}")
+
+        text_encodings = predictor.encode_text(LABELS)
+
+        print(f"{'rois':>5} {'max batch':>9} {'ms':>9} {'rois/s':>8}")
+        for num_rois in args.num_rois:
+            rois = random_rois(num_rois, args.width, args.height, generator).to(args.device)
+            for max_rois_per_batch in args.max_rois_per_batch:
+                predictor.max_rois_per_batch = max_rois_per_batch if max_rois_per_batch > 0 else None
+
+                def classify():
+                    predictor.decode(predictor.encode_rois(image, rois), text_encodings)
+
+                ms = timed(classify, args.device, args.repeats)
+                print(f"{num_rois:>5} {max_rois_per_batch or 'all':>9} {ms:>9.1f} {1000. * num_rois / ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Cold start of a worker: building OwlPredictor + ClipPredictor in a fresh process.
+
+Every configuration runs in its own interpreter, as a sharded worker or a
+short CLI job would: loading from the original checkpoints (from_pretrained /
+clip.load), then through the safetensors mmap cache of nanoowl.model_cache
+(first run fills it, second run reads it). A second OwlPredictor in the same
+process shows the shared-model registry.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_cold_start --device cpu
+    python -m benchmarks.bench_cold_start --random_weights /tmp/nanoowl_random   # offline, random full-size weights
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(args):
+    t0 = time.perf_counter()
+    from nanoowl.owl_predictor import OwlPredictor
+    from nanoowl.clip_predictor import ClipPredictor
+    t1 = time.perf_counter()
+    owl = OwlPredictor(args.owl_model, device=args.device, model_cache_dir=args.cache_dir)
+    t2 = time.perf_counter()
+    ClipPredictor(args.clip_model, device=args.device, model_cache_dir=args.cache_dir)
+    t3 = time.perf_counter()
+    OwlPredictor(args.owl_model, device=args.device, model_cache_dir=args.cache_dir)
+    t4 = time.perf_counter()
+    owl.encode_text(["a cup"])  # first use, touches the pages of the text tower
+    t5 = time.perf_counter()
+    print(json.dumps(dict(
+        import_s=t1 - t0,
+        owl_s=t2 - t1,
+        clip_s=t3 - t2,
+        second_owl_s=t4 - t3,
+        first_encode_text_s=t5 - t4,
+        max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+    )))
+
+
+def run_child(args, cache_dir):
+    command = [
+        sys.executable, "-m", "benchmarks.bench_cold_start", "--child",
+        "--device", args.device, "--owl_model", args.owl_model, "--clip_model", args.clip_model
+    ]
+    if cache_dir is not None:
+        command += ["--cache_dir", cache_dir]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--owl_model", type=str, default="google/owlvit-base-patch32")
+    parser.add_argument("--clip_model", type=str, default="ViT-B/32")
+    parser.add_argument("--random_weights", type=str, default=None, help="directory for random full-size checkpoints, replaces the model names")
+    parser.add_argument("--cache_dir", type=str, default=None, help="model cache to fill and read (temp dir if omitted)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    if args.random_weights is not None:
+        from nanoowl.tiny_models import save_tiny_owl_model, save_tiny_clip_model
+        args.owl_model = os.path.join(args.random_weights, "owlvit_full_size")
+        args.clip_model = os.path.join(args.random_weights, "clip_full_size", "clip.pt")
+        if not os.path.exists(os.path.join(args.owl_model, "config.json")):
+            save_tiny_owl_model(args.owl_model, full_size=True)
+        if not os.path.exists(args.clip_model):
+            save_tiny_clip_model(os.path.dirname(args.clip_model), full_size=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = args.cache_dir or tmp
+        rows = [
+            ("original checkpoints", run_child(args, None)),
+            ("cache, first run (fills it)", run_child(args, cache_dir)),
+            ("cache, warm", run_child(args, cache_dir)),
+        ]
+
+    print(f"{'':<30} {'import s':>9} {'owl s':>7} {'clip s':>7} {'2nd owl s':>10} {'1st text s':>11} {'max rss MB':>11}")
+    for name, r in rows:
+        print(f"{name:<30} {r['import_s']:>9.2f} {r['owl_s']:>7.2f} {r['clip_s']:>7.2f} "
+              f"{r['second_owl_s']:>10.3f} {r['first_encode_text_s']:>11.3f} {r['max_rss_mb']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Compiled image encoders (nanoowl.compilation): compile time vs. per-image gain.
+
+Every compile mode runs in its own interpreter, so that compile time
+includes everything a fresh worker pays: building OwlPredictor and
+ClipPredictor (construction compiles and warms up the image encoders), then
+the median latency of OwlPredictor.encode_image and ClipPredictor.encode_image
+at batch 1. Break-even is the number of images after which the OWL encoder gain
+alone pays back the extra build time of both (CLIP runs per roi, not per image).
+
+    cd vlm_annotation
+    python -m benchmarks.bench_compile --device cpu
+    python -m benchmarks.bench_compile --random_weights /tmp/nanoowl_random --modes none torchscript   # offline
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from nanoowl.compilation import COMPILE_MODES
+
+
+def timed(fn, device: str, repeats: int):
+    import numpy as np
+    import torch
+
+    fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - t0)
+    return 1000. * float(np.median(times))
+
+
+def child(args):
+    import torch
+    from nanoowl.owl_predictor import OwlPredictor
+    from nanoowl.clip_predictor import ClipPredictor
+
+    if args.num_threads > 0:
+        torch.set_num_threads(args.num_threads)
+    t0 = time.perf_counter()
+    owl = OwlPredictor(args.owl_model, device=args.device, compile_mode=args.mode)
+    t1 = time.perf_counter()
+    clip = ClipPredictor(args.clip_model, device=args.device, compile_mode=args.mode)
+    t2 = time.perf_counter()
+
+    owl_image = torch.randn(1, 3, owl.image_size, owl.image_size, device=args.device)
+    clip_image = torch.randn(1, 3, *clip.image_size, device=args.device)
+    print(json.dumps(dict(
+        compile_mode=owl.compile_mode,  # "none" if compilation failed
+        owl_build_s=t1 - t0,
+        clip_build_s=t2 - t1,
+        owl_ms=timed(lambda: owl.encode_image(owl_image), args.device, args.repeats),
+        clip_ms=timed(lambda: clip.encode_image(clip_image), args.device, args.repeats),
+    )))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--owl_model", type=str, default="google/owlvit-base-patch32")
+    parser.add_argument("--clip_model", type=str, default="ViT-B/32")
+    parser.add_argument("--random_weights", type=str, default=None, help="directory for random full-size checkpoints, replaces the model names")
+    parser.add_argument("--modes", nargs="+", default=list(COMPILE_MODES), choices=list(COMPILE_MODES))
+    parser.add_argument("--num_threads", type=int, default=0, help="torch threads (0 = default)")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--mode", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        child(args)
+        return
+
+    if args.random_weights is not None:
+        from nanoowl.tiny_models import save_tiny_owl_model, save_tiny_clip_model
+        args.owl_model = os.path.join(args.random_weights, "owlvit_full_size")
+        args.clip_model = os.path.join(args.random_weights, "clip_full_size", "clip.pt")
+        if not os.path.exists(os.path.join(args.owl_model, "config.json")):
+            save_tiny_owl_model(args.owl_model, full_size=True)
+        if not os.path.exists(args.clip_model):
+            save_tiny_clip_model(os.path.dirname(args.clip_model), full_size=True)
+
+    rows = []
+    for mode in args.modes:
+        command = [
+            sys.executable, "-m", "benchmarks.bench_compile", "--mode", mode,
+            "--device", args.device, "--owl_model", args.owl_model, "--clip_model", args.clip_model,
+            "--num_threads", str(args.num_threads), "--repeats", str(args.repeats)
+        ]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        rows.append((mode, json.loads(output.strip().splitlines()[-1])))
+
+    eager = dict(rows).get("none")
+    print(f"{'mode':<12} {'owl build s':>12} {'clip build s':>13} {'owl ms':>8} {'clip ms':>8} {'break-even images':>18}")
+    for mode, r in rows:
+        break_even = "-"
+        if eager is not None and mode != "none":
+            extra_s = r["owl_build_s"] + r["clip_build_s"] - eager["owl_build_s"] - eager["clip_build_s"]
+            gain_ms = eager["owl_ms"] - r["owl_ms"]
+            break_even = f"{1000. * extra_s / gain_ms:.0f}" if gain_ms > 0 else "never"
+        name = mode if r["compile_mode"] == mode else f"{mode} (failed)"
+        print(f"{name:<12} {r['owl_build_s']:>12.2f} {r['clip_build_s']:>13.2f} {r['owl_ms']:>8.1f} {r['clip_ms']:>8.2f} {break_even:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Label drawing cost: full-frame overlay + warpAffine vs. cached text sprites.
+
+Draws the labels of --num_objects detections plus the two axis labels, as
+draw_owl_output does for every frame in inference.py. Does not need model
+weights.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_drawing --width 1920 --height 1080 --num_objects 10
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from nanoowl.owl_drawing import draw_rotated_label, draw_owl_output
+from nanoowl.owl_predictor import OwlDecodeOutput
+
+
+def draw_rotated_label_full_frame(image, text, textOrg, angle, font=cv2.FONT_HERSHEY_SIMPLEX,
+                                  font_scale=1, thickness=2, color=(0, 0, 255)):
+    # the previous implementation
+    overlay = np.zeros_like(image)
+    (text_w, text_h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+    textPos = (textOrg[0] - text_w // 2, textOrg[1] + text_h // 2)
+    cv2.putText(overlay, text, textPos, font, font_scale, color, thickness, cv2.LINE_AA)
+    M = cv2.getRotationMatrix2D(textOrg, angle, 1)
+    rotated_overlay = cv2.warpAffine(overlay, M, (image.shape[1], image.shape[0]),
+                                     flags=cv2.INTER_LINEAR,
+                                     borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+    return cv2.add(image, rotated_overlay)
+
+
+def timed(fn, repeats: int):
+    fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return 1000. * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--num_objects", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    image = rng.randint(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+    text = [f"object {i}" for i in range(args.num_objects)]
+    origins = [(int(x), int(y)) for x, y in zip(rng.randint(150, args.width - 150, args.num_objects),
+                                               rng.randint(20, args.height - 20, args.num_objects))]
+    labels = [(t, o, 0, 1.0, (255, 255, 255)) for t, o in zip(text, origins)]
+    labels += [("y", (args.width - 135, args.height - 15), 180, 0.7, (0, 255, 0)),
+               ("x", (args.width - 30, args.height - 120), 180, 0.7, (0, 255, 0))]
+
+    def full_frame():
+        out = image
+        for t, o, angle, scale, color in labels:
+            out = draw_rotated_label_full_frame(out, t, o, angle, font_scale=scale, color=color)
+        return out
+
+    def sprites():
+        out = image.copy()
+        for t, o, angle, scale, color in labels:
+            draw_rotated_label(out, t, o, angle, font_scale=scale, color=color, inplace=True)
+        return out
+
+    diff = np.abs(full_frame().astype(int) - sprites().astype(int))
+    t_full = timed(full_frame, args.repeats)
+    t_sprite = timed(sprites, args.repeats)
+
+    xy = torch.tensor(origins, dtype=torch.float32)
+    output = OwlDecodeOutput(
+        labels=torch.arange(args.num_objects),
+        scores=torch.ones(args.num_objects),
+        boxes=torch.cat([xy - 100, xy + 100], dim=-1),
+        input_indices=torch.zeros(args.num_objects, dtype=torch.int64)
+    )
+    t_frame = timed(lambda: draw_owl_output(image.copy(), output, text=text), args.repeats)
+
+    print(f"labels per frame:               {len(labels)}")
+    print(f"full-frame overlay (ms/frame):  {t_full:.2f}")
+    print(f"cached sprites (ms/frame):      {t_sprite:.2f}")
+    print(f"speedup:                        {t_full / t_sprite:.1f}x")
+    print(f"max |pixel diff|:               {diff.max()}")
+    print(f"draw_owl_output (ms/frame):     {t_frame:.2f}")
+
+
+if __name__ == "__main__":
+    main()
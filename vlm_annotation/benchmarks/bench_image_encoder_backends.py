@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Image encoder throughput of the eager torch and onnxruntime backends on CPU.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_image_encoder_backends --threads 1 4 8 --batch_sizes 1 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import torch
+
+from nanoowl.owl_predictor import OwlPredictor
+
+
+def images_per_second(encode, image: torch.Tensor, repeats: int):
+    encode(image)  # warm up
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        encode(image)
+    return repeats * image.shape[0] / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_name", type=str, default="google/owlvit-base-patch32")
+    parser.add_argument("--onnx_path", type=str, default=None, help="exported image encoder, exported to a temp dir if omitted")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0])
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    torch_predictor = OwlPredictor(args.model_name, device="cpu")
+
+    onnx_path = args.onnx_path
+    if onnx_path is None:
+        onnx_path = os.path.join(tempfile.mkdtemp(), "image_encoder.onnx")
+        torch_predictor.export_image_encoder_onnx(onnx_path)
+
+    size = torch_predictor.image_size
+
+    print(f"{'backend':<12} {'threads':>7} {'batch':>5} {'img/s':>8}")
+    for num_threads in args.threads:
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        session = OwlPredictor.load_image_encoder_onnxruntime(
+            onnx_path,
+            max_batch_size=max(args.batch_sizes),
+            intra_op_num_threads=num_threads
+        )
+        for batch_size in args.batch_sizes:
+            image = torch.randn(batch_size, 3, size, size)
+            with torch.no_grad():
+                torch_ips = images_per_second(torch_predictor.encode_image_torch, image, args.repeats)
+            onnx_ips = images_per_second(session, image, args.repeats)
+            print(f"{'torch':<12} {num_threads:>7} {batch_size:>5} {torch_ips:>8.2f}")
+            print(f"{'onnxruntime':<12} {num_threads:>7} {batch_size:>5} {onnx_ips:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
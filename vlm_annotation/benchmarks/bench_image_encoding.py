@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""OwlPredictor image encodings: full vs. slim vs. lazy box head.
+
+For each mode, times encode_full_image and decode, and reports the bytes one
+cached encoding holds (what OwlImageEncodingCache keeps per entry).
+
+    cd vlm_annotation
+    python -m benchmarks.bench_image_encoding --device cpu --num_queries 8 --threshold 0.1
+"""
+
+import argparse
+import time
+from dataclasses import fields
+
+import numpy as np
+import torch
+from PIL import Image as PILImage
+
+from nanoowl.owl_predictor import OwlPredictor
+
+
+LABELS = ["a cup", "a bowl", "a spoon", "a fork", "a knife", "a plate", "a tray", "a lid"]
+
+
+def timed(fn, device: str, repeats: int):
+    fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - t0)
+    return 1000. * float(np.median(times))
+
+
+def encoding_bytes(encodings) -> int:
+    tensors = [getattr(encodings, f.name) for f in fields(encodings)]
+    return sum(t.numel() * t.element_size() for t in tensors if t is not None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_name", type=str, default="google/owlvit-base-patch32")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--num_queries", type=int, default=8)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    image = PILImage.fromarray(np.random.RandomState(0).randint(0, 255, (1080, 1920, 3), dtype=np.uint8))
+    text = [f"{LABELS[i % len(LABELS)]} {i}" for i in range(args.num_queries)]
+
+    print(f"{'mode':<11} {'encode ms':>10} {'decode ms':>10} {'detections':>10} {'KiB / encoding':>15}")
+    with torch.no_grad():
+        for mode in ("full", "slim", "lazy_boxes"):
+            predictor = OwlPredictor(args.model_name, device=args.device, image_encoding=mode)
+            text_encodings = predictor.encode_text(text)
+            encodings = predictor.encode_full_image(image)
+            output = predictor.decode(encodings, text_encodings, threshold=args.threshold)
+            encode_ms = timed(lambda: predictor.encode_full_image(image), args.device, args.repeats)
+            decode_ms = timed(lambda: predictor.decode(encodings, text_encodings, threshold=args.threshold), args.device, args.repeats)
+            print(f"{mode:<11} {encode_ms:>10.1f} {decode_ms:>10.2f} {len(output.labels):>10} {encoding_bytes(encodings) / 1024:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Re-query latency of OwlPredictor.predict vs. predict_with_cache.
+
+Simulates an annotator rewording the object names for one image: the first
+query pays for the image encoder, later queries only encode text and decode.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_image_encoding_cache --image /data/scene_01_0_rgb.png
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+from PIL import Image as PILImage
+
+from nanoowl.owl_predictor import OwlPredictor
+
+
+QUERIES = [
+    ["a bowl", "a cup", "a spoon"],
+    ["a white bowl", "a red cup", "a metal spoon"],
+    ["a plate", "a mug", "a fork"],
+    ["a tray", "a cup", "a spoon"],
+]
+
+
+def timed(fn, device: str, repeats: int):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - t0)
+    return 1000. * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", type=str, default=None, help="RGB image, random 1920x1080 if omitted")
+    parser.add_argument("--model_name", type=str, default="google/owlvit-base-patch32")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--offload", action="store_true", help="keep cached encodings on CPU in fp16")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.image is not None:
+        image = PILImage.open(args.image).convert("RGB")
+    else:
+        image = PILImage.fromarray(np.random.randint(0, 255, (1080, 1920, 3), dtype=np.uint8))
+
+    predictor = OwlPredictor(
+        args.model_name,
+        device=args.device,
+        image_encoding_cache_offload=args.offload
+    )
+
+    with torch.no_grad():
+        # warm up
+        predictor.predict(image, QUERIES[0], None)
+
+        uncached = [
+            timed(lambda: predictor.predict(image, q, None), args.device, args.repeats)
+            for q in QUERIES
+        ]
+
+        predictor.image_encoding_cache.clear()
+        first = timed(lambda: predictor.predict_with_cache(image, QUERIES[0], None), args.device, 1)
+        requery = [
+            timed(lambda: predictor.predict_with_cache(image, q, None), args.device, args.repeats)
+            for q in QUERIES[1:]
+        ]
+
+    print(f"predict (ms/query):              {np.mean(uncached):.1f}")
+    print(f"predict_with_cache miss (ms):    {first:.1f}")
+    print(f"predict_with_cache re-query (ms): {np.mean(requery):.1f}")
+    print(f"re-query speedup:                {np.mean(uncached) / np.mean(requery):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
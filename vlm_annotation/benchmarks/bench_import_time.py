@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Import time of nanoowl modules and inference.py, each in a fresh interpreter.
+
+Reports the cold import time, and the time with the model dependencies
+(torch, transformers, clip, cv2, ...) already imported, i.e. what the
+module itself adds, such as matplotlib. The latter is compared against
+--budget_ms and the script exits with status 1 if a module is over budget.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_import_time --budget_ms 150
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+MODULES = [
+    "nanoowl.colors",
+    "nanoowl.image_preprocessor",
+    "nanoowl.tree",
+    "nanoowl.owl_predictor",
+    "nanoowl.clip_predictor",
+    "nanoowl.tree_predictor",
+    "nanoowl.label_drawing",
+    "nanoowl.owl_drawing",
+    "nanoowl.tree_drawing",
+    "inference",
+    "render_helper_viz",
+]
+
+DEPENDENCIES = [
+    "numpy",
+    "PIL.Image",
+    "cv2",
+    "torch",
+    "torchvision.ops",
+    "transformers.models.owlvit.modeling_owlvit",
+    "clip",
+    "tqdm",
+]
+
+
+def import_ms(module: str, preload: list[str], repeats: int) -> tuple[float, bool]:
+    code = "\n".join(
+        [f"try:\n    import {m}\nexcept ImportError:\n    pass" for m in preload] + [
+            "import sys, time, json",
+            "t0 = time.perf_counter()",
+            f"import {module}",
+            "print(json.dumps([1000. * (time.perf_counter() - t0), 'matplotlib' in sys.modules]))",
+        ]
+    )
+    times = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent.parent
+        )
+        ms, matplotlib_loaded = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(ms)
+    return float(np.median(times)), matplotlib_loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--budget_ms", type=float, default=150., help="allowed import time on top of the dependencies")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'cold ms':>8} {'own ms':>8} {'matplotlib':>10}")
+    over = []
+    for module in args.modules:
+        cold_ms, _ = import_ms(module, [], args.repeats)
+        own_ms, matplotlib_loaded = import_ms(module, DEPENDENCIES, args.repeats)
+        flag = "  OVER BUDGET" if own_ms > args.budget_ms else ""
+        print(f"{module:<28} {cold_ms:>8.0f} {own_ms:>8.0f} {str(matplotlib_loaded):>10}{flag}")
+        if flag:
+            over.append(module)
+    if over:
+        print(f"over the {args.budget_ms:.0f} ms budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""OwlPredictor execution modes: autograd vs. inference_mode, fp32 vs. bf16 autocast.
+
+Each mode runs in its own interpreter so that peak RSS is its own: the
+inference.py path (encode_text, encode_full_image, decode) over a few
+1080p frames, reporting images/s and the peak resident set size.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_precision --device cpu
+    python -m benchmarks.bench_precision --model_name /tmp/nanoowl_random/owlvit_full_size   # offline
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+MODES = {
+    "autograd fp32": dict(inference_mode=False, precision="fp32"),
+    "inference fp32": dict(inference_mode=True, precision="fp32"),
+    "inference bf16": dict(inference_mode=True, precision="bf16"),
+}
+
+LABELS = ["a cup", "a bowl", "a spoon", "a fork"]
+
+
+def child(args):
+    import numpy as np
+    import torch
+    from PIL import Image as PILImage
+    from nanoowl.owl_predictor import OwlPredictor
+
+    if args.num_threads > 0:
+        torch.set_num_threads(args.num_threads)
+    predictor = OwlPredictor(args.model_name, device=args.device, **MODES[args.mode])
+    rng = np.random.RandomState(0)
+    images = [PILImage.fromarray(rng.randint(0, 255, (1080, 1920, 3), dtype=np.uint8)) for _ in range(args.num_images)]
+
+    def run(image):
+        # what process_image does, without the files
+        text_encodings = predictor.encode_text(LABELS)
+        encodings = predictor.encode_full_image(image)
+        return predictor.decode(encodings, text_encodings, threshold=args.threshold)
+
+    run(images[0])
+    t0 = time.perf_counter()
+    for image in images:
+        output = run(image)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps(dict(
+        images_per_s=len(images) / elapsed,
+        detections=len(output.labels),
+        max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+    )))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_name", type=str, default="google/owlvit-base-patch32")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--num_images", type=int, default=8)
+    parser.add_argument("--num_threads", type=int, default=0, help="torch threads (0 = default)")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--mode", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        child(args)
+        return
+
+    print(f"{'mode':<16} {'images/s':>9} {'max rss MB':>11} {'detections':>10}")
+    for mode in args.modes:
+        command = [
+            sys.executable, "-m", "benchmarks.bench_precision", "--mode", mode,
+            "--model_name", args.model_name, "--device", args.device, "--num_images", str(args.num_images),
+            "--num_threads", str(args.num_threads), "--threshold", str(args.threshold)
+        ]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<16} {r['images_per_s']:>9.2f} {r['max_rss_mb']:>11.0f} {r['detections']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Full-frame preprocess + extract_rois vs. ImagePreprocessor.preprocess_resized.
+
+Does not need model weights.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_preprocessing --device cpu --width 1920 --height 1080
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image as PILImage
+from torchvision.ops import roi_align
+
+from nanoowl.image_preprocessor import ImagePreprocessor
+
+
+def full_frame_path(preprocessor: ImagePreprocessor, image, size: int, pad_square: bool):
+    # same steps as OwlPredictor.extract_rois for the full-image roi
+    image_tensor = preprocessor.preprocess_image(image)
+    h, w = image_tensor.shape[-2:]
+    if pad_square:
+        s = max(w, h) / 2
+        roi = [w / 2 - s, h / 2 - s, w / 2 + s, h / 2 + s]
+    else:
+        roi = [0, 0, w, h]
+    rois = torch.tensor([roi], dtype=image_tensor.dtype, device=image_tensor.device)
+    roi_images = roi_align(image_tensor, [rois], output_size=(size, size))
+    if pad_square:
+        grid = torch.linspace(0., 1., size, device=image_tensor.device)
+        pad_x = (s - w / 2) / (2 * s)
+        pad_y = (s - h / 2) / (2 * s)
+        mask_x = (grid > pad_x) & (grid < 1. - pad_x)
+        mask_y = (grid > pad_y) & (grid < 1. - pad_y)
+        roi_images = roi_images * (mask_y[:, None] & mask_x[None, :])
+    return roi_images
+
+
+def fused_path(preprocessor: ImagePreprocessor, image, size: int, pad_square: bool):
+    return preprocessor.preprocess_resized(image, size, pad_square=pad_square)
+
+
+def timed(fn, device: str, repeats: int):
+    fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - t0)
+    return 1000. * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--size", type=int, default=768)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    preprocessor = ImagePreprocessor().to(args.device).eval()
+
+    # smooth content, so the interpolation difference reflects real frames
+    array = np.random.randint(0, 255, (args.height // 16, args.width // 16, 3), dtype=np.uint8)
+    array = F.interpolate(
+        torch.from_numpy(array).permute(2, 0, 1)[None].float(),
+        size=(args.height, args.width), mode="bilinear"
+    )[0].permute(1, 2, 0).round().byte().numpy()
+    inputs = {"pil": PILImage.fromarray(array), "numpy": np.ascontiguousarray(array)}
+
+    print(f"{'input':<6} {'pad_square':>10} {'full-frame ms':>14} {'fused ms':>9} {'speedup':>8} {'mean |diff|':>12}")
+    for name, image in inputs.items():
+        for pad_square in (False, True):
+            reference = full_frame_path(preprocessor, image, args.size, pad_square)
+            fused = fused_path(preprocessor, image, args.size, pad_square)
+            diff = float((reference - fused).abs().mean())
+            t_ref = timed(lambda: full_frame_path(preprocessor, image, args.size, pad_square), args.device, args.repeats)
+            t_fused = timed(lambda: fused_path(preprocessor, image, args.size, pad_square), args.device, args.repeats)
+            print(f"{name:<6} {str(pad_square):>10} {t_ref:>14.2f} {t_fused:>9.2f} {t_ref / t_fused:>7.1f}x {diff:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Accuracy and speed of the int8 dynamic quantized OwlPredictor vs. fp32.
+
+Each image with a helper file in --helper_dir is queried with the categories
+of that file. Boxes go through the same per-class selection as inference.py
+and are compared against the stored helper boxes (and int8 against fp32) as
+mean IoU and top-1 label agreement.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_quantization --img_dir /data --limit 30
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image as PILImage
+
+from inference import select_helper_boxes
+from nanoowl.owl_predictor import OwlPredictor
+
+
+ROOT = Path(__file__).parent.parent.parent
+
+
+def load_helper_file(path: Path) -> list[tuple[str, list[float]]]:
+    raw = json.loads(path.read_text())
+    items = raw.get(f"{path.stem}_rgb", [])
+    out = []
+    for it in items:
+        bb = it["bbox"]
+        out.append((it["category"], [
+            bb["cx"] - bb["w"] / 2, bb["cy"] - bb["h"] / 2,
+            bb["cx"] + bb["w"] / 2, bb["cy"] + bb["h"] / 2
+        ]))
+    return out
+
+
+def reports_to_boxes(reports: list[dict]) -> list[tuple[str, list[float]]]:
+    return [
+        (r["category"], [
+            r["cx"] - r["bbox_w"] / 2, r["cy"] - r["bbox_h"] / 2,
+            r["cx"] + r["bbox_w"] / 2, r["cy"] + r["bbox_h"] / 2
+        ])
+        for r in reports
+    ]
+
+
+def iou(a, b) -> float:
+    ix = max(0., min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0., min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.
+
+
+def compare(reference, candidate):
+    """Returns (IoU with the same-class candidate box, top-1 label agreement) per reference box."""
+    ious, agree = [], []
+    candidate_by_class = dict(candidate)
+    for category, box in reference:
+        same = candidate_by_class.get(category)
+        ious.append(iou(box, same) if same is not None else 0.)
+        overlaps = [(iou(box, b), c) for c, b in candidate]
+        best = max(overlaps, default=(0., None))
+        agree.append(best[0] > 0 and best[1] == category)
+    return ious, agree
+
+
+def run(predictor: OwlPredictor, image: PILImage.Image, text: list[str]):
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        output = predictor.predict(image, text, None, threshold=0.1, pad_square=False)
+    dt = time.perf_counter() - t0
+    return reports_to_boxes(select_helper_boxes(output, text, image.width, image.height)), dt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--img_dir", required=True, help="directory with <scene>_rgb.png")
+    parser.add_argument("--helper_dir", default=str(ROOT / "outputs_helper"))
+    parser.add_argument("--model_name", type=str, default="google/owlvit-base-patch32")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--save_weights", type=str, default=None, help="write the quantized state dict here")
+    args = parser.parse_args()
+
+    fp32 = OwlPredictor(args.model_name, device="cpu")
+    int8 = OwlPredictor(args.model_name, device="cpu", quantize="int8_dynamic")
+    if args.save_weights is not None:
+        int8.save_quantized_weights(args.save_weights)
+
+    helper_paths = sorted(Path(args.helper_dir).glob("*.json"))[:args.limit]
+
+    stats = {k: [] for k in ("fp32_iou", "fp32_agree", "int8_iou", "int8_agree", "delta_iou", "delta_agree")}
+    fp32_times, int8_times = [], []
+    for path in helper_paths:
+        image_path = Path(args.img_dir) / f"{path.stem}_rgb.png"
+        if not image_path.exists():
+            continue
+        helper = load_helper_file(path)
+        if not helper:
+            continue
+        text = [c for c, _ in helper]
+        image = PILImage.open(image_path).convert("RGB")
+
+        fp32_boxes, dt = run(fp32, image, text)
+        fp32_times.append(dt)
+        int8_boxes, dt = run(int8, image, text)
+        int8_times.append(dt)
+
+        for prefix, reference, candidate in (
+                ("fp32", helper, fp32_boxes),
+                ("int8", helper, int8_boxes),
+                ("delta", fp32_boxes, int8_boxes)):
+            ious, agree = compare(reference, candidate)
+            stats[f"{prefix}_iou"] += ious
+            stats[f"{prefix}_agree"] += agree
+
+    if not fp32_times:
+        print("No images found.")
+        return
+
+    print(f"images:                        {len(fp32_times)}")
+    print(f"fp32 vs helper  mean IoU / top-1: {np.mean(stats['fp32_iou']):.3f} / {np.mean(stats['fp32_agree']):.3f}")
+    print(f"int8 vs helper  mean IoU / top-1: {np.mean(stats['int8_iou']):.3f} / {np.mean(stats['int8_agree']):.3f}")
+    print(f"int8 vs fp32    mean IoU / top-1: {np.mean(stats['delta_iou']):.3f} / {np.mean(stats['delta_agree']):.3f}")
+    print(f"fp32 / int8 (s/img):           {np.mean(fp32_times):.3f} / {np.mean(int8_times):.3f}")
+    print(f"speedup:                       {np.mean(fp32_times) / np.mean(int8_times):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Offline benchmark suite: preprocessing, encode, decode, NMS and tree prediction.
+
+Runs on the random checkpoints of nanoowl.tiny_models, so it needs no
+downloads (--full_size for the real hidden sizes). Results are written as
+JSON and compared against a stored baseline; cases slower than the baseline
+by more than --tolerance are flagged and the script exits with status 1.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_suite --output results.json --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --output benchmarks/baseline.json   # (re)create the baseline
+
+The committed benchmarks/baseline.json is from one CPU thread (see its
+"meta"); re-create it on the machine the suite is compared on.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image as PILImage
+
+from nanoowl.owl_predictor import OwlEncodeImageOutput
+from nanoowl.sync_timer import Profiler, synchronize
+from nanoowl.tiny_models import build_tiny_predictors
+from nanoowl.tree import Tree
+from nanoowl.tree_predictor import TreePredictor
+
+
+IMAGE_SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+BATCH_SIZES = [1, 4]
+QUERY_COUNTS = [1, 8, 32]
+NMS_BATCH_SIZES = [1, 4, 16]
+TREE_PROMPTS = [
+    "[a tray [a cup, a spoon]]",
+    "[a tray [a cup (red, blue), a spoon], a plate [a fork, a knife]]",
+]
+LABELS = ["a cup", "a bowl", "a spoon", "a fork", "a knife", "a plate", "a tray", "a lid"]
+
+
+def timed(fn, device: str, repeats: int) -> dict:
+    fn()
+    times = []
+    for _ in range(repeats):
+        synchronize(device)
+        t0 = time.perf_counter()
+        fn()
+        synchronize(device)
+        times.append(1000. * (time.perf_counter() - t0))
+    return {
+        "median_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "repeats": repeats
+    }
+
+
+def random_image(width: int, height: int) -> PILImage.Image:
+    rng = np.random.RandomState(0)
+    return PILImage.fromarray(rng.randint(0, 255, (height, width, 3), dtype=np.uint8))
+
+
+def queries(count: int) -> list:
+    return [f"{LABELS[i % len(LABELS)]} {i}" for i in range(count)]
+
+
+def run_cases(owl, clip, device: str, repeats: int) -> dict:
+    results = {}
+    size = owl.image_size
+
+    with torch.no_grad():
+        for w, h in IMAGE_SIZES:
+            image = random_image(w, h)
+            results[f"preprocess/full_frame/{w}x{h}"] = timed(
+                lambda: owl.extract_rois(
+                    owl.image_preprocessor.preprocess_image(image),
+                    torch.tensor([[0, 0, w, h]], dtype=torch.float32, device=device)
+                ),
+                device, repeats
+            )
+            results[f"preprocess/resized/{w}x{h}"] = timed(
+                lambda: owl.image_preprocessor.preprocess_resized(image, size), device, repeats
+            )
+
+        for b in BATCH_SIZES:
+            image = torch.randn(b, 3, size, size, device=device)
+            results[f"encode_image/owl/batch{b}"] = timed(lambda: owl.encode_image(image), device, repeats)
+            rois = torch.randn(b, 3, *clip.get_image_size(), device=device)
+            results[f"encode_image/clip/batch{b}"] = timed(lambda: clip.encode_image(rois), device, repeats)
+
+        image_encodings = owl.encode_image(torch.randn(1, 3, size, size, device=device))
+        for n in QUERY_COUNTS:
+            text = queries(n)
+            results[f"encode_text/owl/queries{n}"] = timed(lambda: owl.encode_text(text), device, repeats)
+            text_encodings = owl.encode_text(text)
+            results[f"decode/queries{n}"] = timed(
+                lambda: owl.decode(image_encodings, text_encodings, threshold=0.1), device, repeats
+            )
+
+        # every patch above the threshold: the per-class NMS sees B x num_patches boxes
+        text_encodings = owl.encode_text(queries(8))
+        for b in NMS_BATCH_SIZES:
+            encodings = OwlEncodeImageOutput(
+                image_embeds=image_encodings.image_embeds.expand(b, -1, -1),
+                image_class_embeds=torch.randn(b, *image_encodings.image_class_embeds.shape[1:], device=device),
+                logit_shift=image_encodings.logit_shift.expand(b, -1, -1),
+                logit_scale=image_encodings.logit_scale.expand(b, -1, -1),
+                pred_boxes=image_encodings.pred_boxes.expand(b, -1, -1) + torch.rand(b, 1, 1, device=device)
+            )
+            profiler = owl.profiler
+            owl.profiler = Profiler()
+            timed(lambda: owl.decode(encodings, text_encodings, threshold=0.0), device, repeats)
+            stats = owl.profiler.stats()["decode/nms"]
+            owl.profiler = profiler
+            results[f"nms/boxes{b * owl.num_patches}"] = {
+                "median_ms": stats["p50_ms"],
+                "p95_ms": stats["p95_ms"],
+                "repeats": stats["count"]
+            }
+
+    tree_predictor = TreePredictor(owl_predictor=owl, clip_predictor=clip, device=device)
+    for w, h in IMAGE_SIZES[:2]:
+        image = random_image(w, h)
+        for i, prompt in enumerate(TREE_PROMPTS):
+            tree = Tree.from_prompt(prompt)
+            clip_text_encodings = tree_predictor.encode_clip_text(tree)
+            owl_text_encodings = tree_predictor.encode_owl_text(tree)
+            results[f"tree/prompt{i}/{w}x{h}"] = timed(
+                lambda: tree_predictor.predict(
+                    image, tree,
+                    clip_text_encodings=clip_text_encodings,
+                    owl_text_encodings=owl_text_encodings
+                ),
+                device, repeats
+            )
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints results next to the baseline, returns the names of regressed cases."""
+    regressions = []
+    print(f"{'case':<40} {'median ms':>10} {'baseline':>10} {'ratio':>7}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<40} {result['median_ms']:>10.2f} {'-':>10} {'-':>7}")
+            continue
+        ratio = result["median_ms"] / max(base["median_ms"], 1e-9)
+        flag = ""
+        if ratio > 1. + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<40} {result['median_ms']:>10.2f} {base['median_ms']:>10.2f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--full_size", action="store_true", help="random weights with the real hidden sizes")
+    parser.add_argument("--model_dir", type=str, default=None, help="where the random checkpoints are kept (temp dir if omitted)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=str, default="benchmark_results.json")
+    parser.add_argument("--baseline", type=str, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. the baseline, 0.25 = 25%%")
+    args = parser.parse_args()
+    if args.baseline is not None and not os.path.exists(args.baseline):
+        parser.error(f"--baseline {args.baseline} does not exist, create it with --output {args.baseline}")
+
+    torch.manual_seed(0)
+    owl, clip = build_tiny_predictors(args.model_dir, device=args.device, full_size=args.full_size)
+    results = run_cases(owl, clip, args.device, args.repeats)
+
+    report = {
+        "meta": {
+            "device": args.device,
+            "full_size": args.full_size,
+            "torch": torch.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "num_threads": torch.get_num_threads(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Level-batched image encodes in TreePredictor.predict vs. one encode per label.
+
+For each prompt the rois of every tree level are recorded during predict,
+then encoded once per label (the previous schedule) and once per level.
+
+    cd vlm_annotation
+    python -m benchmarks.bench_tree_predictor --image /data/scene_01_0_rgb.png --device cpu
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+from PIL import Image as PILImage
+
+from nanoowl.owl_predictor import OwlPredictor
+from nanoowl.clip_predictor import ClipPredictor
+from nanoowl.tree import Tree
+from nanoowl.tree_predictor import TreePredictor
+
+
+PROMPTS = [
+    "[a tray [a cup, a spoon]]",
+    "[a tray [a cup, a spoon], a plate [a fork, a knife]]",
+    "[a tray [a cup (red, blue), a spoon], a bowl [a lid]]",
+]
+
+
+class RecordingTreePredictor(TreePredictor):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.levels = []
+
+    def encode_rois_batched(self, predictor, image, rois, max_rois_per_batch=64, image_indices=None):
+        self.levels.append((predictor, image, rois))
+        return super().encode_rois_batched(predictor, image, rois, max_rois_per_batch, image_indices)
+
+
+def timed(fn, device: str, repeats: int):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - t0)
+    return 1000. * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", type=str, default=None, help="RGB image, random 1920x1080 if omitted")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--max_rois_per_batch", type=int, default=64, help="0 = one batch")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    max_rois_per_batch = args.max_rois_per_batch if args.max_rois_per_batch > 0 else None
+
+    if args.image is not None:
+        image = PILImage.open(args.image).convert("RGB")
+    else:
+        image = PILImage.fromarray(np.random.randint(0, 255, (1080, 1920, 3), dtype=np.uint8))
+
+    predictor = RecordingTreePredictor(
+        owl_predictor=OwlPredictor(device=args.device),
+        clip_predictor=ClipPredictor(device=args.device),
+        device=args.device
+    )
+
+    print(f"{'prompt':<56} {'levels':>6} {'rois':>5} {'per-label ms':>13} {'per-level ms':>13} {'predict ms':>11}")
+    for prompt in PROMPTS:
+        tree = Tree.from_prompt(prompt)
+        predictor.levels = []
+        predict_ms = timed(
+            lambda: predictor.predict(image, tree, threshold=args.threshold, max_rois_per_batch=max_rois_per_batch),
+            args.device, 1
+        )
+        levels = predictor.levels
+        num_rois = sum(len(r) for _, _, rois in levels for r in rois)
+
+        def per_label():
+            with torch.no_grad():
+                for model, image_tensor, rois in levels:
+                    for r in rois:
+                        model.encode_rois(image_tensor, r)
+
+        def per_level():
+            with torch.no_grad():
+                for model, image_tensor, rois in levels:
+                    TreePredictor.encode_rois_batched(predictor, model, image_tensor, rois, max_rois_per_batch)
+
+        per_label_ms = timed(per_label, args.device, args.repeats)
+        per_level_ms = timed(per_level, args.device, args.repeats)
+        print(f"{prompt:<56} {len(levels):>6} {num_rois:>5} {per_label_ms:>13.1f} {per_level_ms:>13.1f} {predict_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Completion manifest of inference.py runs, so reruns only redo what changed.
+
+One JSON line per finished image, appended as soon as its outputs are written:
+
+    {"image_id": ..., "inputs": {"rgb_sha256", "query", "model", "threshold", ...},
+     "outputs": {"scene_01_0.json": <sha256>, ...}, "time": ...}
+
+An image is up to date if its last line has the same inputs and every output
+file still exists with the recorded checksum. Lines are short single writes
+to a file opened for appending, so the shards of a --local-workers run can
+share one manifest; a line truncated by a crash is ignored.
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CompletionManifest:
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._entries[entry["image_id"]] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, image_id: str):
+        return image_id in self._entries
+
+    def get(self, image_id: str) -> Optional[dict]:
+        return self._entries.get(image_id)
+
+    def is_up_to_date(self, image_id: str, inputs: dict) -> bool:
+        entry = self._entries.get(image_id)
+        if entry is None or entry["inputs"] != inputs:
+            return False
+        for name, sha256 in entry["outputs"].items():
+            path = self.path.parent / name
+            if not path.exists() or file_sha256(path) != sha256:
+                return False
+        return True
+
+    def record(self, image_id: str, inputs: dict, outputs: Iterable[Path], state: Optional[dict] = None):
+        """Append the entry of a finished image; ``outputs`` are files next to the manifest.
+
+        ``state`` is what the run carries over to the next image (e.g. the
+        preview tracker), to be restored from the entry when the image is skipped.
+        """
+        entry = dict(
+            image_id=image_id,
+            inputs=inputs,
+            outputs={Path(p).name: file_sha256(Path(p)) for p in outputs},
+            time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+        if state is not None:
+            entry["state"] = state
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._entries[image_id] = entry
@@ -2,16 +2,29 @@
 
 import argparse
 import json
+import multiprocessing
+import os
 import re
-import ast
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Iterator, Optional
 
 import numpy as np
+import torch
 from PIL import Image as PILImage
 from tqdm import tqdm
 
+from completion_manifest import CompletionManifest, file_sha256
+# the query of a capture is built as in the annotation backend, see backend/object_queries.py
+sys.path.append(str(Path(__file__).resolve().parent.parent / "backend"))
+from object_queries import metadata_query
+from nanoowl.model_cache import default_model_cache_dir
 from nanoowl.owl_predictor import OwlPredictor
-from nanoowl.owl_drawing import draw_owl_output
+from nanoowl.owl_drawing import DetectionTracker, draw_owl_output
+from nanoowl.sync_timer import Profiler
+from viz_io import VIZ_SUFFIXES, save_viz
 
 # ----------------------------------------------------------------------
 # Helpers
@@ -31,56 +44,71 @@ def format_detection(report):
         f"conf={report['conf']:.3f}"
     )
     
-def load_queries_from_metadata(meta_root: Path) -> dict:
-    def add_article(name: str) -> str:
-        name = name.strip()
-        article = "an" if name[0].lower() in "aeiou" else "a"
-        return f"{article} {name}"
-
-    image_query_dict = {}
-
-    for i in range(80, 81):  # scene_01 to scene_80
-        for j in range(3):  # 0, 1, 2
-            scene_id = f"scene_{i:02d}_{j}"
-            meta_path = meta_root / f"{scene_id}_metadata.json"
-            if not meta_path.exists():
+def _scene_key(scene: str) -> tuple:
+    """'scene_07_2', '07_2' -> (7, 2); '07' -> (7,)."""
+    return tuple(int(p) for p in scene.replace("scene_", "").split("_"))
+
+
+def parse_scene_filter(spec: Optional[str]) -> Optional[Callable[[str], bool]]:
+    """Predicate on image ids for --scenes, e.g. "01_0..27_2", "03,05_1" or "10..12".
+
+    Ranges are inclusive; a scene without view index covers all its views.
+    """
+    if not spec:
+        return None
+    ranges = []
+    for item in spec.split(","):
+        first, _, last = item.strip().partition("..")
+        first, last = _scene_key(first), _scene_key(last or first)
+        # (7,) <= (7, 2) < (7, inf): a bare scene number covers all its views
+        ranges.append((first, last + (float("inf"),)))
+
+    def selected(image_id: str) -> bool:
+        key = _scene_key(image_id)
+        return any(first <= key <= last for first, last in ranges)
+
+    return selected
+
+
+def find_metadata(meta_root: Path, scenes: Optional[str] = None) -> dict:
+    """{image_id: path} of every *_metadata.json under meta_root, sorted by id."""
+    selected = parse_scene_filter(scenes)
+    paths = {}
+    for path in meta_root.rglob("*_metadata.json"):
+        image_id = path.name[:-len("_metadata.json")]
+        try:
+            if selected is not None and not selected(image_id):
                 continue
+        except ValueError:
+            continue  # not a scene_NN_V capture
+        paths[image_id] = path
+    return dict(sorted(paths.items()))
 
-            with open(meta_path, "r") as f:
-                meta = json.load(f)
 
-            
-            object_names = meta.get("object_names", [])
-            container_names = meta.get("container_name", [])
-            container_names = ast.literal_eval(container_names)
+def _read_query(path: Path) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return metadata_query(json.load(f))
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        # unreadable, not JSON, or not a metadata object: skip this capture, not the run
+        print(f"Could not read {path}: {e}")
+        return None
 
 
-            # Add article (a/an) to each name
-            container_names = [add_article(name) for name in container_names] 
-            all_items = container_names + object_names
-            query_str = ", ".join(all_items)
-            image_query_dict[scene_id] = query_str
+def iter_queries_from_metadata(metadata_paths: dict, num_workers: int = 8) -> Iterator[tuple[str, str]]:
+    """Yield (image_id, query) in order while a thread pool parses the files ahead."""
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for image_id, query in zip(metadata_paths, executor.map(_read_query, metadata_paths.values())):
+            if query is not None:
+                yield image_id, query
 
-    return image_query_dict
 
+def load_queries_from_metadata(meta_root: Path, scenes: Optional[str] = None, num_workers: int = 8) -> dict:
+    return dict(iter_queries_from_metadata(find_metadata(meta_root, scenes), num_workers))
 
-def process_image(image_path: str, query: str, out_path: Path, predictor: OwlPredictor):
-    text_list = parse_query(query)
-    thresholds = [0.1] * len(text_list)
-
-    rgb_pil = PILImage.open(image_path)
-    w, h = rgb_pil.size
-
-    text_enc = predictor.encode_text(text_list)
-    output = predictor.predict(
-        image=rgb_pil,
-        text=text_list,
-        text_encodings=text_enc,
-        threshold=thresholds,
-        nms_threshold=0.5,
-        pad_square=False,
-    )
 
+def select_helper_boxes(output, text_list: list[str], w: int, h: int) -> list[dict]:
+    """Keep the most confident, not frame-sized detection per class."""
     best = {}
     for i, box in enumerate(output.boxes):
         cls_idx = int(output.labels[i])
@@ -93,10 +121,6 @@ def process_image(image_path: str, query: str, out_path: Path, predictor: OwlPre
         if cls_name not in best or conf > best[cls_name]["conf"]:
             best[cls_name] = {"box": (x1, y1, x2, y2), "conf": conf}
 
-    if not best:
-        print(f"No valid detections for {image_path}")
-        return
-
     reports = []
     for idx, (obj_cls, data) in enumerate(best.items(), start=1):
         x1, y1, x2, y2 = data["box"]
@@ -109,9 +133,41 @@ def process_image(image_path: str, query: str, out_path: Path, predictor: OwlPre
             bbox_h=abs(y2 - y1),
             conf=data["conf"],
         ))
+    return reports
 
-    drawn = draw_owl_output(rgb_pil, output, text=text_list, draw_text=True)
-    drawn.save(out_path.with_suffix(".png"))
+
+def process_image(image_path: str, query: str, out_path: Path, predictor: OwlPredictor,
+                  viz: str = "png", viz_scale: float = 1.0, tracker: Optional[DetectionTracker] = None,
+                  threshold: float = 0.1, nms_threshold: float = 0.5) -> list[Path]:
+    """Detect the queries in one image, return the files written (none without detections)."""
+    text_list = parse_query(query)
+    thresholds = [threshold] * len(text_list)
+
+    rgb_pil = PILImage.open(image_path)
+    w, h = rgb_pil.size
+
+    text_enc = predictor.encode_text(text_list)
+    output = predictor.predict(
+        image=rgb_pil,
+        text=text_list,
+        text_encodings=text_enc,
+        threshold=thresholds,
+        nms_threshold=nms_threshold,
+        pad_square=False,
+    )
+
+    reports = select_helper_boxes(output, text_list, w, h)
+    if not reports:
+        print(f"No valid detections for {image_path}")
+        remove_stale_outputs(out_path, [])
+        return []
+
+    # previews can also be rendered later from the JSON with render_helper_viz.py
+    written = []
+    if viz != "none":
+        drawn = draw_owl_output(rgb_pil, output, text=text_list, draw_text=True, tracker=tracker)
+        save_viz(drawn, out_path, viz, viz_scale)
+        written.append(out_path.with_suffix(VIZ_SUFFIXES[viz]))
 
     image_id = Path(image_path).stem
     json_output = {
@@ -133,35 +189,286 @@ def process_image(image_path: str, query: str, out_path: Path, predictor: OwlPre
 
     with open(out_path.with_suffix(".json"), "w") as f:
         json.dump(json_output, f, indent=2)
+    written.append(out_path.with_suffix(".json"))
+    remove_stale_outputs(out_path, written)
+    return written
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--img_dir", required=True, help="Directory of images")
-    parser.add_argument("--out_dir", default="outputs", help="Directory to save results")
-    args = parser.parse_args()
+def remove_stale_outputs(out_path: Path, written: list[Path]):
+    """Delete the outputs of an earlier run of the image that this run did not write again."""
+    for suffix in [".json", *VIZ_SUFFIXES.values()]:
+        path = out_path.with_suffix(suffix)
+        if path not in written and path.exists():
+            path.unlink()
 
-    img_dir = Path(args.img_dir)
-    out_dir = Path(args.out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
 
-    image_queries = load_queries_from_metadata(img_dir)  # or meta_dir if metadata is elsewhere
+def scene_of(image_id: str) -> str:
+    """scene_01_2 -> scene_01, the views of a scene share one layout."""
+    return image_id.rsplit("_", 1)[0]
+
+
+def shard_by_scene(items: dict, num_shards: int, shard_index: int) -> dict:
+    """Deterministic split of {image_id: ...} into contiguous scene ranges, like output/assignment.txt.
+
+    Scenes are sorted by id and cut into ``num_shards`` ranges of (nearly)
+    equal scene count; all views of a scene land in the same shard.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}.")
+    scenes = sorted({scene_of(image_id) for image_id in items})
+    selected = set(scenes[shard_index * len(scenes) // num_shards:(shard_index + 1) * len(scenes) // num_shards])
+    return {image_id: value for image_id, value in sorted(items.items()) if scene_of(image_id) in selected}
 
 
-    predictor = OwlPredictor(
-        "google/owlvit-base-patch32",
-        device="mps",
+def shard_manifest_path(out_dir: Path, num_shards: int, shard_index: int) -> Path:
+    return out_dir / f"run_manifest.shard{shard_index}of{num_shards}.json"
+
+
+MODEL_NAME = "google/owlvit-base-patch32"
+
+
+def run_inputs(args, image_path: Path, query: str) -> dict:
+    """Everything the outputs of an image depend on, compared on reruns.
+
+    Options that only change speed and not the outputs, such as
+    --image_encoding, are left out so switching them does not redo a run.
+    """
+    return dict(
+        rgb_sha256=file_sha256(image_path),
+        query=query,
+        model=MODEL_NAME,
+        device=args.device,
+        image_encoder_backend=args.image_encoder_backend,
+        onnx_path=args.onnx_path,
+        quantize=args.quantize,
+        quantized_weights=args.quantized_weights,
+        fused_preprocess=args.fused_preprocess,
+        precision=args.precision,
+        threshold=args.threshold,
+        nms_threshold=args.nms_threshold,
+        viz=args.viz,
+        viz_scale=args.viz_scale,
+    )
+
+
+def build_predictor(args) -> OwlPredictor:
+    return OwlPredictor(
+        MODEL_NAME,
+        device=args.device,
         image_encoder_engine=None,
+        image_encoder_backend=args.image_encoder_backend,
+        image_encoder_onnx=args.onnx_path,
+        onnxruntime_intra_op_num_threads=args.num_threads,
+        quantize=args.quantize,
+        quantized_weights=args.quantized_weights,
+        fused_preprocess=args.fused_preprocess,
+        profiler=Profiler(enabled=args.profile is not None),
+        model_cache_dir=args.model_cache_dir or None,
+        image_encoding=args.image_encoding,
+        precision=args.precision,
+        compile_mode=args.compile_mode,
     )
-    
-    for image_id, query in tqdm(image_queries.items()):
-        image_path = img_dir / f"{image_id}_rgb.png"
+
+
+def run_shard(args) -> dict:
+    """Process the images of shard ``args.shard_index`` and write its manifest."""
+    img_dir = Path(args.img_dir)
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    metadata_paths = find_metadata(img_dir, args.scenes)  # or meta_dir if metadata is elsewhere
+    metadata_paths = shard_by_scene(metadata_paths, args.shards, args.shard_index)
+    # metadata is parsed in the background while the first images are processed
+    image_queries = iter_queries_from_metadata(metadata_paths, args.metadata_workers)
+
+    # appended to by every shard writing to out_dir
+    completed = CompletionManifest(out_dir / "completed.jsonl")
+    predictor = None  # not loaded at all if every image is up to date
+
+    # previews keep picks stable across the views of a scene, not across scenes; the
+    # tracker state after each image is recorded, so a resumed run restores it for
+    # the images it skips and draws the same previews as a full run
+    tracker = DetectionTracker()
+    scene = None
+    processed = up_to_date = 0
+    t0 = time.perf_counter()
+    for image_id, query in tqdm(image_queries, total=len(metadata_paths), desc=f"shard {args.shard_index}/{args.shards}", position=args.shard_index):
+        image_path = metadata_paths[image_id].with_name(f"{image_id}_rgb.png")
         if not image_path.exists():
             print(f"Image {image_path} not found. Skipping.")
             continue
+        if not query:
+            print(f"No object names in the metadata of {image_id}. Skipping.")
+            continue
+        if scene_of(image_id) != scene:
+            scene = scene_of(image_id)
+            tracker.reset()
+        inputs = run_inputs(args, image_path, query)
+        if not args.force and completed.is_up_to_date(image_id, inputs):
+            tracker.load_state_dict(completed.get(image_id).get("state", {}).get("tracker", {}))
+            up_to_date += 1
+            continue
+        if predictor is None:
+            predictor = build_predictor(args)
         out_path = out_dir / image_id
-        process_image(str(image_path), query, out_path, predictor)
+        written = process_image(str(image_path), query, out_path, predictor, viz=args.viz, viz_scale=args.viz_scale,
+                                tracker=tracker, threshold=args.threshold, nms_threshold=args.nms_threshold)
+        completed.record(image_id, inputs, written, state=dict(tracker=tracker.state_dict()))
+        processed += 1
+    seconds = time.perf_counter() - t0
+
+    if args.profile is not None and predictor is not None:
+        prefix = args.profile if args.shards == 1 else f"{args.profile}.shard{args.shard_index}"
+        print(predictor.profiler.summary())
+        predictor.profiler.to_json(f"{prefix}.json")
+        predictor.profiler.export_chrome_trace(f"{prefix}.trace.json")
+
+    scenes = sorted({scene_of(image_id) for image_id in metadata_paths})
+    manifest = dict(
+        shard_index=args.shard_index,
+        num_shards=args.shards,
+        first_scene=scenes[0] if scenes else None,
+        last_scene=scenes[-1] if scenes else None,
+        scenes=len(scenes),
+        images=processed,
+        up_to_date=up_to_date,
+        skipped=len(metadata_paths) - processed - up_to_date,
+        seconds=seconds,
+        images_per_s=processed / seconds if seconds > 0 else 0.0,
+        torch_threads=torch.get_num_threads(),
+        cpus=sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+        pid=os.getpid(),
+    )
+    with open(shard_manifest_path(out_dir, args.shards, args.shard_index), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def merge_manifests(out_dir: Path, num_shards: int, wall_seconds: Optional[float] = None) -> dict:
+    """Combine the shard manifests of a run into <out_dir>/run_manifest.json."""
+    shards = []
+    for i in range(num_shards):
+        path = shard_manifest_path(out_dir, num_shards, i)
+        if not path.exists():
+            raise FileNotFoundError(f"Shard {i} of {num_shards} has not finished, {path} is missing.")
+        with open(path) as f:
+            shards.append(json.load(f))
+
+    images = sum(s["images"] for s in shards)
+    if wall_seconds is None:
+        # shards on different machines: the slowest one bounds the run
+        wall_seconds = max(s["seconds"] for s in shards)
+    manifest = dict(
+        num_shards=num_shards,
+        images=images,
+        wall_seconds=wall_seconds,
+        images_per_s=images / wall_seconds if wall_seconds > 0 else 0.0,
+        shards=shards,
+    )
+    with open(out_dir / "run_manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _local_worker(args, shard_index: int, num_threads: int, cpus: Optional[list]):
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(num_threads)
+    if args.num_threads == 0:
+        args.num_threads = num_threads
+    args.shard_index = shard_index
+    run_shard(args)
+
+
+def launch_local_workers(args) -> dict:
+    """Run ``args.local_workers`` shards in parallel processes on this machine.
+
+    The available cores are split evenly between the workers; with
+    ``args.pin_cpus`` worker i is pinned to its own contiguous block of them.
+    The workers are the shards of the run, so it cannot be combined with
+    ``--shards``; split across machines with --shards and one process each.
+    """
+    if args.shards > 1 or args.shard_index != 0:
+        raise ValueError("--local-workers cannot be combined with --shards / --shard-index, "
+                         "the local workers are the shards of the run.")
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    num_workers = args.local_workers
+    num_threads = max(1, len(cores) // num_workers)
+    if args.pin_cpus and not hasattr(os, "sched_setaffinity"):
+        raise ValueError("--pin_cpus needs os.sched_setaffinity (Linux).")
+
+    args.shards = num_workers
+    # spawn: every worker loads its own predictor, nothing is shared with the parent
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    t0 = time.perf_counter()
+    for i in range(num_workers):
+        cpus = cores[i * num_threads:(i + 1) * num_threads] if args.pin_cpus else None
+        worker = context.Process(target=_local_worker, args=(args, i, num_threads, cpus or None))
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
+    wall_seconds = time.perf_counter() - t0
+
+    failed = [i for i, worker in enumerate(workers) if worker.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"Shards {failed} failed, see their output above.")
+    return merge_manifests(Path(args.out_dir), num_workers, wall_seconds)
+
 
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--img_dir", required=True, help="Directory of images")
+    parser.add_argument("--scenes", default=None, help="only these scenes, e.g. 01_0..27_2 or 03,05_1 (default: every *_metadata.json)")
+    parser.add_argument("--metadata_workers", type=int, default=8, help="threads parsing the metadata files")
+    parser.add_argument("--out_dir", default="outputs", help="Directory to save results")
+    parser.add_argument("--device", default="mps", help="torch device, e.g. mps, cuda or cpu")
+    parser.add_argument("--image_encoder_backend", default="torch", choices=["torch", "onnxruntime"])
+    parser.add_argument("--onnx_path", default=None, help="Exported image encoder for --image_encoder_backend onnxruntime")
+    parser.add_argument("--num_threads", type=int, default=0, help="onnxruntime intra-op threads (0 = auto)")
+    parser.add_argument("--fused_preprocess", action="store_true", help="resize on the host before normalizing")
+    parser.add_argument("--image_encoding", default="full", choices=["full", "slim", "lazy_boxes"],
+                        help="lazy_boxes runs the box head only for patches above the threshold")
+    parser.add_argument("--precision", default="fp32", choices=["fp32", "bf16"],
+                        help="bf16 runs the encoders under autocast, boxes and scores stay fp32")
+    parser.add_argument("--compile_mode", default="none", choices=["none", "inductor", "torchscript"],
+                        help="compile the torch image encoder at startup, pays off on long runs")
+    parser.add_argument("--quantize", default=None, choices=["int8_dynamic"], help="CPU only")
+    parser.add_argument("--quantized_weights", default=None, help="state dict saved by OwlPredictor.save_quantized_weights")
+    parser.add_argument("--model_cache_dir", default=default_model_cache_dir(),
+                        help="mmap-able safetensors copy of the weights for fast worker start, empty to disable (env NANOOWL_MODEL_CACHE)")
+    parser.add_argument("--viz", default="png", choices=["none", "jpeg", "png"], help="preview image per frame, none for JSON only")
+    parser.add_argument("--viz_scale", type=float, default=1.0, help="downscale factor of the preview images")
+    parser.add_argument("--profile", default=None, help="write per-stage timings to <profile>.json and a Chrome trace to <profile>.trace.json")
+    parser.add_argument("--threshold", type=float, default=0.1, help="detection score threshold")
+    parser.add_argument("--nms_threshold", type=float, default=0.5)
+    parser.add_argument("--force", action="store_true", help="reprocess images that completed.jsonl lists as up to date")
+    parser.add_argument("--shards", type=int, default=1, help="split the scenes into this many contiguous ranges")
+    parser.add_argument("--shard-index", "--shard_index", dest="shard_index", type=int, default=0, help="range processed by this run")
+    parser.add_argument("--local-workers", "--local_workers", dest="local_workers", type=int, default=0,
+                        help="run this many shards in parallel processes, cores split evenly between them")
+    parser.add_argument("--pin_cpus", action="store_true", help="pin every local worker to its own cores")
+    parser.add_argument("--merge_manifests", action="store_true", help="only merge the manifests of --shards finished shards in --out_dir")
+    args = parser.parse_args()
+    if args.viz_scale <= 0:
+        parser.error("--viz_scale must be positive")
+    if args.shards < 1 or not 0 <= args.shard_index < args.shards:
+        parser.error("--shard-index must be in [0, --shards)")
+    if args.local_workers < 0:
+        parser.error("--local-workers must not be negative")
+    if args.local_workers > 0 and args.shards > 1:
+        parser.error("--local-workers cannot be combined with --shards > 1")
+
+    if args.local_workers > 0:
+        manifest = launch_local_workers(args)
+    elif args.merge_manifests:
+        manifest = merge_manifests(Path(args.out_dir), args.shards)
+    else:
+        run_shard(args)
+        return
+    print(f"{manifest['images']} images in {manifest['wall_seconds']:.1f} s "
+          f"({manifest['images_per_s']:.2f} images/s over {manifest['num_shards']} shards)")
 
 
 if __name__ == "__main__":
@@ -16,18 +16,24 @@
 
 import torch
 import clip
+import warnings
 import PIL.Image
 from torchvision.ops import roi_align
+from collections import OrderedDict
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
+from .compilation import COMPILE_MODES, compile_module
 from .image_preprocessor import ImagePreprocessor
+from .model_cache import get_shared_model, load_clip_model
+from .precision import PRECISIONS, autocast, inference_only
 
 
 __all__ = [
     "ClipPredictor",
     "ClipEncodeTextOutput",
     "ClipEncodeImageOutput",
-    "ClipDecodeOutput"
+    "ClipDecodeOutput",
+    "ClipTextEmbeddingCache"
 ]
 
 
@@ -52,26 +58,107 @@ class ClipDecodeOutput:
     scores: torch.Tensor
 
 
+class ClipTextEmbeddingCache:
+    """LRU cache of single-label text embeddings, keyed by
+    (model_name, device, precision, label).
+
+    Can be shared between predictors, entries of different models, devices
+    or precisions do not mix.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str, str, str], torch.Tensor]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key) -> Optional[torch.Tensor]:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, text_embeds: torch.Tensor):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = text_embeds.detach()
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class _ClipImageEncoderModule(torch.nn.Module):
+    """CLIP vision tower and projection as a module of image -> fp32 embeddings, for compilation."""
+
+    def __init__(self, visual: torch.nn.Module, precision: str = "fp32"):
+        super().__init__()
+        self.visual = visual
+        self.precision = precision
+
+    def forward(self, image):
+        with autocast(self.precision, image.device):
+            image_embeds = self.visual(image.type(self.visual.conv1.weight.dtype))
+        return image_embeds.float()
+
+
 class ClipPredictor(torch.nn.Module):
     
     def __init__(self,
             model_name: str = "ViT-B/32",
             image_size: Tuple[int, int] = (224, 224),
             device: str = "cuda",
-            image_preprocessor: Optional[ImagePreprocessor] = None
+            image_preprocessor: Optional[ImagePreprocessor] = None,
+            max_rois_per_batch: Optional[int] = 64,
+            text_embedding_cache: Optional[ClipTextEmbeddingCache] = None,
+            model_cache_dir: Optional[str] = None,
+            share_model: bool = True,
+            inference_mode: bool = True,
+            precision: str = "fp32",
+            compile_mode: str = "none"
         ):
         super().__init__()
+        if max_rois_per_batch is not None and max_rois_per_batch <= 0:
+            raise ValueError(f"max_rois_per_batch must be positive, got {max_rois_per_batch}.")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}.")
+        if compile_mode not in COMPILE_MODES:
+            raise ValueError(f"Unknown compile mode '{compile_mode}', expected one of {COMPILE_MODES}.")
+        # see nanoowl.precision; encoders run in `precision`, decode in fp32
+        self.inference_mode = inference_mode
+        self.precision = precision
         self.device = device
-        self.clip_model, _ = clip.load(model_name, device)
+        self.model_name = model_name
+        if share_model:
+            # one model per (name, device) in the process, see nanoowl.model_cache
+            self.clip_model = get_shared_model(
+                ("clip", model_name, str(device), model_cache_dir),
+                lambda: load_clip_model(model_name, device, model_cache_dir)
+            )
+        else:
+            self.clip_model = load_clip_model(model_name, device, model_cache_dir)
+        # caps the number of 224x224 crops held in memory by encode_rois
+        self.max_rois_per_batch = max_rois_per_batch
+        self.text_embedding_cache = text_embedding_cache if text_embedding_cache is not None else ClipTextEmbeddingCache()
         self.image_size = image_size
         print(f'image size: {image_size}')
-        self.mesh_grid = torch.stack(
-            torch.meshgrid(
-                torch.linspace(0., 1., self.image_size[1]),
-                torch.linspace(0., 1., self.image_size[0])
-            )
-        ).to(self.device).float()
+        # normalized roi coordinates of the output columns / rows, for the pad square mask
+        self.grid_x = torch.linspace(0., 1., self.image_size[1]).to(self.device).float()
+        self.grid_y = torch.linspace(0., 1., self.image_size[0]).to(self.device).float()
         self.image_preprocessor = image_preprocessor.to(self.device).eval() if image_preprocessor else ImagePreprocessor().to(self.device).eval()
+        # see nanoowl.compilation; None if eager, also after a failed compilation
+        self.image_encoder_compiled = compile_module(
+            _ClipImageEncoderModule(self.clip_model.visual, precision),
+            compile_mode,
+            [torch.zeros(1, 3, *self.image_size, device=self.device)]
+        )
+        self.compile_mode = compile_mode if self.image_encoder_compiled is not None else "none"
     
     def get_device(self):
         return self.device
@@ -79,22 +166,57 @@ class ClipPredictor(torch.nn.Module):
     def get_image_size(self):
         return self.image_size
 
+    def _text_cache_key(self, label: str) -> Tuple[str, str, str, str]:
+        return (self.model_name, str(self.device), self.precision, label)
+
+    @inference_only
     def encode_text(self, text: List[str]) -> ClipEncodeTextOutput:
-        text_tokens = clip.tokenize(text).to(self.device)
-        text_embeds = self.clip_model.encode_text(text_tokens)
+        if len(text) == 0:
+            return ClipEncodeTextOutput(text_embeds=torch.empty(
+                (0, self.clip_model.text_projection.shape[1]),
+                device=self.device
+            ))
+        # only labels missing from the cache are tokenized and encoded
+        embeds = {}
+        missing = []
+        for label in dict.fromkeys(text):
+            cached = self.text_embedding_cache.get(self._text_cache_key(label))
+            if cached is None:
+                missing.append(label)
+            else:
+                embeds[label] = cached
+        if len(missing) > 0:
+            text_tokens = clip.tokenize(missing).to(self.device)
+            with torch.no_grad(), autocast(self.precision, self.device):
+                missing_embeds = self.clip_model.encode_text(text_tokens).float()
+            for label, label_embeds in zip(missing, missing_embeds):
+                self.text_embedding_cache.put(self._text_cache_key(label), label_embeds)
+                embeds[label] = label_embeds
+        text_embeds = torch.stack([embeds[label] for label in text], dim=0)
         return ClipEncodeTextOutput(text_embeds=text_embeds)
 
+    @inference_only
     def encode_image(self, image: torch.Tensor) -> ClipEncodeImageOutput:
-        image_embeds = self.clip_model.encode_image(image)
-        return ClipEncodeImageOutput(image_embeds=image_embeds)
+        if self.image_encoder_compiled is not None:
+            try:
+                return ClipEncodeImageOutput(image_embeds=self.image_encoder_compiled(image))
+            except Exception as e:
+                # e.g. inductor failing on a new batch size; stay eager from here on
+                warnings.warn(f"Compiled image encoder failed, running it eagerly: {e!r}")
+                self.image_encoder_compiled = None
+                self.compile_mode = "none"
+        with autocast(self.precision, self.device):
+            image_embeds = self.clip_model.encode_image(image)
+        return ClipEncodeImageOutput(image_embeds=image_embeds.float())
 
-    def extract_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float=1.0):
+    def extract_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float = 1.0, image_indices: Optional[torch.Tensor] = None):
         if len(rois) == 0:
-            return torch.empty(
+            roi_images = torch.empty(
                 (0, image.shape[1], self.image_size[0], self.image_size[1]),
                 dtype=image.dtype,
                 device=image.device
             )
+            return roi_images, rois
 
         if pad_square:
             # pad square
@@ -108,21 +230,45 @@ class ClipPredictor(torch.nn.Module):
             # compute mask
             pad_x = (s - w) / (2 * s)
             pad_y = (s - h) / (2 * s)
-            mask_x = (self.mesh_grid[1][None, ...] > pad_x[..., None, None]) & (self.mesh_grid[1][None, ...] < (1. - pad_x[..., None, None]))
-            mask_y = (self.mesh_grid[0][None, ...] > pad_y[..., None, None]) & (self.mesh_grid[0][None, ...] < (1. - pad_y[..., None, None]))
-            mask = (mask_x & mask_y)
+            mask_x = (self.grid_x[None, :] > pad_x[:, None]) & (self.grid_x[None, :] < (1. - pad_x[:, None]))
+            mask_y = (self.grid_y[None, :] > pad_y[:, None]) & (self.grid_y[None, :] < (1. - pad_y[:, None]))
 
-        roi_images = roi_align(image, [rois], output_size=self.get_image_size())
+        if image_indices is None:
+            roi_images = roi_align(image, [rois], output_size=self.get_image_size())
+        else:
+            # rois of several images in the batch, the index of each roi goes in column 0
+            roi_images = roi_align(
+                image,
+                torch.cat([image_indices[:, None].to(rois.dtype), rois], dim=-1),
+                output_size=self.get_image_size()
+            )
 
         if pad_square:
-            roi_images = roi_images * mask[:, None, :, :]
+            roi_images.mul_(mask_y[:, None, :, None]).mul_(mask_x[:, None, None, :])
 
         return roi_images, rois
 
-    def encode_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float = 1.0):
-        roi_images, rois = self.extract_rois(image, rois, pad_square, padding_scale)
-        return self.encode_image(roi_images)
+    @inference_only
+    def encode_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float = 1.0, image_indices: Optional[torch.Tensor] = None):
+        if self.max_rois_per_batch is None or len(rois) <= self.max_rois_per_batch:
+            roi_images, rois = self.extract_rois(image, rois, pad_square, padding_scale, image_indices)
+            return self.encode_image(roi_images)
+
+        # crop and encode in micro batches, so only max_rois_per_batch crops exist at a time
+        image_embeds = []
+        for start_index in range(0, len(rois), self.max_rois_per_batch):
+            end_index = start_index + self.max_rois_per_batch
+            roi_images, _ = self.extract_rois(
+                image,
+                rois[start_index:end_index],
+                pad_square,
+                padding_scale,
+                image_indices[start_index:end_index] if image_indices is not None else None
+            )
+            image_embeds.append(self.encode_image(roi_images).image_embeds)
+        return ClipEncodeImageOutput(image_embeds=torch.cat(image_embeds, dim=0))
 
+    @inference_only
     def decode(self, 
             image_output: ClipEncodeImageOutput, 
             text_output: ClipEncodeTextOutput
@@ -143,6 +289,7 @@ class ClipPredictor(torch.nn.Module):
             scores=prob_max.values
         )
 
+    @inference_only
     def predict(self, 
             image: PIL.Image, 
             text: List[str], 
@@ -156,7 +303,7 @@ class ClipPredictor(torch.nn.Module):
         if text_encodings is None:
             text_encodings = self.encode_text(text)
 
-        rois = torch.tensor([[0, 0, image.height, image.width]], dtype=image_tensor.dtype, device=image_tensor.device)
+        rois = torch.tensor([[0, 0, image.width, image.height]], dtype=image_tensor.dtype, device=image_tensor.device)
 
         image_encodings = self.encode_rois(image_tensor, rois, pad_square=pad_square)
 
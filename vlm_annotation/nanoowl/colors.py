@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+
+__all__ = [
+    "get_colors"
+]
+
+
+# segment data of matplotlib's "pink" colormap (matplotlib/_cm.py), so the
+# default palette does not need matplotlib
+_PINK_X = (
+    0.0, 0.015873, 0.031746, 0.047619, 0.063492, 0.079365, 0.095238, 0.111111,
+    0.126984, 0.142857, 0.15873, 0.174603, 0.190476, 0.206349, 0.222222,
+    0.238095, 0.253968, 0.269841, 0.285714, 0.301587, 0.31746, 0.333333,
+    0.349206, 0.365079, 0.380952, 0.396825, 0.412698, 0.428571, 0.444444,
+    0.460317, 0.47619, 0.492063, 0.507937, 0.52381, 0.539683, 0.555556,
+    0.571429, 0.587302, 0.603175, 0.619048, 0.634921, 0.650794, 0.666667,
+    0.68254, 0.698413, 0.714286, 0.730159, 0.746032, 0.761905, 0.777778,
+    0.793651, 0.809524, 0.825397, 0.84127, 0.857143, 0.873016, 0.888889,
+    0.904762, 0.920635, 0.936508, 0.952381, 0.968254, 0.984127, 1.0,
+)
+_PINK_RED = (
+    0.1178, 0.195857, 0.250661, 0.295468, 0.334324, 0.369112, 0.400892,
+    0.430331, 0.457882, 0.483867, 0.508525, 0.532042, 0.554563, 0.576204,
+    0.597061, 0.617213, 0.636729, 0.655663, 0.674066, 0.69198, 0.709441,
+    0.726483, 0.743134, 0.759421, 0.766356, 0.773229, 0.780042, 0.786796,
+    0.793492, 0.800132, 0.806718, 0.81325, 0.81973, 0.82616, 0.832539, 0.83887,
+    0.845154, 0.851392, 0.857584, 0.863731, 0.869835, 0.875897, 0.881917,
+    0.887896, 0.893835, 0.899735, 0.905597, 0.911421, 0.917208, 0.922958,
+    0.928673, 0.934353, 0.939999, 0.945611, 0.95119, 0.956736, 0.96225,
+    0.967733, 0.973185, 0.978607, 0.983999, 0.989361, 0.994695, 1.0,
+)
+_PINK_GREEN = (
+    0.0, 0.102869, 0.145479, 0.178174, 0.205738, 0.230022, 0.251976, 0.272166,
+    0.290957, 0.308607, 0.3253, 0.341178, 0.356348, 0.370899, 0.3849, 0.39841,
+    0.411476, 0.424139, 0.436436, 0.448395, 0.460044, 0.471405, 0.482498,
+    0.493342, 0.517549, 0.540674, 0.562849, 0.584183, 0.604765, 0.624669,
+    0.643958, 0.662687, 0.6809, 0.698638, 0.715937, 0.732828, 0.749338,
+    0.765493, 0.781313, 0.796819, 0.812029, 0.82696, 0.841625, 0.85604,
+    0.870216, 0.884164, 0.897896, 0.911421, 0.917208, 0.922958, 0.928673,
+    0.934353, 0.939999, 0.945611, 0.95119, 0.956736, 0.96225, 0.967733,
+    0.973185, 0.978607, 0.983999, 0.989361, 0.994695, 1.0,
+)
+_PINK_BLUE = (
+    0.0, 0.102869, 0.145479, 0.178174, 0.205738, 0.230022, 0.251976, 0.272166,
+    0.290957, 0.308607, 0.3253, 0.341178, 0.356348, 0.370899, 0.3849, 0.39841,
+    0.411476, 0.424139, 0.436436, 0.448395, 0.460044, 0.471405, 0.482498,
+    0.493342, 0.503953, 0.514344, 0.524531, 0.534522, 0.544331, 0.553966,
+    0.563436, 0.57275, 0.581914, 0.590937, 0.599824, 0.608581, 0.617213,
+    0.625727, 0.634126, 0.642416, 0.6506, 0.658682, 0.666667, 0.674556,
+    0.682355, 0.690066, 0.697691, 0.705234, 0.727166, 0.748455, 0.769156,
+    0.789314, 0.808969, 0.828159, 0.846913, 0.865261, 0.883229, 0.900837,
+    0.918109, 0.935061, 0.951711, 0.968075, 0.984167, 1.0,
+)
+
+_SEGMENT_DATA = {
+    "pink": (_PINK_X, (_PINK_RED, _PINK_GREEN, _PINK_BLUE))
+}
+
+
+def _lookup_table(count: int, x: Tuple[float, ...], y: Tuple[float, ...]) -> np.ndarray:
+    # same sampling as matplotlib.colors._create_lookup_table (gamma = 1)
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if count == 1:
+        return y[-1:]
+    x = x * (count - 1)
+    xind = (count - 1) * np.linspace(0, 1, count)
+    ind = np.searchsorted(x, xind)[1:-1]
+    distance = (xind[1:-1] - x[ind - 1]) / (x[ind] - x[ind - 1])
+    lut = np.concatenate([
+        [y[0]],
+        distance * (y[ind] - y[ind - 1]) + y[ind - 1],
+        [y[-1]]
+    ])
+    return np.clip(lut, 0.0, 1.0)
+
+
+def _matplotlib_colors(count: int, name: str) -> np.ndarray:
+    import matplotlib
+    cmap = matplotlib.colormaps[name].resampled(count)
+    return np.array([cmap(i) for i in range(count)])
+
+
+@lru_cache(maxsize=64)
+def get_colors(count: int, name: str = "pink") -> Tuple[Tuple[int, int, int, int], ...]:
+    """``count`` RGBA colors (0-255) evenly sampled from the colormap ``name``.
+
+    The result is cached per count. Colormaps other than "pink" are read from
+    matplotlib, which is only imported then.
+    """
+    if name in _SEGMENT_DATA:
+        x, channels = _SEGMENT_DATA[name]
+        rgba = np.stack([_lookup_table(count, x, y) for y in channels] + [np.ones(count)], axis=-1)
+    else:
+        rgba = _matplotlib_colors(count, name)
+    return tuple(tuple(int(255 * value) for value in color) for color in rgba.tolist())
@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compiled image encoders for serving without the eager per-op dispatch.
+
+``compile_mode`` of the predictors selects how their image encoder module
+(vision tower plus heads) is run:
+
+* ``"none"``: eager, as before.
+* ``"inductor"``: ``torch.compile`` with the inductor backend. Other batch
+  sizes than the warm-up one are compiled on first use.
+* ``"torchscript"``: traced and frozen TorchScript. The weights are folded
+  into the frozen module, which holds its own copy of them.
+
+Compilation and warm-up happen once, at construction. If either fails the
+predictor warns and stays eager.
+"""
+
+import warnings
+from typing import Optional, Sequence
+
+import torch
+
+
+__all__ = [
+    "COMPILE_MODES",
+    "compile_module"
+]
+
+
+COMPILE_MODES = ("none", "inductor", "torchscript")
+
+
+def compile_module(module: torch.nn.Module, compile_mode: str, example_inputs: Sequence[torch.Tensor]) -> Optional[torch.nn.Module]:
+    """``module`` compiled with ``compile_mode`` and warmed up on ``example_inputs``.
+
+    Returns None for "none", or with a warning if compilation or warm-up
+    fails, in which case the caller keeps running ``module`` eagerly.
+    """
+    if compile_mode not in COMPILE_MODES:
+        raise ValueError(f"Unknown compile mode '{compile_mode}', expected one of {COMPILE_MODES}.")
+    if compile_mode == "none":
+        return None
+
+    module = module.eval()
+    try:
+        if compile_mode == "inductor":
+            compiled = torch.compile(module, backend="inductor")
+        else:
+            with torch.no_grad():
+                compiled = torch.jit.freeze(torch.jit.trace(module, tuple(example_inputs), check_trace=False))
+        with torch.inference_mode():
+            # twice: torchscript optimizes the graph on its first runs, inductor compiles on the first
+            for _ in range(2):
+                compiled(*example_inputs)
+    except Exception as e:
+        warnings.warn(f"compile_mode '{compile_mode}' failed, running the image encoder eagerly: {e!r}")
+        return None
+    return compiled
@@ -14,10 +14,12 @@
 # limitations under the License.
 
 
+import cv2
+import threading
 import torch
 import PIL.Image
 import numpy as np
-from typing import Tuple
+from typing import List, Tuple, Union
 
 
 __all__ = [
@@ -56,20 +58,122 @@ class ImagePreprocessor(torch.nn.Module):
             "std",
             torch.tensor(std)[None, :, None, None]
         )
+        # (image - mean) / std folded into image * scale + bias
+        self.register_buffer(
+            "scale",
+            1. / self.std,
+            persistent=False
+        )
+        self.register_buffer(
+            "bias",
+            -self.mean / self.std,
+            persistent=False
+        )
+        # (thread id, shape) -> uint8 buffer, so threads never share a frame
+        self._host_buffers = {}
 
     def forward(self, image: torch.Tensor, inplace: bool = False):
 
         if inplace:
-            image = image.sub_(self.mean).div_(self.std)
+            image = image.mul_(self.scale).add_(self.bias)
         else:
-            image = (image - self.mean) / self.std
+            image = torch.addcmul(self.bias, image, self.scale)
 
         return image
     
     @torch.no_grad()
-    def preprocess_pil_image(self, image: PIL.Image.Image):
+    def preprocess_image(self, image: Union[PIL.Image.Image, np.ndarray], bgr: bool = False):
         image = torch.from_numpy(np.asarray(image))
         image = image.permute(2, 0, 1)[None, ...]
         image = image.to(self.mean.device)
         image = image.type(self.mean.dtype)
-        return self.forward(image, inplace=True)
\ No newline at end of file
+        if bgr:
+            image = image.flip(1)
+        return self.forward(image, inplace=True)
+
+    def preprocess_pil_image(self, image: PIL.Image.Image):
+        return self.preprocess_image(image)
+
+    @torch.no_grad()
+    def preprocess_images(self, images: List[Union[PIL.Image.Image, np.ndarray]], bgr: bool = False):
+        """Preprocess several images into one ``[B, 3, H, W]`` tensor.
+
+        Images smaller than the largest one are padded at the bottom and
+        right with 0, which is what ``roi_align`` samples outside of an
+        image. Rois reaching the bottom or right edge of a padded image then
+        differ from ``preprocess_image`` only in the edge samples; images of
+        equal size are stacked as is.
+        """
+        tensors = [self.preprocess_image(image, bgr=bgr) for image in images]
+        height = max(t.shape[-2] for t in tensors)
+        width = max(t.shape[-1] for t in tensors)
+        if all(t.shape[-2:] == (height, width) for t in tensors):
+            return torch.cat(tensors, dim=0)
+        output = torch.zeros((len(tensors), 3, height, width), dtype=self.mean.dtype, device=self.mean.device)
+        for i, t in enumerate(tensors):
+            output[i, :, :t.shape[-2], :t.shape[-1]] = t[0]
+        return output
+
+    def _get_host_buffer(self, shape: Tuple[int, int, int]) -> torch.Tensor:
+        key = (threading.get_ident(), shape)
+        buffer = self._host_buffers.get(key)
+        if buffer is None:
+            buffer = torch.empty(
+                shape,
+                dtype=torch.uint8,
+                pin_memory=self.mean.device.type == "cuda"
+            )
+            self._host_buffers[key] = buffer
+        return buffer
+
+    @torch.no_grad()
+    def preprocess_resized(self,
+            image: Union[PIL.Image.Image, np.ndarray],
+            size: int,
+            pad_square: bool = True,
+            bgr: bool = False
+        ):
+        """Resize the uint8 image to ``size`` x ``size`` first, then normalize.
+
+        Approximates ``preprocess_image`` followed by ``extract_rois`` of the
+        full-image roi, but only the resized frame is transferred and
+        converted to float. With ``pad_square`` the image is letterboxed and
+        the padding is 0 after normalization, as with the masked roi.
+
+        PIL images in other modes are converted to RGB, arrays must be
+        ``H x W x 3`` uint8. Safe to call from several threads, each has its
+        own host buffers.
+        """
+        if isinstance(image, PIL.Image.Image) and image.mode != "RGB":
+            image = image.convert("RGB")
+        array = np.asarray(image)
+        if array.ndim != 3 or array.shape[2] != 3 or array.dtype != np.uint8:
+            raise ValueError(f"Expected an H x W x 3 uint8 image, got shape {array.shape} and dtype {array.dtype}.")
+        h, w = array.shape[:2]
+
+        if pad_square:
+            ratio = size / max(w, h)
+            resized_w, resized_h = max(1, round(w * ratio)), max(1, round(h * ratio))
+        else:
+            resized_w, resized_h = size, size
+
+        # cv2 writes straight into the (pinned) host buffer
+        buffer = self._get_host_buffer((resized_h, resized_w, 3))
+        interpolation = cv2.INTER_AREA if (resized_w < w and resized_h < h) else cv2.INTER_LINEAR
+        resized_array = cv2.resize(array, (resized_w, resized_h), dst=buffer.numpy(), interpolation=interpolation)
+        if resized_array.ctypes.data != buffer.data_ptr():
+            # cv2 allocated its own output instead, never encode the stale buffer
+            buffer.numpy()[...] = resized_array
+
+        resized = buffer.to(self.mean.device).permute(2, 0, 1)[None, ...]
+        if bgr:
+            resized = resized.flip(1)
+
+        output = torch.zeros((1, 3, size, size), dtype=self.mean.dtype, device=self.mean.device)
+        x0 = (size - resized_w) // 2
+        y0 = (size - resized_h) // 2
+        view = output[:, :, y0:y0 + resized_h, x0:x0 + resized_w]
+        view.copy_(resized)
+        self.forward(view, inplace=True)
+
+        return output
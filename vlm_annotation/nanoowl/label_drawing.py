@@ -0,0 +1,271 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import PIL.Image
+import cv2
+import numpy as np
+from functools import lru_cache
+from typing import List, Sequence
+
+
+__all__ = [
+    "draw_rotated_label",
+    "draw_axes",
+    "draw_boxes"
+]
+
+
+@lru_cache(maxsize=256)
+def _get_label_sprite(text, font, font_scale, thickness, color, angle, channels):
+    """Rotated text on a black square, centered on the rotation center.
+
+    The square has side 2 * r + 1 and contains the text at any angle.
+    """
+    sprite = _render_label_sprite(text, font, font_scale, thickness, color, angle, channels)
+    sprite.flags.writeable = False
+    return sprite
+
+
+def _render_label_sprite(text, font, font_scale, thickness, color, angle, channels, clip=None):
+    (text_w, text_h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+    # anti-aliased strokes reach a little past the text size
+    margin = thickness + 4
+    half_w = max(text_w // 2, text_w - text_w // 2) + margin
+    half_h = max(text_h - text_h // 2, text_h // 2 + baseline) + margin
+    r = int(np.ceil(np.hypot(half_w, half_h))) + 1
+
+    sprite = np.zeros((2 * r + 1, 2 * r + 1, channels), dtype=np.uint8)
+    cv2.putText(sprite, text, (r - text_w // 2, r + text_h // 2), font, font_scale, color, thickness, cv2.LINE_AA)
+
+    if clip is not None:
+        # (x0, y0, x1, y1) of the image in sprite coordinates, text outside of
+        # the frame is cut before rotating, as on a full-frame overlay
+        x0, y0, x1, y1 = clip
+        sprite[:max(y0, 0)] = 0
+        sprite[max(y1, 0):] = 0
+        sprite[:, :max(x0, 0)] = 0
+        sprite[:, max(x1, 0):] = 0
+
+    if angle % 360 != 0:
+        M = cv2.getRotationMatrix2D((r, r), angle, 1)
+        sprite = cv2.warpAffine(sprite, M, (2 * r + 1, 2 * r + 1),
+                                flags=cv2.INTER_LINEAR,
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+    return sprite
+
+
+def draw_rotated_label(image, text, textOrg, angle, font=cv2.FONT_HERSHEY_SIMPLEX,
+                       font_scale=1, thickness=2, color=(0, 0, 255), inplace=False):
+    """Draws ``text`` centered at ``textOrg``, rotated by ``angle`` degrees about it.
+
+    Only a sprite around the text is rotated and added (saturating, as
+    ``cv2.add``) into the image. Sprites are cached per text, font, scale,
+    thickness, color and angle.
+    """
+    if not inplace:
+        image = image.copy()
+    img_h, img_w = image.shape[:2]
+    channels = image.shape[2] if image.ndim == 3 else 1
+    cx, cy = int(textOrg[0]), int(textOrg[1])
+    key = (text, font, font_scale, thickness, tuple(color), angle, channels)
+
+    sprite = _get_label_sprite(*key)
+    r = sprite.shape[0] // 2
+
+    if not (cx - r >= 0 and cy - r >= 0 and cx + r < img_w and cy + r < img_h):
+        # near the border, the part of the text outside the frame is clipped first
+        sprite = _render_label_sprite(*key, clip=(r - cx, r - cy, r - cx + img_w, r - cy + img_h))
+
+    # sprite and image overlap
+    x0, y0 = max(cx - r, 0), max(cy - r, 0)
+    x1, y1 = min(cx + r + 1, img_w), min(cy + r + 1, img_h)
+    if x0 >= x1 or y0 >= y1:
+        return image
+
+    roi = image[y0:y1, x0:x1]
+    sprite = sprite[y0 - (cy - r):y1 - (cy - r), x0 - (cx - r):x1 - (cx - r)]
+    if image.ndim == 2:
+        sprite = sprite[..., 0]
+    cv2.add(roi, sprite, dst=roi)
+    return image
+
+def draw_axes(image, axis_length=100, color=(0, 255, 0), thickness=2):
+    """
+    Draws x and y axes in the bottom-right corner of the image.
+    x-axis extends to the left, y-axis extends upward.
+    
+    Args:
+        image (np.ndarray): The image (BGR) on which to draw.
+        axis_length (int): Length of each axis in pixels.
+        color (tuple): Color for the axes (B, G, R).
+        thickness (int): Line thickness.
+        
+    Returns:
+        The image with axes drawn.
+    """
+    h, w = image.shape[:2]
+    
+    # Pick a small margin so the axes don't touch the very edge
+    margin = 20
+    origin = (w - margin, h - margin)
+    
+    # Draw the x-axis (from origin going left)
+    cv2.line(
+        image,
+        origin,
+        (origin[0] - axis_length, origin[1]),
+        color,
+        thickness
+    )
+
+    textOrg_y = (origin[0]- axis_length - 15, origin[1] + 5)
+    
+    # Rotate by -90 or 90 depending on how you want it oriented
+    image = draw_rotated_label(
+        image=image,
+        text="y",
+        textOrg=textOrg_y,
+        angle=180,  # adjust sign as needed
+        font=cv2.FONT_HERSHEY_SIMPLEX,
+        font_scale=0.7,
+        thickness=2,
+        color=color,
+        inplace=True
+    )
+
+    # For "x" label, place it near the left end of the x-axis
+    textOrg_x = (origin[0] - 10, origin[1] - axis_length )
+    image = draw_rotated_label(
+        image=image,
+        text="x",
+        textOrg=textOrg_x,
+        angle=180,  # or any angle you like, e.g., 180 for upside down
+        font=cv2.FONT_HERSHEY_SIMPLEX,
+        font_scale=0.7,
+        thickness=2,
+        color=color,
+        inplace=True
+    )
+    
+
+
+    # Draw the y-axis (from origin going up)
+    cv2.line(
+        image,
+        origin,
+        (origin[0], origin[1] - axis_length),
+        color,
+        thickness
+    )
+    
+    # # Label the axes:
+    # #   "x" near the left end of x-axis,
+    # #   "y" near the top end of y-axis.
+    # cv2.putText(
+    #     image,
+    #     "y",
+    #     (origin[0] - axis_length - 15, origin[1] + 5),
+    #     cv2.FONT_HERSHEY_SIMPLEX,
+    #     0.7,
+    #     color,
+    #     2,
+    #     cv2.LINE_AA
+    # )
+    # cv2.putText(
+    #     image,
+    #     "x",
+    #     (origin[0] - 15, origin[1] - axis_length - 10),
+    #     cv2.FONT_HERSHEY_SIMPLEX,
+    #     0.7,
+    #     color,
+    #     2,
+    #     cv2.LINE_AA
+    # )
+    
+    return image
+
+
+def draw_boxes(image, boxes: Sequence[Sequence[float]], texts: List[str], draw_text=True):
+    """Draws ``boxes`` (x0, y0, x1, y1 in pixels), each labeled with its entry of ``texts``.
+
+    Needs neither torch nor the predictors, see :func:`nanoowl.owl_drawing.draw_owl_output`
+    for drawing a decode output.
+    """
+    is_pil = not isinstance(image, np.ndarray)
+    
+    if is_pil:
+        image = np.ascontiguousarray(image).copy() 
+
+    # Get image dimensions
+    img_h, img_w = image.shape[:2]
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 1.0
+
+    for box, label_text in zip(boxes, texts):
+        box = [int(x) for x in box]
+        pt0 = (box[0], box[1])  # top-left
+        pt1 = (box[2], box[3])  # bottom-right
+
+        # ---------------------------------------------------------
+        # 1) Check if bounding box is nearly as big as the entire frame
+        # ---------------------------------------------------------
+        bbox_width = pt1[0] - pt0[0]
+        bbox_height = pt1[1] - pt0[1]
+
+        # For example, skip if w/h are >80% of image w/h:
+        if (bbox_width >= 0.8 * img_w) and (bbox_height >= 0.8 * img_h):
+            # Skip this detection entirely
+            continue
+
+        # If you want to check by area instead, you could do:
+        #   bbox_area = bbox_width * bbox_height
+        #   img_area = img_w * img_h
+        #   if bbox_area >= 0.8 * img_area:
+        #       continue
+
+        # If not skipped, draw the detection
+        cv2.rectangle(
+            image,
+            pt0,
+            pt1,
+            (255, 255, 255),
+            4
+        )
+
+        if draw_text:
+            offset_y = 10
+            offset_x = 140
+
+            text_origin = (box[0] + offset_x, box[1] + offset_y)
+
+            # Draw the label text
+            image = draw_rotated_label(
+            image=image,
+            text=label_text,
+            textOrg=text_origin,
+            angle=0,
+            font=font,
+            font_scale=font_scale,
+            thickness=2,  # Adjust font size if needed
+            color=(255, 255, 255),  # White color (B, G, R)
+            inplace=True
+    )
+    image = draw_axes(image, axis_length=100)
+    if is_pil:
+        image = PIL.Image.fromarray(image)
+
+    return image
@@ -0,0 +1,252 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fast model loading: a local safetensors weight cache and a per-process registry.
+
+The first load of a model writes its weights to ``<cache_dir>/<model>/model.safetensors``.
+Later loads build the module on the meta device and point its parameters
+straight into a copy-on-write mmap of that file, so nothing is initialized,
+copied or deserialized, and concurrent worker processes share the pages
+through the page cache. Models on the same device are also shared between
+predictors of one process through ``get_shared_model``.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import warnings
+from itertools import chain
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import torch
+
+
+__all__ = [
+    "default_model_cache_dir",
+    "save_module_safetensors",
+    "load_module_safetensors",
+    "load_safetensors_mmap",
+    "load_owl_model",
+    "load_owl_processor",
+    "load_clip_model",
+    "get_shared_model",
+    "clear_shared_models"
+]
+
+
+_SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def default_model_cache_dir() -> str:
+    return os.environ.get("NANOOWL_MODEL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "nanoowl"))
+
+
+def _cache_path(cache_dir: str, kind: str, model_name: str) -> Path:
+    # hub names stay readable, local paths get a hash so two checkpoints named alike do not collide
+    digest = hashlib.sha1(model_name.encode()).hexdigest()[:10]
+    slug = model_name.strip("/").replace("/", "--")[-64:]
+    return Path(cache_dir) / kind / f"{slug}-{digest}"
+
+
+def _module_tensors(module: torch.nn.Module) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """All parameters and buffers (persistent or not), and aliases of shared ones."""
+    tensors, aliases, names = {}, {}, {}
+    named = chain(module.named_parameters(remove_duplicate=False), module.named_buffers(remove_duplicate=False))
+    for name, tensor in named:
+        key = (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape), tuple(tensor.stride()))
+        if tensor.numel() > 0 and key in names:
+            aliases[name] = names[key]
+            continue
+        names[key] = name
+        tensors[name] = tensor.detach().contiguous()
+    return tensors, aliases
+
+
+def save_module_safetensors(module: torch.nn.Module, path: str):
+    """Write every tensor of ``module`` to ``path``, atomically."""
+    from safetensors.torch import save_file
+
+    tensors, aliases = _module_tensors(module)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        save_file({k: v.cpu() for k, v in tensors.items()}, tmp_path, metadata={"aliases": json.dumps(aliases)})
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_safetensors_mmap(path: str) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """Tensors of a safetensors file as views of a copy-on-write mmap, and its metadata."""
+    with open(path, "rb") as f:
+        header_size, = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    metadata = header.pop("__metadata__", None) or {}
+    if len(header) == 0:
+        return {}, metadata
+
+    # mode "c": pages are read from the shared page cache, writes stay private
+    buffer = torch.from_numpy(np.memmap(path, dtype=np.uint8, mode="c"))
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        start, end = info["data_offsets"]
+        tensors[name] = buffer[data_start + start:data_start + end] \
+            .view(_SAFETENSORS_DTYPES[info["dtype"]]) \
+            .reshape(info["shape"])
+    return tensors, metadata
+
+
+def _set_tensor(module: torch.nn.Module, name: str, tensor: torch.Tensor):
+    prefix, _, leaf = name.rpartition(".")
+    parent = module.get_submodule(prefix)
+    if leaf in parent._parameters:
+        parent._parameters[leaf] = tensor if isinstance(tensor, torch.nn.Parameter) else torch.nn.Parameter(tensor, requires_grad=False)
+    else:
+        parent._buffers[leaf] = tensor
+
+
+def load_module_safetensors(module: torch.nn.Module, path: str) -> torch.nn.Module:
+    """Point the tensors of ``module`` (usually built on the meta device) at the mmap of ``path``."""
+    tensors, metadata = load_safetensors_mmap(path)
+    for name, tensor in tensors.items():
+        _set_tensor(module, name, tensor)
+    for alias, name in json.loads(metadata.get("aliases", "{}")).items():
+        prefix, _, leaf = name.rpartition(".")
+        parent = module.get_submodule(prefix)
+        _set_tensor(module, alias, parent._parameters.get(leaf, parent._buffers.get(leaf)))
+
+    missing = [n for n, t in chain(module.named_parameters(), module.named_buffers()) if t.is_meta]
+    if missing:
+        raise RuntimeError(f"{path} does not match the model, missing tensors: {missing[:5]}.")
+    return module
+
+
+def load_owl_model(model_name: str, device: str = "cpu", cache_dir: Optional[str] = None):
+    """OwlViTForObjectDetection in eval mode, through the weight cache if ``cache_dir`` is set."""
+    from transformers.models.owlvit.configuration_owlvit import OwlViTConfig
+    from transformers.models.owlvit.modeling_owlvit import OwlViTForObjectDetection
+
+    if cache_dir is None:
+        return OwlViTForObjectDetection.from_pretrained(model_name).eval().to(device)
+
+    path = _cache_path(cache_dir, "owlvit", model_name)
+    weights = path / "model.safetensors"
+    if not weights.exists():
+        model = OwlViTForObjectDetection.from_pretrained(model_name).eval()
+        model.config.save_pretrained(path)
+        save_module_safetensors(model, weights)  # written last, marks the entry complete
+        return model.to(device)
+
+    with torch.device("meta"):
+        model = OwlViTForObjectDetection(OwlViTConfig.from_pretrained(path))
+    return load_module_safetensors(model, weights).eval().to(device)
+
+
+def load_owl_processor(model_name: str, cache_dir: Optional[str] = None):
+    from transformers.models.owlvit.processing_owlvit import OwlViTProcessor
+
+    if cache_dir is None:
+        return OwlViTProcessor.from_pretrained(model_name)
+
+    path = _cache_path(cache_dir, "owlvit", model_name) / "processor"
+    if path.exists():
+        return OwlViTProcessor.from_pretrained(path)
+    processor = OwlViTProcessor.from_pretrained(model_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=path.parent)
+    processor.save_pretrained(tmp_path)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)  # another process was first
+    return processor
+
+
+def load_clip_model(model_name: str, device: str = "cpu", cache_dir: Optional[str] = None):
+    """CLIP model as returned by ``clip.load(model_name, device)``, through the weight cache if ``cache_dir`` is set.
+
+    The cached weights are the fp32 ones; on gpus they are converted to fp16
+    after loading, as ``clip.load`` does.
+    """
+    import clip
+
+    if cache_dir is None:
+        return clip.load(model_name, device)[0]
+
+    path = _cache_path(cache_dir, "clip", model_name)
+    weights = path / "model.safetensors"
+    if not weights.exists():
+        model = clip.load(model_name, "cpu")[0].float()
+        save_module_safetensors(model, weights)
+    else:
+        tensors, _ = load_safetensors_mmap(weights)
+        with torch.device("meta"), warnings.catch_warnings():
+            # build_model copies the weights into the meta tensors, a no-op
+            warnings.simplefilter("ignore", UserWarning)
+            model = clip.model.build_model(dict(tensors))
+        load_module_safetensors(model, weights)
+        # plain attribute, not a buffer, so it was created on the meta device
+        attn_mask = model.build_attention_mask()
+        for block in model.transformer.resblocks:
+            block.attn_mask = attn_mask
+        model = model.float().eval()
+
+    model = model.to(device)
+    if str(device) != "cpu":
+        clip.model.convert_weights(model)
+    return model
+
+
+_SHARED_MODELS: Dict[Hashable, object] = {}
+_SHARED_MODELS_LOCK = threading.Lock()
+
+
+def get_shared_model(key: Hashable, load: Callable[[], object]):
+    """The object registered under ``key``, loaded with ``load()`` on first use.
+
+    Predictors use it for their models and processors, so building several
+    predictors (e.g. the defaults of TreePredictor) loads each model once.
+    The shared models must not be modified in place.
+    """
+    with _SHARED_MODELS_LOCK:
+        if key not in _SHARED_MODELS:
+            _SHARED_MODELS[key] = load()
+        return _SHARED_MODELS[key]
+
+
+def clear_shared_models():
+    with _SHARED_MODELS_LOCK:
+        _SHARED_MODELS.clear()
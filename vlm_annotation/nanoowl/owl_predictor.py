@@ -20,19 +20,27 @@ import PIL.Image
 import subprocess
 import tempfile
 import os
+import hashlib
+import warnings
+from collections import OrderedDict
 import torchvision.ops as ops 
 from torchvision.ops import roi_align
+from transformers.models.owlvit.configuration_owlvit import OwlViTConfig
 from transformers.models.owlvit.modeling_owlvit import OwlViTForObjectDetection
-from transformers.models.owlvit.processing_owlvit import OwlViTProcessor
 from dataclasses import dataclass
 from typing import List, Optional, Union, Tuple
+from .compilation import COMPILE_MODES, compile_module
 from .image_preprocessor import ImagePreprocessor
+from .model_cache import get_shared_model, load_owl_model, load_owl_processor
+from .precision import PRECISIONS, autocast, inference_only
+from .sync_timer import Profiler, profiled
 
 __all__ = [
     "OwlPredictor",
     "OwlEncodeTextOutput",
     "OwlEncodeImageOutput",
-    "OwlDecodeOutput"
+    "OwlDecodeOutput",
+    "OwlImageEncodingCache"
 ]
 
 
@@ -58,7 +66,10 @@ def _owl_get_image_size(hf_name: str):
         "google/owlvit-large-patch14": 840,
     }
 
-    return image_sizes[hf_name]
+    if hf_name in image_sizes:
+        return image_sizes[hf_name]
+    # local checkpoints
+    return OwlViTConfig.from_pretrained(hf_name).vision_config.image_size
 
 
 def _owl_get_patch_size(hf_name: str):
@@ -69,7 +80,9 @@ def _owl_get_patch_size(hf_name: str):
         "google/owlvit-large-patch14": 14,
     }
 
-    return patch_sizes[hf_name]
+    if hf_name in patch_sizes:
+        return patch_sizes[hf_name]
+    return OwlViTConfig.from_pretrained(hf_name).vision_config.patch_size
 
 
 # This function is modified from https://github.com/huggingface/transformers/blob/e8fdd7875def7be59e2c9b823705fbf003163ea0/src/transformers/models/owlvit/modeling_owlvit.py#L1333
@@ -114,6 +127,80 @@ def _owl_box_roi_to_box_global(boxes, rois):
     return (boxes * wh) + x0y0
 
 
+def _owl_get_image_width_height(image: Union[PIL.Image.Image, np.ndarray]) -> Tuple[int, int]:
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.width, image.height
+
+
+def _owl_quantize_dynamic(model: OwlViTForObjectDetection) -> OwlViTForObjectDetection:
+    # Every Linear of the vision and text towers, the projections and the
+    # box / class heads; activations are quantized on the fly per batch.
+    return torch.ao.quantization.quantize_dynamic(
+        model,
+        {torch.nn.Linear},
+        dtype=torch.qint8
+    )
+
+
+def _owl_image_content_hash(image: PIL.Image.Image) -> str:
+    array = np.ascontiguousarray(np.asarray(image))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str((array.shape, array.dtype.str)).encode())
+    digest.update(array.data)
+    return digest.hexdigest()
+
+
+def _owl_box_head(model: OwlViTForObjectDetection, image_embeds: torch.Tensor, box_bias: torch.Tensor) -> torch.Tensor:
+    pred_boxes = model.box_head(image_embeds)
+    pred_boxes += box_bias
+    pred_boxes = torch.sigmoid(pred_boxes)
+    return _owl_center_to_corners_format_torch(pred_boxes)
+
+
+def _owl_encode_image(model: OwlViTForObjectDetection, image: torch.Tensor, box_bias: torch.Tensor, precision: str, with_boxes: bool):
+    """(image_embeds, image_class_embeds, logit_shift, logit_scale, pred_boxes or None), in fp32."""
+    with autocast(precision, image.device):
+        vision_outputs = model.owlvit.vision_model(image)
+        last_hidden_state = vision_outputs[0]
+        image_embeds = model.owlvit.vision_model.post_layernorm(last_hidden_state)
+        class_token_out = image_embeds[:, :1, :]
+        image_embeds = image_embeds[:, 1:, :] * class_token_out
+        image_embeds = model.layer_norm(image_embeds)  # 768 dim
+
+        # Class Head
+        image_class_embeds = model.class_head.dense0(image_embeds)
+        logit_shift = model.class_head.logit_shift(image_embeds)
+        logit_scale = model.class_head.logit_scale(image_embeds)
+        logit_scale = model.class_head.elu(logit_scale) + 1
+
+    image_embeds = image_embeds.float()
+    image_class_embeds = image_class_embeds.float()
+    logit_shift = logit_shift.float()
+    logit_scale = logit_scale.float()
+
+    # Box Head in fp32
+    pred_boxes = _owl_box_head(model, image_embeds, box_bias) if with_boxes else None
+
+    return image_embeds, image_class_embeds, logit_shift, logit_scale, pred_boxes
+
+
+class _OwlImageEncoderModule(torch.nn.Module):
+    """The torch image encoder as a module of image -> tensors, for export and compilation."""
+
+    def __init__(self, model: OwlViTForObjectDetection, box_bias: torch.Tensor, precision: str = "fp32", with_boxes: bool = True):
+        super().__init__()
+        self.model = model
+        self.register_buffer("box_bias", box_bias, persistent=False)
+        self.precision = precision
+        self.with_boxes = with_boxes
+
+    def forward(self, image):
+        outputs = _owl_encode_image(self.model, image, self.box_bias, self.precision, self.with_boxes)
+        # exporters and tracing take tensors only, no None
+        return outputs if self.with_boxes else outputs[:4]
+
+
 @dataclass
 class OwlEncodeTextOutput:
     text_embeds: torch.Tensor
@@ -126,11 +213,34 @@ class OwlEncodeTextOutput:
 
 @dataclass
 class OwlEncodeImageOutput:
-    image_embeds: torch.Tensor
+    """Image encodings, as returned by OwlPredictor.encode_image / encode_rois.
+
+    Depending on ``OwlPredictor.image_encoding`` some fields are None:
+    "slim" drops ``image_embeds``, which decode does not need; "lazy_boxes"
+    leaves ``pred_boxes`` out and keeps the ``rois`` the patches were
+    encoded from, decode then runs the box head only on the patches above
+    the threshold.
+    """
+    image_embeds: Optional[torch.Tensor]
     image_class_embeds: torch.Tensor
     logit_shift: torch.Tensor
     logit_scale: torch.Tensor
-    pred_boxes: torch.Tensor
+    pred_boxes: Optional[torch.Tensor]
+    rois: Optional[torch.Tensor] = None
+
+    def to(self, device=None, dtype: Optional[torch.dtype] = None):
+        # Boxes are in global pixel coordinates, which fp16 cannot hold to
+        # sub-pixel precision on full HD frames, so they (and rois) keep their dtype.
+        def _to(tensor, dtype=None):
+            return None if tensor is None else tensor.to(device=device, dtype=dtype)
+        return OwlEncodeImageOutput(
+            image_embeds=_to(self.image_embeds, dtype),
+            image_class_embeds=_to(self.image_class_embeds, dtype),
+            logit_shift=_to(self.logit_shift, dtype),
+            logit_scale=_to(self.logit_scale, dtype),
+            pred_boxes=_to(self.pred_boxes),
+            rois=_to(self.rois)
+        )
 
 
 @dataclass
@@ -141,6 +251,52 @@ class OwlDecodeOutput:
     input_indices: torch.Tensor
 
 
+class OwlImageEncodingCache:
+    """LRU cache of image encodings, keyed by image content, roi and padding.
+
+    With ``offload=True`` entries are kept on the CPU in ``offload_dtype`` and
+    moved back to the requesting device (in float32) on lookup.
+    """
+
+    def __init__(self,
+            max_size: int = 8,
+            offload: bool = False,
+            offload_dtype: torch.dtype = torch.float16
+        ):
+        self.max_size = max_size
+        self.offload = offload
+        self.offload_dtype = offload_dtype
+        self._entries: "OrderedDict[tuple, OwlEncodeImageOutput]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, device=None) -> Optional[OwlEncodeImageOutput]:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        output = self._entries[key]
+        if self.offload:
+            output = output.to(device=device, dtype=torch.float32)
+        return output
+
+    def put(self, key, output: OwlEncodeImageOutput):
+        if self.max_size <= 0:
+            return
+        if self.offload:
+            output = output.to(device="cpu", dtype=self.offload_dtype)
+        self._entries[key] = output
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
 class OwlPredictor(torch.nn.Module):
     
     def __init__(self,
@@ -148,30 +304,123 @@ class OwlPredictor(torch.nn.Module):
             device: str = "cuda",
             image_encoder_engine: Optional[str] = None,
             image_encoder_engine_max_batch_size: int = 1,
-            image_preprocessor: Optional[ImagePreprocessor] = None
+            image_preprocessor: Optional[ImagePreprocessor] = None,
+            image_encoding_cache_size: int = 8,
+            image_encoding_cache_offload: bool = False,
+            image_encoder_backend: Optional[str] = None,
+            image_encoder_onnx: Optional[str] = None,
+            onnxruntime_intra_op_num_threads: int = 0,
+            onnxruntime_inter_op_num_threads: int = 0,
+            quantize: Optional[str] = None,
+            quantized_weights: Optional[str] = None,
+            fused_preprocess: bool = False,
+            profiler: Optional[Profiler] = None,
+            model_cache_dir: Optional[str] = None,
+            share_model: bool = True,
+            image_encoding: str = "full",
+            inference_mode: bool = True,
+            precision: str = "fp32",
+            compile_mode: str = "none"
         ):
 
         super().__init__()
 
+        if image_encoder_backend is None:
+            image_encoder_backend = "tensorrt" if image_encoder_engine is not None else "torch"
+        if image_encoder_backend not in ("torch", "tensorrt", "onnxruntime"):
+            raise ValueError(f"Unknown image encoder backend '{image_encoder_backend}'.")
+        if image_encoder_backend == "tensorrt" and image_encoder_engine is None:
+            raise ValueError("The tensorrt backend requires image_encoder_engine.")
+        if quantize not in (None, "int8_dynamic"):
+            raise ValueError(f"Unknown quantization mode '{quantize}'.")
+        if quantize is not None and device != "cpu":
+            raise ValueError("Dynamic int8 quantization is only supported on cpu.")
+        if quantized_weights is not None and quantize is None:
+            raise ValueError("quantized_weights requires quantize.")
+        if image_encoding not in ("full", "slim", "lazy_boxes"):
+            raise ValueError(f"Unknown image encoding '{image_encoding}'.")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}.")
+        if precision != "fp32" and quantize is not None:
+            raise ValueError("Reduced precision cannot be combined with quantize.")
+        if compile_mode not in COMPILE_MODES:
+            raise ValueError(f"Unknown compile mode '{compile_mode}', expected one of {COMPILE_MODES}.")
+        if compile_mode != "none" and image_encoder_backend != "torch":
+            raise ValueError("compile_mode applies to the torch image encoder backend only.")
+
         self.image_size = _owl_get_image_size(model_name)
         self.device = device
-        self.model = OwlViTForObjectDetection.from_pretrained(model_name).to(self.device).eval()
-        self.processor = OwlViTProcessor.from_pretrained(model_name)
+        self.quantize = quantize
+        if quantized_weights is not None:
+            # architecture only, the fp32 weights are replaced below
+            model = OwlViTForObjectDetection(OwlViTConfig.from_pretrained(model_name))
+        elif share_model:
+            # one model per (name, device) in the process, see nanoowl.model_cache
+            model = get_shared_model(
+                ("owlvit", model_name, str(device), model_cache_dir),
+                lambda: load_owl_model(model_name, device, model_cache_dir)
+            )
+        else:
+            model = load_owl_model(model_name, device, model_cache_dir)
+        model = model.eval()
+        if quantize == "int8_dynamic":
+            model = _owl_quantize_dynamic(model)
+            if quantized_weights is not None:
+                model.load_state_dict(torch.load(quantized_weights, map_location="cpu"))
+        self.model = model.to(self.device).eval()
+        self.processor = get_shared_model(
+            ("owlvit_processor", model_name, model_cache_dir),
+            lambda: load_owl_processor(model_name, model_cache_dir)
+        ) if share_model else load_owl_processor(model_name, model_cache_dir)
         self.patch_size = _owl_get_patch_size(model_name)
         self.num_patches_per_side = self.image_size // self.patch_size
         self.box_bias = _owl_compute_box_bias(self.num_patches_per_side).to(self.device)
         self.num_patches = (self.num_patches_per_side)**2
-        self.mesh_grid = torch.stack(
-            torch.meshgrid(
-                torch.linspace(0., 1., self.image_size),
-                torch.linspace(0., 1., self.image_size)
-            )
-        ).to(self.device).float()
+        # normalized roi coordinates of the output columns / rows, for the pad square mask
+        self.grid_x = torch.linspace(0., 1., self.image_size).to(self.device).float()
+        self.grid_y = torch.linspace(0., 1., self.image_size).to(self.device).float()
+        self.image_encoder_backend = image_encoder_backend
         self.image_encoder_engine = None
-        if image_encoder_engine is not None:
+        if image_encoder_backend == "tensorrt":
             image_encoder_engine = OwlPredictor.load_image_encoder_engine(image_encoder_engine, image_encoder_engine_max_batch_size)
         self.image_encoder_engine = image_encoder_engine
+        self.image_encoder_session = None
+        if image_encoder_backend == "onnxruntime":
+            if image_encoder_onnx is None:
+                onnx_dir = tempfile.mkdtemp()
+                image_encoder_onnx = os.path.join(onnx_dir, "image_encoder.onnx")
+                self.export_image_encoder_onnx(image_encoder_onnx)
+            self.image_encoder_session = OwlPredictor.load_image_encoder_onnxruntime(
+                image_encoder_onnx,
+                max_batch_size=image_encoder_engine_max_batch_size,
+                intra_op_num_threads=onnxruntime_intra_op_num_threads,
+                inter_op_num_threads=onnxruntime_inter_op_num_threads
+            )
         self.image_preprocessor = image_preprocessor.to(self.device).eval() if image_preprocessor else ImagePreprocessor().to(self.device).eval()
+        self.fused_preprocess = fused_preprocess
+        # which OwlEncodeImageOutput fields encode_image fills, see there
+        self.image_encoding = image_encoding
+        # see nanoowl.precision; towers run in `precision`, boxes and decode in fp32
+        self.inference_mode = inference_mode
+        self.precision = precision
+        self.image_encoding_cache = OwlImageEncodingCache(
+            max_size=image_encoding_cache_size,
+            offload=image_encoding_cache_offload
+        )
+        # disabled unless one is passed in, see nanoowl.sync_timer
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        # see nanoowl.compilation; None if eager, also after a failed compilation
+        self.image_encoder_compiled = compile_module(
+            _OwlImageEncoderModule(self.model, self.box_bias, precision, with_boxes=image_encoding != "lazy_boxes"),
+            compile_mode,
+            [torch.zeros(1, 3, self.image_size, self.image_size, device=self.device)]
+        )
+        self.compile_mode = compile_mode if self.image_encoder_compiled is not None else "none"
+
+    def save_quantized_weights(self, path: str):
+        if self.quantize is None:
+            raise RuntimeError("Predictor is not quantized.")
+        torch.save(self.model.state_dict(), path)
 
     def get_num_patches(self):
         return self.num_patches
@@ -182,62 +431,98 @@ class OwlPredictor(torch.nn.Module):
     def get_image_size(self):
         return (self.image_size, self.image_size)
     
+    @profiled("encode_text")
+    @inference_only
     def encode_text(self, text: List[str]) -> OwlEncodeTextOutput:
         text_input = self.processor(text=text, return_tensors="pt")
         input_ids = text_input['input_ids'].to(self.device)
         attention_mask = text_input['attention_mask'].to(self.device)
-        text_outputs = self.model.owlvit.text_model(input_ids, attention_mask)
-        text_embeds = text_outputs[1]
-        text_embeds = self.model.owlvit.text_projection(text_embeds)
-        return OwlEncodeTextOutput(text_embeds=text_embeds)
-
-    def encode_image_torch(self, image: torch.Tensor) -> OwlEncodeImageOutput:
-        
-        vision_outputs = self.model.owlvit.vision_model(image)
-        last_hidden_state = vision_outputs[0]
-        image_embeds = self.model.owlvit.vision_model.post_layernorm(last_hidden_state)
-        class_token_out = image_embeds[:, :1, :]
-        image_embeds = image_embeds[:, 1:, :] * class_token_out
-        image_embeds = self.model.layer_norm(image_embeds)  # 768 dim
-
-        # Box Head
-        pred_boxes = self.model.box_head(image_embeds)
-        pred_boxes += self.box_bias
-        pred_boxes = torch.sigmoid(pred_boxes)
-        pred_boxes = _owl_center_to_corners_format_torch(pred_boxes)
-
-        # Class Head
-        image_class_embeds = self.model.class_head.dense0(image_embeds)
-        logit_shift = self.model.class_head.logit_shift(image_embeds)
-        logit_scale = self.model.class_head.logit_scale(image_embeds)
-        logit_scale = self.model.class_head.elu(logit_scale) + 1
+        with autocast(self.precision, self.device):
+            text_outputs = self.model.owlvit.text_model(input_ids, attention_mask)
+            text_embeds = text_outputs[1]
+            text_embeds = self.model.owlvit.text_projection(text_embeds)
+        return OwlEncodeTextOutput(text_embeds=text_embeds.float())
+
+    def encode_image_torch(self, image: torch.Tensor, image_encoding: Optional[str] = None) -> OwlEncodeImageOutput:
+        image_encoding = self.image_encoding if image_encoding is None else image_encoding
+
+        # the box head is run by decode on the kept patches for "lazy_boxes"
+        image_embeds, image_class_embeds, logit_shift, logit_scale, pred_boxes = _owl_encode_image(
+            self.model, image, self.box_bias, self.precision, with_boxes=image_encoding != "lazy_boxes"
+        )
+        return self._image_output(image_embeds, image_class_embeds, logit_shift, logit_scale, pred_boxes, image_encoding)
+
+    def encode_image_compiled(self, image: torch.Tensor) -> OwlEncodeImageOutput:
+        try:
+            outputs = self.image_encoder_compiled(image)
+        except Exception as e:
+            # e.g. inductor failing on a new batch size; stay eager from here on
+            warnings.warn(f"Compiled image encoder failed, running it eagerly: {e!r}")
+            self.image_encoder_compiled = None
+            self.compile_mode = "none"
+            return self.encode_image_torch(image)
+        pred_boxes = outputs[4] if len(outputs) == 5 else None
+        return self._image_output(*outputs[:4], pred_boxes, self.image_encoding)
 
-        output = OwlEncodeImageOutput(
-            image_embeds=image_embeds,
+    @staticmethod
+    def _image_output(image_embeds, image_class_embeds, logit_shift, logit_scale, pred_boxes, image_encoding: str) -> OwlEncodeImageOutput:
+        return OwlEncodeImageOutput(
+            image_embeds=None if image_encoding == "slim" else image_embeds,
             image_class_embeds=image_class_embeds,
             logit_shift=logit_shift,
             logit_scale=logit_scale,
             pred_boxes=pred_boxes
         )
 
+    def _box_head(self, image_embeds: torch.Tensor, box_bias: torch.Tensor) -> torch.Tensor:
+        return _owl_box_head(self.model, image_embeds, box_bias)
+
+    def _set_rois(self, output: OwlEncodeImageOutput, rois: torch.Tensor) -> OwlEncodeImageOutput:
+        """Boxes relative to the encoded rois -> global pixel coordinates, or keep the rois for decode."""
+        if output.pred_boxes is None:
+            output.rois = rois
+        else:
+            output.pred_boxes = _owl_box_roi_to_box_global(output.pred_boxes, rois[:, None, :])
         return output
+
+    def decode_boxes(self, image_output: OwlEncodeImageOutput, mask: torch.Tensor) -> torch.Tensor:
+        """Global boxes of the patches selected by ``mask`` ([num_images, num_patches])."""
+        if image_output.pred_boxes is not None:
+            return image_output.pred_boxes[mask]
+        input_indices, patch_indices = mask.nonzero(as_tuple=True)
+        boxes = self._box_head(image_output.image_embeds[input_indices, patch_indices], self.box_bias[patch_indices])
+        return _owl_box_roi_to_box_global(boxes[:, None, :], image_output.rois[input_indices][:, None, :])[:, 0]
     
     def encode_image_trt(self, image: torch.Tensor) -> OwlEncodeImageOutput:
         return self.image_encoder_engine(image)
 
+    def encode_image_onnxruntime(self, image: torch.Tensor) -> OwlEncodeImageOutput:
+        return self.image_encoder_session(image)
+
+    @profiled("encode_image")
+    @inference_only
     def encode_image(self, image: torch.Tensor) -> OwlEncodeImageOutput:
         if self.image_encoder_engine is not None:
-            return self.encode_image_trt(image)
+            output = self.encode_image_trt(image)
+        elif self.image_encoder_session is not None:
+            output = self.encode_image_onnxruntime(image)
+        elif self.image_encoder_compiled is not None:
+            return self.encode_image_compiled(image)
         else:
             return self.encode_image_torch(image)
+        # the exported encoders always compute boxes, only "slim" applies
+        if self.image_encoding == "slim":
+            output.image_embeds = None
+        return output
 
-    def extract_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float = 1.0):
+    def extract_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float = 1.0, image_indices: Optional[torch.Tensor] = None):
         if len(rois) == 0:
-            return torch.empty(
+            roi_images = torch.empty(
                 (0, image.shape[1], self.image_size, self.image_size),
                 dtype=image.dtype,
                 device=image.device
             )
+            return roi_images, rois
         if pad_square:
             # pad square
             w = padding_scale * (rois[..., 2] - rois[..., 0]) / 2
@@ -250,28 +535,55 @@ class OwlPredictor(torch.nn.Module):
             # compute mask
             pad_x = (s - w) / (2 * s)
             pad_y = (s - h) / (2 * s)
-            mask_x = (self.mesh_grid[1][None, ...] > pad_x[..., None, None]) & (self.mesh_grid[1][None, ...] < (1. - pad_x[..., None, None]))
-            mask_y = (self.mesh_grid[0][None, ...] > pad_y[..., None, None]) & (self.mesh_grid[0][None, ...] < (1. - pad_y[..., None, None]))
-            mask = (mask_x & mask_y)
+            mask_x = (self.grid_x[None, :] > pad_x[:, None]) & (self.grid_x[None, :] < (1. - pad_x[:, None]))
+            mask_y = (self.grid_y[None, :] > pad_y[:, None]) & (self.grid_y[None, :] < (1. - pad_y[:, None]))
 
         # extract rois
-        roi_images = roi_align(image, [rois], output_size=self.get_image_size())
+        if image_indices is None:
+            roi_images = roi_align(image, [rois], output_size=self.get_image_size())
+        else:
+            # rois of several images in the batch, the index of each roi goes in column 0
+            roi_images = roi_align(
+                image,
+                torch.cat([image_indices[:, None].to(rois.dtype), rois], dim=-1),
+                output_size=self.get_image_size()
+            )
 
-        # mask rois
+        # mask rois, the row and column masks broadcast without building an N x H x W mask
         if pad_square:
-            roi_images = (roi_images * mask[:, None, :, :])
+            roi_images.mul_(mask_y[:, None, :, None]).mul_(mask_x[:, None, None, :])
 
         return roi_images, rois
     
-    def encode_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float=1.0):
-        # with torch_timeit_sync("extract rois"):
-        roi_images, rois = self.extract_rois(image, rois, pad_square, padding_scale)
-        # with torch_timeit_sync("encode images"):
+    @inference_only
+    def encode_rois(self, image: torch.Tensor, rois: torch.Tensor, pad_square: bool = True, padding_scale: float = 1.0, image_indices: Optional[torch.Tensor] = None):
+        with self.profiler.section("extract_rois", self.device):
+            roi_images, rois = self.extract_rois(image, rois, pad_square, padding_scale, image_indices)
         output = self.encode_image(roi_images)
-        pred_boxes = _owl_box_roi_to_box_global(output.pred_boxes, rois[:, None, :])
-        output.pred_boxes = pred_boxes
-        return output
+        return self._set_rois(output, rois)
     
+    @inference_only
+    def encode_full_image(self, image: Union[PIL.Image.Image, np.ndarray], pad_square: bool = True) -> OwlEncodeImageOutput:
+        width, height = _owl_get_image_width_height(image)
+
+        if not self.fused_preprocess:
+            with self.profiler.section("preprocess", self.device):
+                image_tensor = self.image_preprocessor.preprocess_image(image)
+            rois = torch.tensor([[0, 0, width, height]], dtype=image_tensor.dtype, device=image_tensor.device)
+            return self.encode_rois(image_tensor, rois, pad_square=pad_square)
+
+        # resize on the host before normalizing, same rois as extract_rois
+        with self.profiler.section("preprocess", self.device):
+            roi_images = self.image_preprocessor.preprocess_resized(image, self.image_size, pad_square=pad_square)
+        if pad_square:
+            s = max(width, height) / 2
+            roi = [width / 2 - s, height / 2 - s, width / 2 + s, height / 2 + s]
+        else:
+            roi = [0, 0, width, height]
+        rois = torch.tensor([roi], dtype=roi_images.dtype, device=roi_images.device)
+        output = self.encode_image(roi_images)
+        return self._set_rois(output, rois)
+
     def non_maximum_suppression(self, boxes, scores, threshold=0.5):
         """
         Apply Non-Maximum Suppression (NMS) to remove overlapping boxes.
@@ -286,6 +598,8 @@ class OwlPredictor(torch.nn.Module):
         keep_indices = ops.nms(boxes, scores, threshold)
         return keep_indices
 
+    @profiled("decode")
+    @inference_only
     def decode(self, 
             image_output: OwlEncodeImageOutput, 
             text_output: OwlEncodeTextOutput,
@@ -321,21 +635,24 @@ class OwlPredictor(torch.nn.Module):
             mask = torch.logical_or(mask, mask_t)
 
         # Apply mask
-        boxes = image_output.pred_boxes[mask]
+        input_indices = torch.arange(0, num_input_images, dtype=labels.dtype, device=labels.device)
+        input_indices = input_indices[:, None].expand(-1, labels.shape[1])[mask]
+        boxes = self.decode_boxes(image_output, mask)
         scores = scores[mask]
         labels = labels[mask]
         
         # Apply Non-Maximum Suppression (NMS)
         keep_indices = []
-        for class_id in labels.unique():  # Process each class separately
-            class_mask = labels == class_id
-            class_boxes = boxes[class_mask]
-            class_scores = scores[class_mask]
+        with self.profiler.section("nms", self.device):
+            for class_id in labels.unique():  # Process each class separately
+                class_mask = labels == class_id
+                class_boxes = boxes[class_mask]
+                class_scores = scores[class_mask]
 
-            if class_boxes.size(0) > 0:  # Avoid errors for empty tensors
-                class_keep = ops.nms(class_boxes, class_scores, nms_threshold)
-                if class_keep.numel() > 0:  # Avoid empty indexing issues
-                    keep_indices.extend(class_mask.nonzero(as_tuple=True)[0][class_keep].tolist())
+                if class_boxes.size(0) > 0:  # Avoid errors for empty tensors
+                    class_keep = ops.nms(class_boxes, class_scores, nms_threshold)
+                    if class_keep.numel() > 0:  # Avoid empty indexing issues
+                        keep_indices.extend(class_mask.nonzero(as_tuple=True)[0][class_keep].tolist())
 
 
         if len(keep_indices) > 0:
@@ -347,7 +664,7 @@ class OwlPredictor(torch.nn.Module):
             labels=labels[keep_indices],
             scores=scores[keep_indices],
             boxes=boxes[keep_indices],
-            input_indices = torch.arange(0, labels.shape[0], dtype=labels.dtype, device=labels.device)[keep_indices]
+            input_indices=input_indices[keep_indices]
         )
     
 
@@ -374,20 +691,6 @@ class OwlPredictor(torch.nn.Module):
             onnx_opset=17
         ):
         
-        class TempModule(torch.nn.Module):
-            def __init__(self, parent):
-                super().__init__()
-                self.parent = parent
-            def forward(self, image):
-                output = self.parent.encode_image_torch(image)
-                return (
-                    output.image_embeds,
-                    output.image_class_embeds,
-                    output.logit_shift,
-                    output.logit_scale,
-                    output.pred_boxes
-                )
-
         data = torch.randn(batch_size, 3, self.image_size, self.image_size).to(self.device)
 
         if use_dynamic_axes:
@@ -402,7 +705,8 @@ class OwlPredictor(torch.nn.Module):
         else:
             dynamic_axes = {}
 
-        model = TempModule(self)
+        # eval, so the exported graph does not depend on the mode the model was left in
+        model = _OwlImageEncoderModule(self.model, self.box_bias, self.precision, with_boxes=True).eval()
 
         torch.onnx.export(
             model, 
@@ -464,6 +768,64 @@ class OwlPredictor(torch.nn.Module):
 
         return image_encoder
 
+    @staticmethod
+    def load_image_encoder_onnxruntime(
+            onnx_path: str,
+            max_batch_size: int = 1,
+            intra_op_num_threads: int = 0,
+            inter_op_num_threads: int = 0,
+            providers: Optional[List[str]] = None
+        ):
+        import onnxruntime as ort
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 0 lets onnxruntime pick the number of threads
+        session_options.intra_op_num_threads = intra_op_num_threads
+        session_options.inter_op_num_threads = inter_op_num_threads
+
+        session = ort.InferenceSession(
+            onnx_path,
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"] if providers is None else providers
+        )
+
+        class Wrapper(torch.nn.Module):
+            def __init__(self, session: "ort.InferenceSession", max_batch_size: int):
+                super().__init__()
+                self.session = session
+                self.max_batch_size = max_batch_size
+
+            @torch.no_grad()
+            def forward(self, image):
+
+                b = image.shape[0]
+
+                results = []
+
+                for start_index in range(0, b, self.max_batch_size):
+                    end_index = min(b, start_index + self.max_batch_size)
+                    image_slice = image[start_index:end_index].detach().float().cpu().contiguous()
+                    output = self.session.run(
+                        OwlPredictor.get_image_encoder_output_names(),
+                        {"image": image_slice.numpy()}
+                    )
+                    results.append(
+                        [torch.from_numpy(r).to(image.device) for r in output]
+                    )
+
+                return OwlEncodeImageOutput(
+                    image_embeds=torch.cat([r[0] for r in results], dim=0),
+                    image_class_embeds=torch.cat([r[1] for r in results], dim=0),
+                    logit_shift=torch.cat([r[2] for r in results], dim=0),
+                    logit_scale=torch.cat([r[3] for r in results], dim=0),
+                    pred_boxes=torch.cat([r[4] for r in results], dim=0)
+                )
+
+        image_encoder = Wrapper(session, max_batch_size)
+
+        return image_encoder
+
     def build_image_encoder_engine(self, 
             engine_path: str, 
             max_batch_size: int = 1, 
@@ -491,8 +853,9 @@ class OwlPredictor(torch.nn.Module):
 
         return self.load_image_encoder_engine(engine_path, max_batch_size)
 
+    @inference_only
     def predict(self, 
-            image: PIL.Image, 
+            image: Union[PIL.Image.Image, np.ndarray], 
             text: List[str], 
             text_encodings: Optional[OwlEncodeTextOutput],
             threshold: Union[int, float, List[Union[int, float]]] = 0.1,
@@ -500,14 +863,39 @@ class OwlPredictor(torch.nn.Module):
             nms_threshold: float = 0.5
         ) -> OwlDecodeOutput:
 
-        image_tensor = self.image_preprocessor.preprocess_pil_image(image)
-
         if text_encodings is None:
             text_encodings = self.encode_text(text)
 
-        rois = torch.tensor([[0, 0, image.width, image.height]], dtype=image_tensor.dtype, device=image_tensor.device)
+        image_encodings = self.encode_full_image(image, pad_square=pad_square)
+
+        return self.decode(image_encodings, text_encodings, threshold, nms_threshold)
 
-        image_encodings = self.encode_rois(image_tensor, rois, pad_square=pad_square)
+    @inference_only
+    def predict_with_cache(self, 
+            image: Union[PIL.Image.Image, np.ndarray], 
+            text: List[str], 
+            text_encodings: Optional[OwlEncodeTextOutput],
+            threshold: Union[int, float, List[Union[int, float]]] = 0.1,
+            pad_square: bool = True,
+            nms_threshold: float = 0.5
+        ) -> OwlDecodeOutput:
+        """Like :meth:`predict`, but reuses the image encoding across calls.
+
+        Re-querying an image that is still in ``self.image_encoding_cache``
+        with new text only runs the text encoder and :meth:`decode`.
+        """
+
+        roi = (0, 0, *_owl_get_image_width_height(image))
+        key = (_owl_image_content_hash(image), roi, pad_square)
+
+        image_encodings = self.image_encoding_cache.get(key, device=self.device)
+
+        if image_encodings is None:
+            image_encodings = self.encode_full_image(image, pad_square=pad_square)
+            self.image_encoding_cache.put(key, image_encodings)
+
+        if text_encodings is None:
+            text_encodings = self.encode_text(text)
 
-        return self.decode(image_encodings, text_encodings, threshold)
+        return self.decode(image_encodings, text_encodings, threshold, nms_threshold)
 
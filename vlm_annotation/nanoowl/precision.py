@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Execution mode of the predictors: inference-only guards and reduced precision.
+
+Predictors have an ``inference_mode`` attribute (default True) that
+``inference_only`` honours, and a ``precision`` that ``autocast`` turns into
+an autocast region around the encoder towers. Decoding always runs in fp32.
+"""
+
+import functools
+from contextlib import nullcontext
+
+import torch
+
+
+__all__ = [
+    "PRECISIONS",
+    "inference_only",
+    "autocast"
+]
+
+
+PRECISIONS = ("fp32", "bf16")
+
+
+def inference_only(fn):
+    """Runs the method under ``torch.inference_mode()`` if ``self.inference_mode`` is set.
+
+    No autograd graph is recorded and no activations are kept for backward.
+    The returned tensors are inference tensors: they can be read anywhere,
+    but not modified in place outside of inference mode.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if not self.inference_mode:
+            return fn(self, *args, **kwargs)
+        with torch.inference_mode():
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def autocast(precision: str, device):
+    if precision == "fp32":
+        return nullcontext()
+    if precision == "bf16":
+        return torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16)
+    raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}.")
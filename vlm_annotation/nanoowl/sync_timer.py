@@ -14,26 +14,192 @@
 # limitations under the License.
 
 
+import contextlib
+import functools
+import json
+import os
+import threading
 import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Union
+
+import numpy as np
 import torch
 
 
-__all__ == [
-    "SyncTimer"
+__all__ = [
+    "SyncTimer",
+    "Profiler",
+    "profiled",
+    "synchronize"
 ]
 
 
+def synchronize(device: Optional[Union[str, torch.device]] = None):
+    """Waits for queued work on ``device``; no-op for cpu and None."""
+    if device is None:
+        return
+    device = torch.device(device)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    elif device.type == "mps":
+        torch.mps.synchronize()
+
+
+# returned by disabled profilers, so a section costs one call and a no-op with block
+_NULL_SECTION = contextlib.nullcontext()
+
+
+class _Section:
+
+    __slots__ = ("profiler", "name", "device", "t0")
+
+    def __init__(self, profiler: "Profiler", name: str, device):
+        self.profiler = profiler
+        self.name = name
+        self.device = device
+        self.t0 = None
+
+    def __enter__(self):
+        self.profiler._stack().append(self.name)
+        synchronize(self.device)
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        synchronize(self.device)
+        t1 = time.perf_counter_ns()
+        stack = self.profiler._stack()
+        path = "/".join(stack)
+        stack.pop()
+        self.profiler._record(path, self.name, self.t0, t1)
+        return False
+
+
+class Profiler:
+    """Named, nestable timing sections with aggregated statistics.
+
+    Sections are keyed by their path, e.g. ``encode_rois/extract_rois`` for
+    an ``extract_rois`` section opened inside ``encode_rois``. When a device
+    is given, it is synchronized at the start and end of the section (cuda
+    and mps only) so asynchronous kernels are attributed to it.
+
+    A disabled profiler returns a shared no-op context from :meth:`section`.
+    """
+
+    def __init__(self, enabled: bool = True, sync: bool = True, max_events: int = 100000):
+        self.enabled = enabled
+        self.sync = sync
+        self.max_events = max_events
+        self._samples: Dict[str, List[float]] = defaultdict(list)
+        self._events: List[tuple] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._t_start = time.perf_counter_ns()
+
+    def section(self, name: str, device: Optional[Union[str, torch.device]] = None):
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name, device if self.sync else None)
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, path: str, name: str, t0: int, t1: int):
+        with self._lock:
+            self._samples[path].append((t1 - t0) / 1e6)
+            if len(self._events) < self.max_events:
+                self._events.append((path, name, t0, t1, threading.get_ident()))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._events.clear()
+            self._t_start = time.perf_counter_ns()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """count, total / mean / p50 / p95 in milliseconds per section path."""
+        with self._lock:
+            samples = {path: np.asarray(times) for path, times in self._samples.items()}
+        return {
+            path: {
+                "count": int(len(times)),
+                "total_ms": float(times.sum()),
+                "mean_ms": float(times.mean()),
+                "p50_ms": float(np.percentile(times, 50)),
+                "p95_ms": float(np.percentile(times, 95))
+            }
+            for path, times in samples.items()
+        }
+
+    def summary(self) -> str:
+        lines = [f"{'section':<40} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}"]
+        for path, s in sorted(self.stats().items()):
+            lines.append(f"{path:<40} {s['count']:>7} {s['mean_ms']:>9.3f} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f}")
+        return "\n".join(lines)
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        data = json.dumps(self.stats(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(data)
+        return data
+
+    def export_chrome_trace(self, path: str):
+        """Writes the recorded sections as complete events for chrome://tracing or Perfetto."""
+        with self._lock:
+            events = list(self._events)
+            t_start = self._t_start
+        trace = {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": "nanoowl",
+                    "ph": "X",
+                    "ts": (t0 - t_start) / 1e3,
+                    "dur": (t1 - t0) / 1e3,
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"path": section_path}
+                }
+                for section_path, name, t0, t1, tid in events
+            ],
+            "displayTimeUnit": "ms"
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f)
+
+
+def profiled(name: str):
+    """Runs the decorated method in ``self.profiler.section(name, self.device)``."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.section(name, self.device):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class SyncTimer():
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, device: Optional[Union[str, torch.device]] = None):
         self.name = name
+        # previously always synchronized cuda, now only if it is there
+        if device is None and torch.cuda.is_available():
+            device = "cuda"
+        self.device = device
         self.t0 = None
 
     def __enter__(self, *args, **kwargs):
+        synchronize(self.device)
         self.t0 = time.perf_counter_ns()
 
     def __exit__(self, *args, **kwargs):
-        torch.cuda.current_stream().synchronize()
+        synchronize(self.device)
         t1 = time.perf_counter_ns()
         dt = (t1 - self.t0) / 1e9
-        print(f"{self.name} FPS: {round(1./dt, 3)}")
\ No newline at end of file
+        print(f"{self.name} FPS: {round(1./dt, 3)}")
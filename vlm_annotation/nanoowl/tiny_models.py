@@ -0,0 +1,186 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Randomly initialized OWL-ViT and CLIP checkpoints for offline tests and benchmarks.
+
+The checkpoints are written to local paths that OwlPredictor / ClipPredictor
+load like the pretrained ones, without downloading anything. The vision
+towers keep the input and patch sizes of owlvit-base-patch32 and ViT-B/32,
+so rois, patch grids, boxes and embeddings have the real shapes (with
+``full_size=True`` also the real hidden sizes, for timing). The OWL-ViT
+tokenizer is a character level substitute of the CLIP tokenizer, so text
+sequences are padded to TINY_TEXT_LENGTH tokens instead of 16.
+"""
+
+import json
+import os
+import tempfile
+import warnings
+from typing import Optional, Tuple
+
+import torch
+
+
+__all__ = [
+    "TINY_TEXT_LENGTH",
+    "save_tiny_owl_model",
+    "save_tiny_clip_model",
+    "build_tiny_predictors"
+]
+
+
+TINY_TEXT_LENGTH = 32
+
+
+def _bytes_to_unicode():
+    # the byte to character table of the CLIP / GPT-2 byte level BPE
+    bs = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    cs = bs[:]
+    n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b)
+            cs.append(256 + n)
+            n += 1
+    return dict(zip(bs, [chr(c) for c in cs]))
+
+
+def _save_char_tokenizer_files(path: str) -> Tuple[str, str, int]:
+    # one token per character and per word-final character, no merges
+    chars = list(_bytes_to_unicode().values())
+    vocab = {c: i for i, c in enumerate(chars)}
+    for c in chars:
+        vocab[c + "</w>"] = len(vocab)
+    vocab["<|startoftext|>"] = len(vocab)
+    vocab["<|endoftext|>"] = len(vocab)
+    vocab_file = os.path.join(path, "vocab.json")
+    merges_file = os.path.join(path, "merges.txt")
+    with open(vocab_file, "w") as f:
+        json.dump(vocab, f)
+    with open(merges_file, "w") as f:
+        f.write("#version: 0.2\n")
+    return vocab_file, merges_file, len(vocab)
+
+
+def save_tiny_owl_model(path: str, full_size: bool = False, seed: int = 0) -> str:
+    """Writes a random OWL-ViT checkpoint with its processor to ``path``, returns ``path``."""
+    from transformers import (
+        CLIPTokenizer,
+        OwlViTConfig,
+        OwlViTForObjectDetection,
+        OwlViTImageProcessor,
+        OwlViTProcessor
+    )
+
+    os.makedirs(path, exist_ok=True)
+    vocab_file, merges_file, vocab_size = _save_char_tokenizer_files(path)
+    bos_token_id, eos_token_id = vocab_size - 2, vocab_size - 1
+
+    text_config = dict(
+        vocab_size=49408 if full_size else vocab_size,
+        max_position_embeddings=TINY_TEXT_LENGTH,
+        bos_token_id=bos_token_id,
+        eos_token_id=eos_token_id,
+        pad_token_id=eos_token_id
+    )
+    vision_config = dict(image_size=768, patch_size=32)
+    if full_size:
+        config = OwlViTConfig(text_config=text_config, vision_config=vision_config)
+    else:
+        text_config.update(hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=2)
+        vision_config.update(hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=2)
+        config = OwlViTConfig(text_config=text_config, vision_config=vision_config, projection_dim=32)
+
+    torch.manual_seed(seed)
+    model = OwlViTForObjectDetection(config).eval()
+    # constant logit scale / shift, so like with trained weights only the best
+    # matching ~1% of patches score above the usual 0.1 threshold
+    with torch.no_grad():
+        model.class_head.logit_shift.weight.zero_()
+        model.class_head.logit_shift.bias.fill_(-0.6)
+        model.class_head.logit_scale.weight.zero_()
+        model.class_head.logit_scale.bias.fill_(9.)  # elu(9) + 1 = 10
+    model.save_pretrained(path)
+
+    tokenizer = CLIPTokenizer(vocab_file, merges_file, model_max_length=TINY_TEXT_LENGTH)
+    OwlViTProcessor(image_processor=OwlViTImageProcessor(), tokenizer=tokenizer).save_pretrained(path)
+    return path
+
+
+def save_tiny_clip_model(path: str, full_size: bool = False, seed: int = 0) -> str:
+    """Writes a random CLIP checkpoint to ``path``/clip.pt, returns the file path.
+
+    clip.load rebuilds the architecture from the tensor shapes, so the path
+    can be passed as the ClipPredictor model_name. The text side keeps the
+    vocabulary and context length of clip.tokenize.
+    """
+    from clip.model import CLIP
+
+    os.makedirs(path, exist_ok=True)
+    if full_size:
+        # ViT-B/32
+        sizes = dict(embed_dim=512, vision_layers=12, vision_width=768, transformer_width=512, transformer_layers=12)
+    else:
+        # clip derives the number of heads as width // 64
+        sizes = dict(embed_dim=32, vision_layers=2, vision_width=64, transformer_width=64, transformer_layers=2)
+
+    torch.manual_seed(seed)
+    model = CLIP(
+        image_resolution=224,
+        vision_patch_size=32,
+        context_length=77,
+        vocab_size=49408,
+        transformer_heads=sizes["transformer_width"] // 64,
+        **sizes
+    )
+    model = model.eval()
+
+    # clip.load expects a TorchScript archive, as the released checkpoints
+    import clip
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        traced = torch.jit.trace(model, (torch.zeros(1, 3, 224, 224), clip.tokenize(["a"])))
+    model_path = os.path.join(path, "clip.pt")
+    traced.save(model_path)
+    return model_path
+
+
+def build_tiny_predictors(
+        root: Optional[str] = None,
+        device: str = "cpu",
+        full_size: bool = False,
+        **owl_kwargs
+    ):
+    """Returns (OwlPredictor, ClipPredictor) on random checkpoints stored under ``root``.
+
+    Checkpoints already in ``root`` are reused. ``owl_kwargs`` go to OwlPredictor.
+    """
+    from .owl_predictor import OwlPredictor
+    from .clip_predictor import ClipPredictor
+
+    if root is None:
+        root = tempfile.mkdtemp(prefix="nanoowl_tiny_")
+    name = "full_size" if full_size else "tiny"
+    owl_path = os.path.join(root, f"owlvit_{name}")
+    clip_path = os.path.join(root, f"clip_{name}", "clip.pt")
+    if not os.path.exists(os.path.join(owl_path, "config.json")):
+        save_tiny_owl_model(owl_path, full_size=full_size)
+    if not os.path.exists(clip_path):
+        save_tiny_clip_model(os.path.dirname(clip_path), full_size=full_size)
+
+    owl_predictor = OwlPredictor(owl_path, device=device, **owl_kwargs)
+    clip_predictor = ClipPredictor(clip_path, device=device)
+    return owl_predictor, clip_predictor
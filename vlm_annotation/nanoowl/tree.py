@@ -16,7 +16,9 @@
 
 import json
 from enum import Enum
-from typing import List, Optional, Mapping
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import List, Optional, Mapping, Tuple
 from .clip_predictor import ClipEncodeTextOutput
 from .owl_predictor import OwlEncodeTextOutput
 
@@ -24,6 +26,7 @@ from .owl_predictor import OwlEncodeTextOutput
 __all__ = [
     "TreeOp",
     "TreeNode",
+    "TreePlan",
     "Tree"
 ]
 
@@ -50,7 +53,7 @@ class TreeNode:
         return {
             "op": str(self.op),
             "input": self.input,
-            "outputs": self.outputs
+            "outputs": list(self.outputs)
         }
 
     @staticmethod
@@ -66,12 +69,24 @@ class TreeNode:
             raise RuntimeError("Missing 'input' field.")
         
         return TreeNode(
-            op=node_dict["op"],
+            op=TreeOp(node_dict["op"]),
             input=node_dict["input"],
             outputs=node_dict["outputs"]
         )
     
 
+@dataclass(frozen=True)
+class TreePlan:
+    """Lookup tables of a :class:`Tree`, indexed by label index."""
+    nodes_by_input: Tuple[Tuple[TreeNode, ...], ...]  # in tree order
+    detect_nodes_by_input: Tuple[Tuple[TreeNode, ...], ...]
+    classify_nodes_by_input: Tuple[Tuple[TreeNode, ...], ...]
+    label_ops: Tuple[Optional[TreeOp], ...]
+    label_depths: Tuple[int, ...]
+    detect_label_indices: Tuple[int, ...]
+    classify_label_indices: Tuple[int, ...]
+
+
 class Tree:
     nodes: List[TreeNode]
     labels: List[str]
@@ -80,6 +95,51 @@ class Tree:
         self.nodes = nodes
         self.labels = labels
         self._label_index_to_node_map = self._build_label_index_to_node_map()
+        self._plan: Optional[TreePlan] = None
+
+    def compile(self) -> TreePlan:
+        """Builds (once) the lookup tables used by the query methods below.
+
+        The tree must not be modified after it has been compiled.
+        """
+        if self._plan is not None:
+            return self._plan
+
+        num_labels = len(self.labels)
+        nodes_by_input = [[] for _ in range(num_labels)]
+        detect_nodes = [[] for _ in range(num_labels)]
+        classify_nodes = [[] for _ in range(num_labels)]
+        for node in self.nodes:
+            nodes_by_input[node.input].append(node)
+            if node.op == TreeOp.DETECT:
+                detect_nodes[node.input].append(node)
+            elif node.op == TreeOp.CLASSIFY:
+                classify_nodes[node.input].append(node)
+
+        label_ops = tuple(
+            self._label_index_to_node_map[i].op if i in self._label_index_to_node_map else None
+            for i in range(num_labels)
+        )
+
+        # breadth first from the image label, so each input's depth is known before its outputs
+        label_depths = [0] * num_labels
+        queue = [0]
+        for label_index in queue:
+            for node in detect_nodes[label_index] + classify_nodes[label_index]:
+                for output in node.outputs:
+                    label_depths[output] = label_depths[label_index] + 1
+                    queue.append(output)
+
+        self._plan = TreePlan(
+            nodes_by_input=tuple(tuple(n) for n in nodes_by_input),
+            detect_nodes_by_input=tuple(tuple(n) for n in detect_nodes),
+            classify_nodes_by_input=tuple(tuple(n) for n in classify_nodes),
+            label_ops=label_ops,
+            label_depths=tuple(label_depths),
+            detect_label_indices=tuple(i for i, op in enumerate(label_ops) if op == TreeOp.DETECT),
+            classify_label_indices=tuple(i for i, op in enumerate(label_ops) if op == TreeOp.CLASSIFY)
+        )
+        return self._plan
     
     def _build_label_index_to_node_map(self) -> Mapping[int, "TreeNode"]:
         label_to_node_map = {}
@@ -93,11 +153,33 @@ class Tree:
     def to_dict(self):
         return {
             "nodes": [node.to_dict() for node in self.nodes],
-            "labels": self.labels
+            "labels": list(self.labels)
         }
 
     @staticmethod
-    def from_prompt(prompt: str):
+    def from_prompt(prompt: str) -> "Tree":
+        """Parses and compiles ``prompt``.
+
+        Trees are cached per prompt string, so repeated calls return the same
+        shared instance. Its ``labels`` and node ``outputs`` are tuples, so it
+        cannot be modified by accident; use :meth:`parse_prompt` for a tree
+        of your own.
+        """
+        return Tree._from_prompt_cached(prompt)
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _from_prompt_cached(prompt: str) -> "Tree":
+        parsed = Tree.parse_prompt(prompt)
+        tree = Tree(
+            nodes=tuple(TreeNode(op=node.op, input=node.input, outputs=tuple(node.outputs)) for node in parsed.nodes),
+            labels=tuple(parsed.labels)
+        )
+        tree.compile()
+        return tree
+
+    @staticmethod
+    def parse_prompt(prompt: str) -> "Tree":
 
         nodes = []
         node_stack = []
@@ -186,10 +268,12 @@ class Tree:
         return self._label_index_to_node_map[label_index].op
     
     def get_label_indices_with_op(self, op: TreeOp):
-        return [
-            index for index in range(len(self.labels))
-            if self.get_op_for_label_index(index) == op
-        ]
+        plan = self.compile()
+        if op == TreeOp.DETECT:
+            return list(plan.detect_label_indices)
+        if op == TreeOp.CLASSIFY:
+            return list(plan.classify_label_indices)
+        return [i for i, label_op in enumerate(plan.label_ops) if label_op == op]
     
     def get_classify_label_indices(self):
         return self.get_label_indices_with_op(TreeOp.CLASSIFY)
@@ -198,27 +282,19 @@ class Tree:
         return self.get_label_indices_with_op(TreeOp.DETECT)
 
     def find_nodes_with_input(self, input_index: int):
-        return [n for n in self.nodes if n.input == input_index]
+        return list(self.compile().nodes_by_input[input_index])
 
     def find_detect_nodes_with_input(self, input_index: int):
-        return [n for n in self.find_nodes_with_input(input_index) if n.op == TreeOp.DETECT]
+        return list(self.compile().detect_nodes_by_input[input_index])
 
     def find_classify_nodes_with_input(self, input_index: int):
-        return [n for n in self.find_nodes_with_input(input_index) if n.op == TreeOp.CLASSIFY]
+        return list(self.compile().classify_nodes_by_input[input_index])
 
     def get_label_depth(self, index):
-        depth = 0
-        while index in self._label_index_to_node_map:
-            depth += 1
-            node = self._label_index_to_node_map[index]
-            index = node.input
-        return depth
+        return self.compile().label_depths[index]
 
     def get_label_depth_map(self):
-        depths = {}
-        for i in range(len(self.labels)):
-            depths[i] = self.get_label_depth(i)
-        return depths
+        return dict(enumerate(self.compile().label_depths))
 
     def get_label_map(self):
         label_map = {}
@@ -17,25 +17,13 @@
 import PIL.Image
 import PIL.ImageDraw
 import cv2
+from .colors import get_colors
 from .tree import Tree
 from .tree_predictor import TreeOutput
-import matplotlib.pyplot as plt
 import numpy as np
-from typing import List
-
-
-def get_colors(count: int):
-    cmap = plt.cm.get_cmap("pink", count)
-    colors = []
-    for i in range(count):
-        color = cmap(i)
-        color = [int(255 * value) for value in color]
-        colors.append(tuple(color))
-    return colors
 
 
 def draw_tree_output(image, output: TreeOutput, tree: Tree, draw_text=True, num_colors=8):
-    detections = output.detections
     is_pil = not isinstance(image, np.ndarray)
     if is_pil:
         image = np.asarray(image)
@@ -44,11 +32,19 @@ def draw_tree_output(image, output: TreeOutput, tree: Tree, draw_text=True, num_
     colors = get_colors(num_colors)
     label_map = tree.get_label_map()
     label_depths = tree.get_label_depth_map()
-    for detection in detections:
-        box = [int(x) for x in detection.box]
+
+    # group the columnar rows per instance, keeping first-seen order
+    instances = {}
+    for box, label, instance_id in zip(output.boxes.int().tolist(), output.label_ids.tolist(), output.instance_ids.tolist()):
+        if instance_id in instances:
+            instances[instance_id][1].append(label)
+        else:
+            instances[instance_id] = (box, [label])
+
+    for box, labels in instances.values():
         pt0 = (box[0], box[1])
         pt1 = (box[2], box[3])
-        box_depth = min(label_depths[i] for i in detection.labels)
+        box_depth = min(label_depths[i] for i in labels)
         cv2.rectangle(
             image,
             pt0,
@@ -59,7 +55,7 @@ def draw_tree_output(image, output: TreeOutput, tree: Tree, draw_text=True, num_
         if draw_text:
             offset_y = 30
             offset_x = 8
-            for label in detection.labels:
+            for label in labels:
                 label_text = label_map[label]
                 cv2.putText(
                     image,
@@ -14,15 +14,37 @@
 # limitations under the License.
 
 
-from .tree import Tree, TreeOp
+from .tree import Tree
 from .owl_predictor import OwlPredictor, OwlEncodeTextOutput, OwlEncodeImageOutput
 from .clip_predictor import ClipPredictor, ClipEncodeTextOutput, ClipEncodeImageOutput
 from .image_preprocessor import ImagePreprocessor
+from .precision import inference_only
 
+import json
 import torch
 import PIL.Image
-from typing import Optional, Tuple, List, Mapping, Dict
-from dataclasses import dataclass
+from typing import Optional, Tuple, List, Dict, Union
+from dataclasses import dataclass, field, fields
+
+
+ImageEncodings = Union[OwlEncodeImageOutput, ClipEncodeImageOutput]
+
+
+def _cat_image_encodings(encodings: List[ImageEncodings]) -> ImageEncodings:
+    if len(encodings) == 1:
+        return encodings[0]
+    # fields left out by the image encoding mode are None in every encoding
+    return type(encodings[0])(**{
+        f.name: None if getattr(encodings[0], f.name) is None else torch.cat([getattr(e, f.name) for e in encodings], dim=0)
+        for f in fields(encodings[0])
+    })
+
+
+def _slice_image_encodings(encodings: ImageEncodings, start_index: int, end_index: int) -> ImageEncodings:
+    return type(encodings)(**{
+        f.name: None if getattr(encodings, f.name) is None else getattr(encodings, f.name)[start_index:end_index]
+        for f in fields(encodings)
+    })
 
 
 @dataclass
@@ -36,8 +58,84 @@ class TreeDetection:
 
 @dataclass
 class TreeOutput:
-    detections: List[TreeDetection]
-    
+    """Columnar tree predictions on the CPU, one row per (instance, label).
+
+    An instance that was detected and then classified has one row for its
+    detect label and one per classify label, all with the same box.
+    """
+    boxes: torch.Tensor  # [N, 4] float
+    scores: torch.Tensor  # [N] float
+    label_ids: torch.Tensor  # [N] int64
+    instance_ids: torch.Tensor  # [N] int64
+    parent_ids: torch.Tensor  # [N] int64
+    _detections: Optional[List[TreeDetection]] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def detections(self) -> List[TreeDetection]:
+        """Rows grouped per instance, built on first access."""
+        if self._detections is None:
+            detections: Dict[int, TreeDetection] = {}
+            for box, score, label, instance_id, parent_id in zip(
+                    self.boxes.tolist(),
+                    self.scores.tolist(),
+                    self.label_ids.tolist(),
+                    self.instance_ids.tolist(),
+                    self.parent_ids.tolist()):
+                if instance_id in detections:
+                    detections[instance_id].labels.append(label)
+                    detections[instance_id].scores.append(score)
+                else:
+                    detections[instance_id] = TreeDetection(
+                        id=instance_id,
+                        parent_id=parent_id,
+                        box=box,
+                        labels=[label],
+                        scores=[score]
+                    )
+            self._detections = list(detections.values())
+        return self._detections
+
+    def to_dict(self):
+        return {
+            "boxes": self.boxes.tolist(),
+            "scores": self.scores.tolist(),
+            "label_ids": self.label_ids.tolist(),
+            "instance_ids": self.instance_ids.tolist(),
+            "parent_ids": self.parent_ids.tolist()
+        }
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+def _pack_tree_output(
+        boxes: Dict[int, torch.Tensor],
+        scores: Dict[int, torch.Tensor],
+        instance_ids: Dict[int, torch.Tensor],
+        parent_instance_ids: Dict[int, torch.Tensor]
+    ) -> TreeOutput:
+    label_indices = list(boxes.keys())
+    counts = torch.tensor([len(boxes[i]) for i in label_indices])
+    label_ids = torch.repeat_interleave(torch.tensor(label_indices, dtype=torch.int64), counts)
+
+    # one device to host copy per dtype, boxes and scores in float32 (no float64 on mps)
+    packed_float = torch.cat([
+        torch.cat([boxes[i].float() for i in label_indices], dim=0),
+        torch.cat([scores[i].float() for i in label_indices], dim=0)[:, None]
+    ], dim=1).cpu()
+    packed_ids = torch.stack([
+        torch.cat([instance_ids[i].long() for i in label_indices], dim=0),
+        torch.cat([parent_instance_ids[i].long() for i in label_indices], dim=0)
+    ], dim=1).cpu()
+
+    return TreeOutput(
+        boxes=packed_float[:, 0:4],
+        scores=packed_float[:, 4],
+        label_ids=label_ids,
+        instance_ids=packed_ids[:, 0],
+        parent_ids=packed_ids[:, 1]
+    )
+
 
 class TreePredictor(torch.nn.Module):
 
@@ -45,11 +143,22 @@ class TreePredictor(torch.nn.Module):
             owl_predictor: Optional[OwlPredictor] = None,
             clip_predictor: Optional[ClipPredictor] = None,
             image_preprocessor: Optional[ImagePreprocessor] = None,
-            device: str = "cuda"
+            device: Optional[str] = None,
+            inference_mode: bool = True
         ):
         super().__init__()
-        self.owl_predictor = OwlPredictor() if owl_predictor is None else owl_predictor
-        self.clip_predictor = ClipPredictor() if clip_predictor is None else clip_predictor
+        # see nanoowl.precision
+        self.inference_mode = inference_mode
+        if device is None:
+            # follow the given predictors, otherwise cuda only if there is one
+            if owl_predictor is not None:
+                device = owl_predictor.device
+            elif clip_predictor is not None:
+                device = clip_predictor.device
+            else:
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.owl_predictor = OwlPredictor(device=device) if owl_predictor is None else owl_predictor
+        self.clip_predictor = ClipPredictor(device=device) if clip_predictor is None else clip_predictor
         self.image_preprocessor = ImagePreprocessor().to(device).eval() if image_preprocessor is None else image_preprocessor
 
     def encode_clip_text(self, tree: Tree) -> Dict[int, ClipEncodeTextOutput]:
@@ -74,57 +183,70 @@ class TreePredictor(torch.nn.Module):
             label_encodings[label_indices[i]] = text_encodings.slice(i, i+1)
         return label_encodings
     
-    @torch.no_grad()
-    def predict(self, 
-            image: PIL.Image.Image, 
-            tree: Tree, 
-            threshold: float = 0.1,
-            clip_text_encodings: Optional[Dict[int, ClipEncodeTextOutput]] = None,
-            owl_text_encodings: Optional[Dict[int, OwlEncodeTextOutput]] = None
-        ):
-
-        if clip_text_encodings is None:
-            clip_text_encodings = self.encode_clip_text(tree)
-        
-        if owl_text_encodings is None:
-            owl_text_encodings = self.encode_owl_text(tree)
-        
-        image_tensor = self.image_preprocessor.preprocess_pil_image(image)
-        boxes = {
-            0: torch.tensor([[0, 0, image.width, image.height]], dtype=image_tensor.dtype, device=image_tensor.device)
-        }
-        scores = {
-            0: torch.tensor([1.], dtype=torch.float, device=image_tensor.device)
-        }
-        instance_ids = {
-            0: torch.tensor([0], dtype=torch.int64, device=image_tensor.device)
-        }
-        parent_instance_ids = {
-            0: torch.tensor([-1], dtype=torch.int64, device=image_tensor.device)
-        }
-
-        owl_image_encodings: Dict[int, OwlEncodeImageOutput] = {}
-        clip_image_encodings: Dict[int, ClipEncodeImageOutput] = {}
-
-        global_instance_id = 1
-
-        queue = [0]
-
-        while queue:
-            label_index = queue.pop(0)
+    def encode_rois_batched(self,
+            predictor: Union[OwlPredictor, ClipPredictor],
+            image: torch.Tensor,
+            rois: List[torch.Tensor],
+            max_rois_per_batch: Optional[int] = 64,
+            image_indices: Optional[List[int]] = None
+        ) -> List[ImageEncodings]:
+        """Encodes several groups of rois with as few encode_rois calls as possible.
+
+        ``image_indices`` gives the batch index in ``image`` of each group
+        (all 0 if omitted). At most ``max_rois_per_batch`` rois are cropped
+        and encoded at a time (None for a single batch). Returns one encoding
+        per group, in the order of ``rois``.
+        """
+        if max_rois_per_batch is not None and max_rois_per_batch <= 0:
+            raise ValueError(f"max_rois_per_batch must be positive, got {max_rois_per_batch}.")
+        counts = [len(r) for r in rois]
+        all_rois = torch.cat(rois, dim=0)
+        if image_indices is None:
+            image_indices = [0] * len(rois)
+        all_image_indices = torch.repeat_interleave(
+            torch.tensor(image_indices, dtype=torch.int64),
+            torch.tensor(counts)
+        ).to(all_rois.device)
+        if max_rois_per_batch is None:
+            max_rois_per_batch = len(all_rois)
+        encodings = _cat_image_encodings([
+            predictor.encode_rois(image, batch_rois, image_indices=batch_image_indices)
+            for batch_rois, batch_image_indices in zip(
+                torch.split(all_rois, max_rois_per_batch),
+                torch.split(all_image_indices, max_rois_per_batch)
+            )
+        ])
+        outputs = []
+        start_index = 0
+        for count in counts:
+            outputs.append(_slice_image_encodings(encodings, start_index, start_index + count))
+            start_index += count
+        return outputs
+
+    def _decode_level(self,
+            tree: Tree,
+            level: List[int],
+            state: dict,
+            owl_image_encodings: Dict[int, OwlEncodeImageOutput],
+            clip_image_encodings: Dict[int, ClipEncodeImageOutput],
+            owl_text_encodings: Dict[int, OwlEncodeTextOutput],
+            clip_text_encodings: Dict[int, ClipEncodeTextOutput],
+            threshold: float
+        ) -> List[int]:
+        """Decodes the nodes fed by one image's labels of a level, returns the next level."""
+
+        boxes = state["boxes"]
+        scores = state["scores"]
+        instance_ids = state["instance_ids"]
+        parent_instance_ids = state["parent_instance_ids"]
+
+        next_level = []
+
+        for label_index in level:
 
             detect_nodes = tree.find_detect_nodes_with_input(label_index)
             classify_nodes = tree.find_classify_nodes_with_input(label_index)
 
-            # Run OWL image encode if required
-            if len(detect_nodes) > 0 and label_index not in owl_image_encodings:
-                owl_image_encodings[label_index] = self.owl_predictor.encode_rois(image_tensor, boxes[label_index])
-                
-
-            # Run CLIP image encode if required
-            if len(classify_nodes) > 0 and label_index not in clip_image_encodings:
-                clip_image_encodings[label_index] = self.clip_predictor.encode_rois(image_tensor, boxes[label_index])
-
             # Decode detect nodes
             for node in detect_nodes:
 
@@ -145,9 +267,10 @@ class TreePredictor(torch.nn.Module):
                 )
 
                 num_detections = len(owl_node_output.labels)
+                global_instance_id = state["next_instance_id"]
                 instance_ids_for_node = torch.arange(global_instance_id, global_instance_id + num_detections, dtype=torch.int64, device=owl_node_output.labels.device)
                 parent_instance_ids_for_node = instance_ids[node.input][owl_node_output.input_indices]
-                global_instance_id += num_detections
+                state["next_instance_id"] = global_instance_id + num_detections
 
                 for i in range(len(node.outputs)):
                     mask = owl_node_output.labels == i
@@ -173,8 +296,6 @@ class TreePredictor(torch.nn.Module):
                     clip_text_encodings_for_node
                 )
 
-                parent_instance_ids_for_node = instance_ids[node.input]
-
                 for i in range(len(node.outputs)):
                     mask = clip_node_output.labels == i
                     output_buffer = node.outputs[i]
@@ -186,31 +307,136 @@ class TreePredictor(torch.nn.Module):
             for node in detect_nodes:
                 for buf in node.outputs:
                     if buf in scores and len(scores[buf]) > 0:
-                        queue.append(buf)
+                        next_level.append(buf)
 
             for node in classify_nodes:
                 for buf in node.outputs:
                     if buf in scores and len(scores[buf]) > 0:
-                        queue.append(buf)
-
-        # Fill outputs
-        detections: Dict[int, TreeDetection] = {}
-        for i in boxes.keys():
-            for box, score, instance_id, parent_instance_id in zip(boxes[i], scores[i], instance_ids[i], parent_instance_ids[i]):
-                instance_id = int(instance_id)
-                score = float(score)
-                box = box.tolist()
-                parent_instance_id = int(parent_instance_id)
-                if instance_id in detections:
-                    detections[instance_id].labels.append(i)
-                    detections[instance_id].scores.append(score)
-                else:
-                    detections[instance_id] = TreeDetection(
-                        id=instance_id,
-                        parent_id=parent_instance_id,
-                        box=box,
-                        labels=[i],
-                        scores=[score]
-                    )
+                        next_level.append(buf)
+
+        return next_level
 
-        return TreeOutput(detections=detections.values())
\ No newline at end of file
+    @inference_only
+    def predict(self, 
+            image: PIL.Image.Image, 
+            tree: Tree, 
+            threshold: float = 0.1,
+            clip_text_encodings: Optional[Dict[int, ClipEncodeTextOutput]] = None,
+            owl_text_encodings: Optional[Dict[int, OwlEncodeTextOutput]] = None,
+            max_rois_per_batch: Optional[int] = 64
+        ) -> TreeOutput:
+        return self.predict_batch(
+            [image],
+            tree,
+            threshold=threshold,
+            clip_text_encodings=clip_text_encodings,
+            owl_text_encodings=owl_text_encodings,
+            max_rois_per_batch=max_rois_per_batch
+        )[0]
+
+    @inference_only
+    def predict_batch(self, 
+            images: List[PIL.Image.Image], 
+            tree: Tree, 
+            threshold: float = 0.1,
+            clip_text_encodings: Optional[Dict[int, ClipEncodeTextOutput]] = None,
+            owl_text_encodings: Optional[Dict[int, OwlEncodeTextOutput]] = None,
+            max_rois_per_batch: Optional[int] = 64
+        ) -> List[TreeOutput]:
+        """Applies ``tree`` to every image, returns one TreeOutput per image.
+
+        Text is encoded once for all images, and each tree level runs one OWL
+        and one CLIP encode over the rois of all images. Instance ids are
+        numbered per image, as in :meth:`predict`.
+        """
+
+        if clip_text_encodings is None:
+            clip_text_encodings = self.encode_clip_text(tree)
+        
+        if owl_text_encodings is None:
+            owl_text_encodings = self.encode_owl_text(tree)
+        
+        image_tensor = self.image_preprocessor.preprocess_images(images)
+        device = image_tensor.device
+
+        states = []
+        for image in images:
+            states.append({
+                "boxes": {
+                    0: torch.tensor([[0, 0, image.width, image.height]], dtype=image_tensor.dtype, device=device)
+                },
+                "scores": {
+                    0: torch.tensor([1.], dtype=torch.float, device=device)
+                },
+                "instance_ids": {
+                    0: torch.tensor([0], dtype=torch.int64, device=device)
+                },
+                "parent_instance_ids": {
+                    0: torch.tensor([-1], dtype=torch.int64, device=device)
+                },
+                "next_instance_id": 1
+            })
+
+        owl_image_encodings: List[Dict[int, OwlEncodeImageOutput]] = [{} for _ in images]
+        clip_image_encodings: List[Dict[int, ClipEncodeImageOutput]] = [{} for _ in images]
+
+        # Labels are visited level by level (the order of the previous FIFO
+        # queue), so all rois of a level, over all images, go through one
+        # encode per model.
+        levels = [[0] for _ in images]
+
+        while any(levels):
+
+            owl_groups = [
+                (b, i) for b, level in enumerate(levels) for i in level
+                if len(tree.find_detect_nodes_with_input(i)) > 0 and i not in owl_image_encodings[b]
+            ]
+            if len(owl_groups) > 0:
+                owl_level_encodings = self.encode_rois_batched(
+                    self.owl_predictor,
+                    image_tensor,
+                    [states[b]["boxes"][i] for b, i in owl_groups],
+                    max_rois_per_batch,
+                    image_indices=[b for b, _ in owl_groups]
+                )
+                for (b, i), encodings in zip(owl_groups, owl_level_encodings):
+                    owl_image_encodings[b][i] = encodings
+
+            clip_groups = [
+                (b, i) for b, level in enumerate(levels) for i in level
+                if len(tree.find_classify_nodes_with_input(i)) > 0 and i not in clip_image_encodings[b]
+            ]
+            if len(clip_groups) > 0:
+                clip_level_encodings = self.encode_rois_batched(
+                    self.clip_predictor,
+                    image_tensor,
+                    [states[b]["boxes"][i] for b, i in clip_groups],
+                    max_rois_per_batch,
+                    image_indices=[b for b, _ in clip_groups]
+                )
+                for (b, i), encodings in zip(clip_groups, clip_level_encodings):
+                    clip_image_encodings[b][i] = encodings
+
+            levels = [
+                self._decode_level(
+                    tree,
+                    level,
+                    state,
+                    owl_image_encodings[b],
+                    clip_image_encodings[b],
+                    owl_text_encodings,
+                    clip_text_encodings,
+                    threshold
+                )
+                for b, (level, state) in enumerate(zip(levels, states))
+            ]
+
+        return [
+            _pack_tree_output(
+                state["boxes"],
+                state["scores"],
+                state["instance_ids"],
+                state["parent_instance_ids"]
+            )
+            for state in states
+        ]
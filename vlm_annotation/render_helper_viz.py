@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Render preview images from helper box JSON files written by inference.py.
+
+Lets bulk runs use `inference.py --viz none` and draw previews afterwards:
+
+    python render_helper_viz.py --json_dir outputs --img_dir /your_dataset_path --viz jpeg --scale 0.5
+
+Needs neither torch nor the models. Images are looked up by file name
+anywhere under --img_dir, as inference.py finds them next to their metadata.
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image as PILImage
+from tqdm import tqdm
+
+from nanoowl.label_drawing import draw_boxes
+from viz_io import VIZ_SUFFIXES, save_viz
+
+
+def helper_items_to_boxes(items: list[dict]) -> tuple[list[list[float]], list[str]]:
+    """Helper boxes ({bbox: {cx, cy, w, h}, category, conf}) as x0, y0, x1, y1 boxes and their categories."""
+    boxes = [
+        [it["bbox"]["cx"] - it["bbox"]["w"] / 2, it["bbox"]["cy"] - it["bbox"]["h"] / 2,
+         it["bbox"]["cx"] + it["bbox"]["w"] / 2, it["bbox"]["cy"] + it["bbox"]["h"] / 2]
+        for it in items
+    ]
+    return boxes, [it["category"] for it in items]
+
+
+def is_helper_json(data) -> bool:
+    """{image_id: [{bbox, category, ...}, ...]}, unlike the run manifests and profiles in the same directory."""
+    return isinstance(data, dict) and all(
+        isinstance(items, list) and all(isinstance(it, dict) and "bbox" in it and "category" in it for it in items)
+        for items in data.values()
+    )
+
+
+def find_helper_jsons(json_dir: Path) -> list[Path]:
+    return sorted(p for p in json_dir.glob("*.json") if not p.name.startswith("run_manifest"))
+
+
+def find_images(img_dir: Path) -> dict:
+    """{stem: path} of every .png under img_dir; helper keys are image stems, e.g. scene_01_0_rgb."""
+    return {path.stem: path for path in sorted(img_dir.rglob("*.png"))}
+
+
+def render_helper_json(json_path: Path, images: dict, out_dir: Path, viz: str = "jpeg", scale: float = 1.0) -> Optional[Path]:
+    """Draw the boxes of one helper JSON on its image, return the preview written (None if skipped)."""
+    with open(json_path, "r") as f:
+        helper = json.load(f)
+    if not is_helper_json(helper):
+        print(f"{json_path} is not a helper box JSON. Skipping.")
+        return None
+    written = None
+    for image_id, items in helper.items():
+        image_path = images.get(image_id)
+        if image_path is None:
+            print(f"Image {image_id}.png not found. Skipping.")
+            continue
+        boxes, texts = helper_items_to_boxes(items)
+        drawn = draw_boxes(PILImage.open(image_path), boxes, texts, draw_text=True)
+        save_viz(drawn, out_dir / json_path.stem, viz, scale)
+        written = (out_dir / json_path.stem).with_suffix(VIZ_SUFFIXES[viz])
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json_dir", default="outputs", help="Directory of helper box JSON files")
+    parser.add_argument("--img_dir", required=True, help="Directory of images, searched recursively")
+    parser.add_argument("--out_dir", default=None, help="Directory to save previews (default: --json_dir)")
+    parser.add_argument("--viz", default="jpeg", choices=["jpeg", "png"])
+    parser.add_argument("--scale", type=float, default=1.0, help="downscale factor of the previews")
+    args = parser.parse_args()
+    if args.scale <= 0:
+        parser.error("--scale must be positive")
+
+    out_dir = Path(args.out_dir or args.json_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    images = find_images(Path(args.img_dir))
+    for json_path in tqdm(find_helper_jsons(Path(args.json_dir))):
+        render_helper_json(json_path, images, out_dir, args.viz, args.scale)
+
+
+if __name__ == "__main__":
+    main()
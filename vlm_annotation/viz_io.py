@@ -0,0 +1,21 @@
+"""Preview images of inference.py and render_helper_viz.py, PIL only."""
+
+from pathlib import Path
+
+from PIL import Image as PILImage
+
+
+VIZ_SUFFIXES = {"jpeg": ".jpg", "png": ".png"}
+
+
+def save_viz(image: PILImage.Image, out_path: Path, viz: str = "png", scale: float = 1.0, jpeg_quality: int = 90):
+    """Write a preview image, optionally downscaled, as <out_path>.jpg or .png."""
+    if scale != 1.0:
+        w, h = image.size
+        image = image.resize((max(1, round(w * scale)), max(1, round(h * scale))), PILImage.BILINEAR)
+    if viz == "jpeg":
+        image.convert("RGB").save(out_path.with_suffix(VIZ_SUFFIXES[viz]), quality=jpeg_quality)
+    elif viz == "png":
+        image.save(out_path.with_suffix(VIZ_SUFFIXES[viz]))
+    else:
+        raise ValueError(f"Unknown viz format {viz!r}, expected one of {list(VIZ_SUFFIXES)}.")